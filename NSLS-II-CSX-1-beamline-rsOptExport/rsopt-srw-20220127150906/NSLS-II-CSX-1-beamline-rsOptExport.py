@@ -183,6 +183,10 @@ def set_optics(v, names=None, want_final_propagation=True):
 
 
 from pykern.pkdebug import pkdlog
+import copy
+import hashlib
+import json
+import multiprocessing
 import numpy
 
 # This function is required by rsopt to generate data but is a noop otherwise
@@ -504,11 +508,27 @@ varParam = [
 ]
 
 
-_BEAM_TMP_DIR = 'beams'
 _DATASET_DIR = 'datasets'
-_PARAM_TMP_DIR = 'parameters'
 _SRW_OUT_DIR = 'data_files'
-_TMP_DIRS = [_BEAM_TMP_DIR, _DATASET_DIR, _PARAM_TMP_DIR, _SRW_OUT_DIR]
+_TMP_DIRS = [_DATASET_DIR, _SRW_OUT_DIR]
+_PARAM_NAMES = ['Aperture_horizontalSize','Aperture_verticalSize',]
+_OPTICS_NAMES = ['Fixed_Mask','Fixed_Mask_M1A','M1A','M1A_Watchpoint','Watchpoint','M2A_VDM','M2A_VDM_Grating','Grating','Grating_Aperture','Aperture','Watchpoint2','M3A_HFM','M3A_HFM_Watchpoint3','Watchpoint3','Pinhole','Watchpoint4','Watchpoint4_Sample','Sample']
+# watch elements do not add an optical element to the container built by set_optics
+_WATCH_NAMES = ['Watchpoint','Watchpoint2','Watchpoint3','Watchpoint4','Sample']
+# the optical element and its attribute set by each parameter, see _rsopt_set_params
+_PARAM_OPTICS_ATTRS = {
+    'Aperture_horizontalSize': ('Aperture', 'Dx'),
+    'Aperture_verticalSize': ('Aperture', 'Dy'),
+}
+# each worker process parses the options, reads the mirror height profiles and builds the optics once,
+# and each task only sets the parameters on the optical elements; False rebuilds everything for each task
+_PERSISTENT_WORKERS = True
+# with persistent workers, each worker calculates the source wavefront and propagates it up to the first
+# optical element set by a parameter once, and each task propagates a copy of it through the rest of the optics;
+# off by default, turn it on for beamlines where a benchmark with SRW shows it saves time
+_CACHE_SOURCE_WAVEFRONT = False
+# compression of the beamIntensities dataset, for example 'gzip' or 'lzf', None for no compression
+_BEAM_COMPRESSION = None
 
 def _apply_rotation(angle, norms):
     rx = numpy.array([[1, 0, 0], [0, numpy.cos(angle[0]), -numpy.sin(angle[0])], [0, numpy.sin(angle[0]), numpy.cos(angle[0])]])
@@ -550,7 +570,6 @@ def _rsopt_run(filename):
     from pykern import pkio
 #    from sirepo.template import template_common
     import h5py
-    import multiprocessing
     import time
 
     # create temporary directories
@@ -566,45 +585,81 @@ def _rsopt_run(filename):
         tasks = tasks.reshape(len(tasks), -1)
     n_runs = len(tasks)
 
-    n_processes = min(n_runs, multiprocessing.cpu_count() - 1)
+    ####################### the manifest lists each completed task index with a hash of its parameter values, a task
+    ####################### that is already in the manifest with the same values is not run again, so an interrupted
+    ####################### sweep resumes where it stopped and a tasks file extended with new points only runs the new points,
+    ####################### a shortened tasks file drops the results and manifest entries of the points past its end
+    results_path = f'{_DATASET_DIR}/results.h5'
+    manifest_path = f'{_DATASET_DIR}/manifest.jsonl'
+    completed_hashes = _read_manifest(manifest_path) if os.path.exists(results_path) else {}
+    if completed_hashes and not _resumable_results(results_path, tasks.shape[1]):
+        completed_hashes = {}
+    if completed_hashes:
+        _truncate_results(results_path, manifest_path, completed_hashes, n_runs)
+    pending = [
+        (task_num, vals)
+        for task_num, vals in enumerate(tasks)
+        if completed_hashes.get(task_num) != _param_hash(vals)
+    ]
+    pkdlog(f'{n_runs - len(pending)} of {n_runs} tasks were completed by an earlier run')
+    if not pending:
+        return
+
+    if _PERSISTENT_WORKERS:
+        # a worker initializer that raises is restarted by the pool forever, so bad options or optics
+        # are reported here, before the pool is created
+        _build_worker_setup()
+
+    n_processes = max(1, min(len(pending), multiprocessing.cpu_count() - 1))
     pkdlog(f'Number of processes available: {n_processes}')
 
-    ####################### splits up the number of tasks to be done evenly across the number of processes available and assigns a task cut to each process
-    processes = []
-    split = n_runs // n_processes
-    idx0 = 0
-    for j in range(n_processes):
-        idx1 = n_runs if j == n_processes - 1 else idx0 + split
-        p = multiprocessing.Process(target=_rsopt_run_set, args=(tasks, idx0, idx1, j))
-        processes.append(p)
-        p.start()
-        idx0 += split
-
-    pkdlog('Processes started')
-
-    ####################### must join all processes to end multiprocess thread
-    for p in processes:
-        pkdlog(f'joining {p}...')
-        p.join()
-        pkdlog(f'joined {p}')
+    ####################### workers take one task at a time from a shared queue, so a worker that finishes
+    ####################### its fast tasks early takes the remaining tasks instead of sitting idle
+    ####################### this process is the only writer of results.h5, each beam is written into its row of the
+    ####################### preallocated datasets as soon as it arrives so memory use does not grow with the sweep
+    completed_runs = 0
+    ####################### the workers are started before results.h5 is opened so they do not inherit the open file
+    with multiprocessing.Pool(processes=n_processes, initializer=_init_worker if _PERSISTENT_WORKERS else None) as pool, \
+            h5py.File(results_path, 'a' if completed_hashes else 'w') as f, \
+            open(manifest_path, 'a' if completed_hashes else 'w') as manifest:
+        if 'params' not in f:
+            f.create_dataset('params', data=_PARAM_NAMES)
+            f.create_dataset('paramVals', shape=(0, tasks.shape[1]), maxshape=(None, tasks.shape[1]), dtype=tasks.dtype, fillvalue=numpy.nan)
+        param_vals = f['paramVals']
+        # rows past the end of the tasks file were dropped by _truncate_results
+        if param_vals.shape[0] < n_runs:
+            param_vals.resize(n_runs, axis=0)
+        beam_intensities = f.get('beamIntensities')
+        if beam_intensities is not None and beam_intensities.shape[0] < n_runs:
+            beam_intensities.resize(n_runs, axis=0)
+        pkdlog('Processes started')
+        for task_num, vals, beam in pool.imap_unordered(_rsopt_run_task, pending, chunksize=1):
+            if beam_intensities is None:
+                # the beam shape is known when the first task completes, one chunk holds one beam
+                beam_intensities = f.create_dataset(
+                    'beamIntensities',
+                    shape=(n_runs,) + beam.shape,
+                    maxshape=(None,) + beam.shape,
+                    dtype=beam.dtype,
+                    chunks=(1,) + beam.shape,
+                    compression=_BEAM_COMPRESSION,
+                )
+            beam_intensities[task_num] = beam
+            param_vals[task_num] = vals
+            # the task is in the manifest only after its results are in the file
+            f.flush()
+            manifest.write(json.dumps({'task': task_num, 'hash': _param_hash(vals)}) + '\n')
+            manifest.flush()
+            completed_runs += 1
+            elapsed_time = time.time() - start_time
+            pkdlog(
+                f'Finished task {task_num}, {completed_runs}/{len(pending)} complete in {numpy.round(elapsed_time / 60, 4)}m, '
+                f'about {numpy.round(elapsed_time / completed_runs * (len(pending) - completed_runs) / 60, 4)}m remaining'
+            )
 
     end_time = time.time()
-    pkdlog(f'Time to run {n_runs} simulations with {n_processes} processes: {numpy.round((end_time - start_time) / 60, 4)}m')
-
-    ###### reads in the temporary storage folder info to create one input and one output file for ML
-    beam_arrays = []
-    task_arrays = []
-    for i in range(n_runs):
-        beam_arrays.append(numpy.load(f'{_BEAM_TMP_DIR}/beam_{i}.npy'))
-        task_arrays.append(numpy.load(f'{_PARAM_TMP_DIR}/values_{i}.npy'))
-
-    beams_all = numpy.concatenate(beam_arrays, axis=0)
-    params_all = numpy.concatenate(task_arrays, axis=0)
-
-    with h5py.File(f'{_DATASET_DIR}/results.h5', 'w') as f:
-        f.create_dataset('params', data=['Aperture_horizontalSize','Aperture_verticalSize',])
-        f.create_dataset('paramVals', data=params_all.tolist())
-        f.create_dataset('beamIntensities', data=beams_all.tolist())
+    pkdlog(f'Time to run {len(pending)} simulations with {n_processes} processes: {numpy.round((end_time - start_time) / 60, 4)}m')
+
 '''
     ###### consolidated input and output file used for ML
     template_common.write_dict_to_h5(
@@ -617,13 +672,158 @@ def _rsopt_run(filename):
     )
 '''
 
-def _rsopt_run_set(param_arr, start, end, proc_num):
-    pkdlog(f'Process {proc_num} to complete {end - start} tasks')
-    task_num = start
-    param_set = param_arr[start:end]
-    for vals in param_set:
-        _rsopt_run_single(vals, proc_num, task_num)
-        task_num += 1
+def _param_hash(vals):
+    return hashlib.sha256(numpy.asarray(vals, dtype=numpy.float64).tobytes()).hexdigest()
+
+
+def _read_manifest(manifest_path):
+    """ Returns task index -> parameter hash of the completed tasks, the last entry for a task wins """
+    completed_hashes = {}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as manifest:
+            for line in manifest:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    # a line cut short when the run was killed
+                    continue
+                completed_hashes[entry['task']] = entry['hash']
+    return completed_hashes
+
+
+def _resumable_results(results_path, n_params):
+    """ Returns False if results.h5 has fixed-size datasets, written before results were resumable, so the sweep must
+    start again. Raises ValueError if its paramVals have a different number of parameters than the tasks file. """
+    import h5py
+
+    with h5py.File(results_path, 'r') as f:
+        for dataset_name in ('paramVals', 'beamIntensities'):
+            if dataset_name in f and f[dataset_name].maxshape[0] is not None:
+                pkdlog(
+                    f'{results_path} has a fixed-size {dataset_name} dataset and can not be resumed, '
+                    f'all tasks will be run and {results_path} will be replaced'
+                )
+                return False
+        if 'paramVals' in f and f['paramVals'].shape[1] != n_params:
+            raise ValueError(
+                f'{results_path} has {f["paramVals"].shape[1]} parameter values per task but the tasks file has '
+                f'{n_params}, move {_DATASET_DIR} aside to start a new sweep'
+            )
+    return True
+
+
+def _truncate_results(results_path, manifest_path, completed_hashes, n_runs):
+    """ Drops the manifest entries and the results.h5 rows of tasks past the end of the tasks file, so they are
+    not taken as completed if the tasks file grows again. completed_hashes is updated. """
+    import h5py
+
+    stale_tasks = [task_num for task_num in completed_hashes if task_num >= n_runs]
+    if stale_tasks:
+        pkdlog(f'Dropping {len(stale_tasks)} completed tasks past the end of the tasks file')
+        for task_num in stale_tasks:
+            del completed_hashes[task_num]
+        # the manifest is replaced before the rows are dropped, so an interruption cannot leave an entry for a missing row
+        with open(f'{manifest_path}.tmp', 'w') as manifest:
+            for task_num, param_hash in sorted(completed_hashes.items()):
+                manifest.write(json.dumps({'task': task_num, 'hash': param_hash}) + '\n')
+        os.replace(f'{manifest_path}.tmp', manifest_path)
+    with h5py.File(results_path, 'a') as f:
+        for dataset_name in ('paramVals', 'beamIntensities'):
+            if dataset_name in f and f[dataset_name].shape[0] > n_runs:
+                f[dataset_name].resize(n_runs, axis=0)
+
+
+def _rsopt_run_task(task):
+    task_num, param_vals = task
+    run_single = _rsopt_run_persistent if _PERSISTENT_WORKERS else _rsopt_run_single
+    beam = run_single(param_vals, multiprocessing.current_process().name, task_num)
+    return task_num, param_vals, beam
+
+
+# the options, optics, and beamline of this worker process, built by _init_worker
+_worker_setup = None
+# the exception raised by _init_worker in this worker process, raised again by each task
+_worker_setup_error = None
+
+
+class _CachedSourceBeamline(srwl_bl.SRWLBeamline):
+    """ An SRWLBeamline whose calc_all calculates the single-electron source wavefront and propagates it through
+    the optics before the first varying element only once. Later calls start from a copy of that wavefront and
+    propagate it through the remaining optics, which must be the only optics that change between calls. """
+
+    def __init__(self, _name, op, first_varying):
+        super().__init__(_name=_name)
+        # the optical elements are shared with op, so parameters set on op apply to the downstream optics
+        self._upstream_op = srwlib.SRWLOptC(op.arOpt[:first_varying], op.arProp[:first_varying])
+        self._downstream_op = srwlib.SRWLOptC(op.arOpt[first_varying:], op.arProp[first_varying:])
+        self._source = None
+        self._upstream_wfr = None
+
+    def calc_sr_se(self, *args, **kwargs):
+        if self._source is None:
+            self._source = super().calc_sr_se(*args, **kwargs)
+            pkdlog(f'Process {multiprocessing.current_process().name} calculated the source wavefront')
+        # the source wavefront is only read by calc_wfr_prop
+        return self._source
+
+    def calc_wfr_prop(self, _wfr, *args, **kwargs):
+        if self._upstream_wfr is None:
+            self._upstream_wfr = copy.deepcopy(_wfr)
+            srwlpy.PropagElecField(self._upstream_wfr, self._upstream_op)
+        self.optics = self._downstream_op
+        return super().calc_wfr_prop(copy.deepcopy(self._upstream_wfr), *args, **kwargs)
+
+
+def _init_worker():
+    global _worker_setup, _worker_setup_error
+    try:
+        _worker_setup = _build_worker_setup()
+    except Exception as e:
+        # raised from the tasks, since the pool would restart a worker whose initializer raises
+        _worker_setup_error = e
+        return
+    pkdlog(f'Process {multiprocessing.current_process().name} built the beamline')
+
+
+def _build_worker_setup():
+    """ Returns the options, optics, parameter attributes, and beamline used by _rsopt_run_persistent """
+    v = srwl_bl.srwl_uti_parse_options(srwl_bl.srwl_uti_ext_options(varParam.copy()), use_sys_argv=False)
+    op = set_optics(v, _OPTICS_NAMES, True)
+    v.ws = True
+    v.ss = False
+    v.sm = False
+    v.pw = False
+    v.si = False
+    v.tr = False
+    optics_element_names = [n for n in _OPTICS_NAMES if n not in _WATCH_NAMES]
+    param_attrs = []
+    for name in _PARAM_NAMES:
+        el_name, attr = _PARAM_OPTICS_ATTRS[name]
+        el = op.arOpt[optics_element_names.index(el_name)]
+        assert hasattr(el, attr), f'{el_name} optical element has no attribute {attr}'
+        param_attrs.append((el, attr))
+    if _CACHE_SOURCE_WAVEFRONT:
+        first_varying = min(
+            optics_element_names.index(_PARAM_OPTICS_ATTRS[name][0]) for name in _PARAM_NAMES
+        )
+        beamline = _CachedSourceBeamline(_name=v.name, op=op, first_varying=first_varying)
+    else:
+        beamline = srwl_bl.SRWLBeamline(_name=v.name)
+    return v, op, param_attrs, beamline
+
+
+def _rsopt_run_persistent(param_vals, proc_num, task_num):
+    if _worker_setup_error is not None:
+        raise _worker_setup_error
+    v, op, param_attrs, beamline = _worker_setup
+    for (el, attr), val in zip(param_attrs, param_vals):
+        setattr(el, attr, float(val))
+    v.ws_fni = f'{_SRW_OUT_DIR}/res_int_se_{task_num}.dat'
+    beamline.calc_all(v, op)
+
+    beam = _read_srw_file(v.ws_fni)
+    pkdlog(f'Process {proc_num} finished task {task_num}')
+    return beam
 
 
 def _rsopt_run_single(param_vals, proc_num, task_num):
@@ -635,8 +835,7 @@ def _rsopt_run_single(param_vals, proc_num, task_num):
     )
     f[2] = f'{_SRW_OUT_DIR}/res_int_se_{task_num}.dat'
     v = srwl_bl.srwl_uti_parse_options(srwl_bl.srwl_uti_ext_options(vp), use_sys_argv=False)
-    names = ['Fixed_Mask','Fixed_Mask_M1A','M1A','M1A_Watchpoint','Watchpoint','M2A_VDM','M2A_VDM_Grating','Grating','Grating_Aperture','Aperture','Watchpoint2','M3A_HFM','M3A_HFM_Watchpoint3','Watchpoint3','Pinhole','Watchpoint4','Watchpoint4_Sample','Sample']
-    op = set_optics(v, names, True)
+    op = set_optics(v, _OPTICS_NAMES, True)
     v.ws = True
     v.ss = False
     v.sm = False
@@ -646,12 +845,8 @@ def _rsopt_run_single(param_vals, proc_num, task_num):
     srwl_bl.SRWLBeamline(_name=v.name).calc_all(v, op)
 
     beam = _read_srw_file(f[2])
-    h = beam.shape[0]
-    w = beam.shape[1]
-    beam = beam.reshape(1, h, w)
-    numpy.save(f'{_BEAM_TMP_DIR}/beam_{task_num}.npy', beam)
-    numpy.save(f'{_PARAM_TMP_DIR}/values_{task_num}.npy', [param_vals])
     pkdlog(f'Process {proc_num} finished task {task_num}')
+    return beam
 
 
 # This function actually sets the data
@@ -1,19 +1,106 @@
+import copy
+import hashlib
 import logging
+import os
+import threading
 import time as ttime
 
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import ContextDecorator
+from pathlib import Path
 from urllib.parse import urlparse
 
 import requests
 
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
 from ._version import get_versions
+from .beamline import BeamlineIndex
+from .bluesky_auth import DEFAULT_BLUESKY_AUTH_SECRET, bluesky_auth_request
+from .cache import SirepoImportIndex
+from .catalog import SimulationCatalog, _simulation_serial
+from .instrumentation import QueueWaitTimer
+from .polling import PollSchedule, RunStatusPoller
+from .results import SirepoRunResult, decode_run_status
+from .sweep import (
+    SirepoSweepResult,
+    _IntensityStack,
+    parameter_names,
+)
 
 __version__ = get_versions()["version"]
 del get_versions
 
+# seconds simulation_result waits for a simulation to complete by default
+DEFAULT_SIMULATION_RESULT_TIMEOUT = 600.0
+
+# srException routes that mean the session must log in again
+_LOGIN_ROUTE_NAMES = ("login", "loginFail", "missingCookies")
+
+# (server url, simulation type, simulation id) -> cookies from a bluesky-auth login
+#   shared by all sessions in this process and inherited by forked processes
+_bluesky_auth_cookies = {}
+_bluesky_auth_lock = threading.Lock()
+
+
+def _reset_bluesky_auth_lock():
+    # another thread may have held the lock when this process was forked
+    global _bluesky_auth_lock
+    _bluesky_auth_lock = threading.Lock()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_bluesky_auth_lock)
+
+
+def _build_simulation_table(sim_list_results):
+    """Build a folder -> name -> simulation id dictionary from `simulation-list` results.
+
+    This is shared by the synchronous and asynchronous sessions.
+    """
+    # sim_folder_name_to_id means "folder" -> "name" -> simulation id
+    sim_folder_name_to_id = {}
+    for sim_details in sorted(
+        sim_list_results, key=lambda sim_details_: sim_details_["folder"]
+    ):
+        simulation_folder = sim_details["folder"]
+        if simulation_folder not in sim_folder_name_to_id:
+            sim_folder_name_to_id[simulation_folder] = {}
+        sim_folder_name_to_id[simulation_folder][sim_details["name"]] = sim_details[
+            "simulationId"
+        ]
+
+    return sim_folder_name_to_id
+
+
+def _simulation_data_serial(simulation_data):
+    return (
+        simulation_data.get("models", {}).get("simulation", {}).get("simulationSerial")
+    )
+
+
+def _cookie_values(cookies):
+    return sorted((cookie.name, cookie.value) for cookie in cookies)
+
 
 class SirepoGuestSession(ContextDecorator):
-    def __init__(self, sirepo_server_url, simulation_type):
+    def __init__(
+        self,
+        sirepo_server_url,
+        simulation_type,
+        poll_schedule=None,
+        response_cache=None,
+        result_cache=None,
+        pool_maxsize=10,
+        max_retries=0,
+        retry_backoff_factor=0.1,
+        request_hooks=None,
+        login_mode="guest",
+        bluesky_simulation_id=None,
+        bluesky_auth_secret=DEFAULT_BLUESKY_AUTH_SECRET,
+        import_index=None,
+    ):
         """
         Parameters
         ----------
@@ -21,6 +108,47 @@ class SirepoGuestSession(ContextDecorator):
           URI specifying host and port, eg. "http://localhost:8000"
         simulation_type: str
           "srw" or "shadow"
+        poll_schedule: PollSchedule, optional
+          decides the time between run-status calls, by default a new PollSchedule;
+          `poll_schedule.statistics()` reports run-status calls per simulation
+        response_cache: SirepoResponseCache, optional
+          if specified `simulation_list` and `simulation_data` responses are read
+          from and stored in this cache under the logged-in user, a guest login
+          whose auth state has no uid does not use the cache; each "guest" login is
+          a new user, so a later run only reuses the stored responses in the
+          "bluesky" login mode or if the cookies of the earlier session are passed
+          to `login`; a stored `simulation_data` response is only used while its
+          simulationSerial is the current one, see `simulation_data`
+        result_cache: SirepoResultCache, optional
+          if specified `simulation_result` returns stored results for simulations
+          that have already been computed
+        pool_maxsize: int
+          the number of keep-alive connections to the server, this should be at least
+          the number of threads sharing the session or connections will be opened and
+          discarded for requests beyond this number
+        max_retries: int
+          retry a request this many times if the connection fails, or for a GET
+          request if the server responds with 502, 503 or 504; a POST request, such
+          as run-simulation, may have been processed before the server responded so
+          it is not repeated after a response
+        retry_backoff_factor: float
+          sleep retry_backoff_factor * 2 ** (retry number - 1) seconds between retries
+        request_hooks: list of SirepoRequestHook, optional
+          notified of every request and every completed simulation, for example
+          a `deep_beamline_simulation.instrumentation.RequestMetrics`
+        login_mode: str
+          "guest" to log in as a new guest user, or "bluesky" to log in with
+          the bluesky-auth endpoint as the owner of `bluesky_simulation_id`;
+          a bluesky login is reused by every session in the process, and by
+          processes forked after the login, until the server rejects it
+        bluesky_simulation_id: str, optional
+          required for the "bluesky" login mode
+        bluesky_auth_secret: str
+          the server's SIREPO_AUTH_BLUESKY_SECRET
+        import_index: SirepoImportIndex, optional
+          remembers imported archives for `import_simulations`, by default
+          a SirepoImportIndex in the per-user cache directory is created
+          when it is first needed
         """
         log = logging.getLogger(self.__class__.__name__)
 
@@ -29,10 +157,53 @@ class SirepoGuestSession(ContextDecorator):
         log.debug(f"self._server_uri: '%s'", self._server_url)
         self.simulation_type = simulation_type.lower()
 
+        if login_mode not in ("guest", "bluesky"):
+            raise ValueError(
+                f"login_mode must be 'guest' or 'bluesky', not '{login_mode}'"
+            )
+        if login_mode == "bluesky" and bluesky_simulation_id is None:
+            raise ValueError("the 'bluesky' login mode requires bluesky_simulation_id")
+        self.login_mode = login_mode
+        self.bluesky_simulation_id = bluesky_simulation_id
+        self.bluesky_auth_secret = bluesky_auth_secret
+
+        if poll_schedule is None:
+            poll_schedule = PollSchedule()
+        self.poll_schedule = poll_schedule
+        self.response_cache = response_cache
+        self.result_cache = result_cache
+        self.import_index = import_index
+
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.retry_backoff_factor = retry_backoff_factor
+
+        if request_hooks is None:
+            request_hooks = []
+        self.request_hooks = list(request_hooks)
+
         self._session = None
+        # the uid of the logged-in guest user, if the server reports it
+        self.user_id = None
         self._response_auth_guest_login = None
+        self._response_bluesky_auth = None
+
+        self._simulation_catalog = None
+        self._simulation_catalog_is_stale = False
+        # simulation id -> simulationSerial from responses received from the server,
+        #   a cached `simulation` response is only used if its serial matches
+        self._simulation_serials = {}
+        # a current simulation list received by the login handshake
+        self._handshake_sim_list_results = None
+
+        # requests wait while another thread logs in again
+        self._logged_in = threading.Event()
+        self._logged_in.set()
+        self._login_lock = threading.Lock()
+        self._login_generation = 0
+        self.relogin_count = 0
 
-    def login(self):
+    def login(self, cookies=None):
         """Take the necessary steps to log in to sirepo as a guest.
 
         Client code should prefer the context manager protocol to calling this method directly, for example:
@@ -40,25 +211,172 @@ class SirepoGuestSession(ContextDecorator):
             with SirepoGuestSession(sirepo_server_url="http://localhost", simulation_type="srw") as sirepo_session:
                 ...
 
+        Parameters
+        ----------
+        cookies: iterable of http.cookiejar.Cookie, optional
+          the cookies of a logged-in session, to log in as the same guest user
+          so the simulations and simulation ids of that session can be used
         """
+        self._session = requests.Session()
+        # all requests go to one server so one connection pool is needed,
+        #   but it must hold a connection for each thread using this session
+        http_adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=self.pool_maxsize,
+            max_retries=Retry(
+                total=self.max_retries,
+                # a request that was sent may have been processed, so do not repeat it
+                read=0,
+                status_forcelist=(502, 503, 504),
+                # a failed connection is retried for any method but a status only for
+                #   idempotent methods, sirepo uses POST for nearly everything including
+                #   run-simulation, which must not start a second job
+                allowed_methods=Retry.DEFAULT_ALLOWED_METHODS,
+                backoff_factor=self.retry_backoff_factor,
+                raise_on_status=False,
+            ),
+        )
+        self._session.mount("http://", http_adapter)
+        self._session.mount("https://", http_adapter)
+        self._session.headers["Connection"] = "keep-alive"
+        if cookies is not None:
+            for cookie in cookies:
+                self._session.cookies.set_cookie(copy.copy(cookie))
+
+        self._login_handshake()
+
+    def _login_handshake(self, reuse_auth=True):
         log = logging.getLogger(self.__class__.__name__)
 
-        self._session = requests.Session()
+        if self.login_mode == "bluesky":
+            self._bluesky_login(reuse_auth=reuse_auth)
+            return
 
         # get cookies by calling simulation-list
-        response_simulation_list = self._post_to_sirepo(
+        response_simulation_list = self._request_sirepo(
+            "POST",
             f"{self._server_url}/simulation-list",
+            relogin=False,
             json={"simulationType": self.simulation_type},
         )
         log.debug("response_simulation_list: %s", response_simulation_list)
+        try:
+            handshake_sim_list_results = response_simulation_list.json()
+        except ValueError:
+            handshake_sim_list_results = None
+        if isinstance(handshake_sim_list_results, list):
+            # the cookies passed to login are still logged in so this is the
+            #   current simulation list, rather than a login srException
+            self._handshake_sim_list_results = handshake_sim_list_results
+            self._update_simulation_serials(handshake_sim_list_results)
 
         log.debug("logging in as guest to '%s'", self._server_url)
         # store the response for troubleshooting and automatic tests
-        self._response_auth_guest_login = self._post_to_sirepo(
+        self._response_auth_guest_login = self._request_sirepo(
+            "POST",
             # "http://localhost:8000/auth-guest-login/srw"
-            f"{self._server_url}/auth-guest-login/{self.simulation_type}"
+            f"{self._server_url}/auth-guest-login/{self.simulation_type}",
+            relogin=False,
         )
         log.debug("response_auth_guest_login: '%s'", self._response_auth_guest_login)
+        try:
+            auth_state = self._response_auth_guest_login.json().get("authState", {})
+        except ValueError:
+            auth_state = {}
+        self.user_id = auth_state.get("uid")
+        if self.user_id is None and self.response_cache is not None:
+            log.warning("no uid in the guest login response, responses are not cached")
+
+    def _relogin(self, login_generation):
+        """Repeat the login handshake unless another thread already has.
+
+        The session cookie is kept so Sirepo logs in the same guest user again and
+        simulations copied by this session remain accessible.
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        with self._login_lock:
+            if login_generation != self._login_generation:
+                log.debug("another thread has logged in again")
+                return
+            log.warning("logging in to '%s' again", self._server_url)
+            self._logged_in.clear()
+            try:
+                self._login_handshake(reuse_auth=False)
+            finally:
+                self._login_generation += 1
+                self.relogin_count += 1
+                self._logged_in.set()
+
+    def _bluesky_login(self, reuse_auth):
+        """Log in with the bluesky-auth endpoint or reuse this process's bluesky login.
+
+        Parameters
+        ----------
+        reuse_auth: bool
+          if False the server rejected this session's cookies, they are replaced by
+          the process's stored cookies if another session has logged in since,
+          otherwise a new bluesky-auth request is made
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        auth_key = (self._server_url, self.simulation_type, self.bluesky_simulation_id)
+        rejected_cookies = None if reuse_auth else _cookie_values(self._session.cookies)
+        with _bluesky_auth_lock:
+            stored_cookies = _bluesky_auth_cookies.get(auth_key)
+            if stored_cookies is not None and (
+                reuse_auth or _cookie_values(stored_cookies) != rejected_cookies
+            ):
+                log.debug("reusing bluesky login to '%s'", self._server_url)
+                for cookie in stored_cookies:
+                    self._session.cookies.set_cookie(copy.copy(cookie))
+                return
+
+            log.debug("logging in with bluesky-auth to '%s'", self._server_url)
+            self._response_bluesky_auth = self._request_sirepo(
+                "POST",
+                f"{self._server_url}/bluesky-auth",
+                relogin=False,
+                json=bluesky_auth_request(
+                    simulation_type=self.simulation_type,
+                    simulation_id=self.bluesky_simulation_id,
+                    secret=self.bluesky_auth_secret,
+                ),
+            )
+            self._response_bluesky_auth.raise_for_status()
+            if self._response_bluesky_auth.json().get("state") != "ok":
+                raise Exception(
+                    f"bluesky-auth failed: {self._response_bluesky_auth.json()}"
+                )
+            # the response has the current data of the simulation
+            bluesky_simulation_data = self._response_bluesky_auth.json().get("data")
+            if bluesky_simulation_data:
+                self._simulation_serials[self.bluesky_simulation_id] = (
+                    _simulation_data_serial(bluesky_simulation_data)
+                )
+            _bluesky_auth_cookies[auth_key] = [
+                copy.copy(cookie) for cookie in self._session.cookies
+            ]
+
+    @staticmethod
+    def _is_login_required(sirepo_response):
+        """Return True if sirepo_response means the session is no longer logged in."""
+        if sirepo_response.status_code in (401, 403):
+            return True
+        # an srException response is small, do not parse large responses
+        response_body = sirepo_response.content
+        if len(response_body) > 4096 or b"srException" not in response_body:
+            return False
+        try:
+            response_json = sirepo_response.json()
+        except ValueError:
+            return False
+        return (
+            isinstance(response_json, dict)
+            and response_json.get("state") == "srException"
+            and response_json.get("srException", {}).get("routeName")
+            in _LOGIN_ROUTE_NAMES
+        )
 
     def logout(self):
         """Close the HTTP session.
@@ -77,17 +395,101 @@ class SirepoGuestSession(ContextDecorator):
         return False
 
     def _post_to_sirepo(self, sirepo_request_url, **kwargs):
+        return self._request_sirepo("POST", sirepo_request_url, **kwargs)
+
+    def _get_from_sirepo(self, sirepo_request_url, **kwargs):
+        return self._request_sirepo("GET", sirepo_request_url, **kwargs)
+
+    def _request_sirepo(self, method, sirepo_request_url, relogin=True, **kwargs):
+        """Send a request and return the response.
+
+        If the response says the session is no longer logged in, for example because
+        the guest login expired or the server was restarted, log in again and repeat
+        the request once. The request must be repeatable, for example a request with
+        `files` must rewind the files itself.
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        if not relogin:
+            return self._send_request(method, sirepo_request_url, **kwargs)
+
+        self._logged_in.wait()
+        login_generation = self._login_generation
+        sirepo_response = self._send_request(method, sirepo_request_url, **kwargs)
+        if self._is_login_required(sirepo_response):
+            log.warning("'%s' requires a new login", sirepo_request_url)
+            self._relogin(login_generation)
+            sirepo_response = self._send_request(method, sirepo_request_url, **kwargs)
+        return sirepo_response
+
+    def _send_request(self, method, sirepo_request_url, **kwargs):
         log = logging.getLogger(self.__class__.__name__)
 
         log.debug("url: '%s', kwargs: '%s'", sirepo_request_url, dict(kwargs))
-        sirepo_response = self._session.post(sirepo_request_url, **kwargs)
+        start_time = ttime.monotonic()
+        try:
+            sirepo_response = self._session.request(
+                method, sirepo_request_url, **kwargs
+            )
+        except requests.RequestException as request_error:
+            self._request_completed(
+                sirepo_request_url,
+                elapsed_seconds=ttime.monotonic() - start_time,
+                prepared_request=request_error.request,
+                error=request_error,
+            )
+            raise
         log.debug(
             "response: '%s', elapsed time: '%s's, ",
             sirepo_response,
             sirepo_response.elapsed,
         )
+        self._request_completed(
+            sirepo_request_url,
+            elapsed_seconds=ttime.monotonic() - start_time,
+            prepared_request=sirepo_response.request,
+            sirepo_response=sirepo_response,
+        )
         return sirepo_response
 
+    def _request_completed(
+        self,
+        sirepo_request_url,
+        elapsed_seconds,
+        prepared_request,
+        sirepo_response=None,
+        error=None,
+    ):
+        if not self.request_hooks:
+            return
+
+        endpoint = urlparse(sirepo_request_url).path.strip("/").split("/")[0]
+        request_body = getattr(prepared_request, "body", None)
+        for request_hook in self.request_hooks:
+            request_hook.request_completed(
+                endpoint=endpoint,
+                elapsed_seconds=elapsed_seconds,
+                request_bytes=0 if request_body is None else len(request_body),
+                response_bytes=(
+                    0 if sirepo_response is None else len(sirepo_response.content)
+                ),
+                status_code=(
+                    None if sirepo_response is None else sirepo_response.status_code
+                ),
+                error=error,
+            )
+
+    def _simulation_completed(
+        self, report, queue_seconds, completed_seconds, status_call_count
+    ):
+        for request_hook in self.request_hooks:
+            request_hook.simulation_completed(
+                report=report,
+                queue_seconds=queue_seconds,
+                run_seconds=completed_seconds - queue_seconds,
+                status_call_count=status_call_count,
+            )
+
     def simulation_list(self):
         """Return results from Sirepo's `simulation-list` endpoint.
 
@@ -114,35 +516,297 @@ class SirepoGuestSession(ContextDecorator):
             ...
         }
         """
-        response_sim_list = self._post_to_sirepo(
-            f"{self._server_url}/simulation-list",
-            json={"simulationType": self.simulation_type},
-        )
-        sim_list_results = response_sim_list.json()
-
-        # build a dictionary from the simulation list results
-        # sim_folder_name_to_id means "folder" -> "name" -> simulation id
-        sim_folder_name_to_id = {}
-        for sim_details in sorted(
-            sim_list_results, key=lambda sim_details_: sim_details_["folder"]
-        ):
-            simulation_folder = sim_details["folder"]
-            if simulation_folder not in sim_folder_name_to_id:
-                sim_folder_name_to_id[simulation_folder] = {}
-            sim_folder_name_to_id[simulation_folder][sim_details["name"]] = sim_details[
-                "simulationId"
-            ]
+        # a copy, callers may modify the table
+        return {
+            simulation_folder: dict(name_to_id)
+            for simulation_folder, name_to_id in self.simulation_catalog(refresh=True)
+            .folder_table()
+            .items()
+        }
+
+    def simulation_catalog(self, refresh=False):
+        """
+        Return a SimulationCatalog of this user's simulations.
+
+        The catalog is built from the first `simulation-list` response and then kept,
+        so resolving names to ids does not request the simulation list again.
+        Copying, deleting, or importing simulations with this session marks the catalog
+        for refresh.
+
+        Parameters
+        ----------
+        refresh: bool
+          update the catalog from a new `simulation-list` response (or the response
+          cache), only changed simulations are re-indexed
+        """
+        if self._simulation_catalog is None:
+            self._simulation_catalog = SimulationCatalog(
+                self._simulation_list_results()
+            )
+        elif refresh or self._simulation_catalog_is_stale:
+            self._simulation_catalog.update(
+                self._simulation_list_results(refresh=self._simulation_catalog_is_stale)
+            )
+        self._simulation_catalog_is_stale = False
+        return self._simulation_catalog
+
+    def _simulation_list_results(self, refresh=False):
+        """Return the `simulation-list` response JSON.
 
-        return sim_folder_name_to_id
+        Unless refresh is True the simulation list received by the login handshake
+        is used, if there is one, and otherwise the response cache.
+        """
+        sim_list_results = None
+        if not refresh:
+            sim_list_results = self._handshake_sim_list_results
+            if sim_list_results is not None:
+                self._cache_response("simulation-list", sim_list_results)
+            else:
+                sim_list_results = self._cached_response("simulation-list")
+        self._handshake_sim_list_results = None
+        if sim_list_results is None:
+            response_sim_list = self._post_to_sirepo(
+                f"{self._server_url}/simulation-list",
+                json={"simulationType": self.simulation_type},
+            )
+            sim_list_results = response_sim_list.json()
+            self._update_simulation_serials(sim_list_results)
+            self._cache_response("simulation-list", sim_list_results)
+
+        return sim_list_results
+
+    def _update_simulation_serials(self, sim_list_results):
+        for sim_details in sim_list_results:
+            self._simulation_serials[sim_details["simulationId"]] = _simulation_serial(
+                sim_details
+            )
 
     def simulation_data(self, simulation_id):
         """
         Request simulation data for the specified simulation id.
+
+        A cached response is only used if its simulationSerial is the serial this
+        session last received from the server for the simulation, in a
+        `simulation-list` response, including the one received when logging in with
+        the cookies of an earlier session, or in the bluesky-auth response. A
+        simulation changed on the server has a new serial so its cached response is
+        not used.
+        """
+        simulation_data = self._cached_response("simulation", simulation_id)
+        if simulation_data is not None:
+            current_serial = self._simulation_serials.get(simulation_id)
+            if (
+                current_serial is None
+                or _simulation_data_serial(simulation_data) != current_serial
+            ):
+                simulation_data = None
+        if simulation_data is None:
+            response_simulation_data = self._get_from_sirepo(
+                f"{self._server_url}/simulation/{self.simulation_type}/{simulation_id}/0"
+            )
+            simulation_data = response_simulation_data.json()
+            self._simulation_serials[simulation_id] = _simulation_data_serial(
+                simulation_data
+            )
+            self._cache_response("simulation", simulation_data, simulation_id)
+
+        return simulation_data
+
+    def _response_cache_user(self):
+        """Return the logged-in user for response cache keys, or None if it is unknown.
+
+        A guest login without a cookie is a new user with its own simulation ids, so
+        responses are only shared by sessions of the same user.
+        """
+        if self.login_mode == "bluesky":
+            # bluesky-auth logs in as the owner of the simulation
+            return f"bluesky:{self.bluesky_simulation_id}"
+        elif self.user_id is not None:
+            return f"uid:{self.user_id}"
+        else:
+            return None
+
+    def _cached_response(self, endpoint, simulation_id=""):
+        if self.response_cache is None:
+            return None
+        user = self._response_cache_user()
+        if user is None:
+            return None
+        return self.response_cache.get(
+            self._server_url, user, self.simulation_type, endpoint, simulation_id
+        )
+
+    def _cache_response(self, endpoint, response_json, simulation_id=""):
+        user = self._response_cache_user()
+        if self.response_cache is not None and user is not None:
+            self.response_cache.put(
+                self._server_url,
+                user,
+                self.simulation_type,
+                endpoint,
+                response_json,
+                simulation_id,
+            )
+
+    def copy_simulation(self, simulation_id, name, folder=None):
+        """
+        Copy a simulation on the server and return the simulation data of the copy.
+
+        Parameters
+        ----------
+        simulation_id: str
+          the simulation to copy
+        name: str
+          the name of the copy
+        folder: str, optional
+          the folder of the copy, by default the folder of the original
+        """
+        if folder is None:
+            folder = self.simulation_data(simulation_id)["models"]["simulation"][
+                "folder"
+            ]
+        response_copy_simulation = self._post_to_sirepo(
+            f"{self._server_url}/copy-simulation",
+            json={
+                "simulationId": simulation_id,
+                "simulationType": self.simulation_type,
+                "name": name,
+                "folder": folder,
+            },
+        )
+        response_copy_simulation.raise_for_status()
+        self._simulation_catalog_is_stale = True
+        return response_copy_simulation.json()
+
+    def delete_simulation(self, simulation_id):
+        """
+        Delete a simulation on the server.
         """
-        response_simulation_data = self._session.get(
-            f"{self._server_url}/simulation/{self.simulation_type}/{simulation_id}/0"
+        response_delete_simulation = self._post_to_sirepo(
+            f"{self._server_url}/delete-simulation",
+            json={
+                "simulationId": simulation_id,
+                "simulationType": self.simulation_type,
+            },
         )
-        return response_simulation_data.json()
+        response_delete_simulation.raise_for_status()
+        self._simulation_catalog_is_stale = True
+
+    def import_simulation(self, archive_path, folder="/"):
+        """
+        Import a simulation archive unless an identical archive was already imported.
+
+        See `import_simulations`.
+
+        Returns
+        -------
+        the simulation id of the imported simulation
+        """
+        (simulation_id,) = self.import_simulations([archive_path], folder=folder)
+        return simulation_id
+
+    def import_simulations(self, archive_paths, folder="/", max_workers=8):
+        """
+        Import simulation archives with the `import-file` endpoint, skipping archives
+        already imported into the folder.
+
+        Archives are identified by the SHA-256 of their contents. The simulation id each
+        archive became is kept in this session's import index and reused if that
+        simulation is still in the server's simulation list. Guest users do not see
+        each other's simulations so only sessions that log in as the same user,
+        for example with the "bluesky" login mode, can reuse each other's imports.
+
+        Parameters
+        ----------
+        archive_paths: iterable of str or Path
+          simulation archives (.zip) or sirepo-data.json files
+        folder: str
+          the Sirepo folder for the simulations, eg. "/foo"
+        max_workers: int
+          the number of archives uploaded at the same time
+
+        Returns
+        -------
+        list of the simulation id for each archive, in order
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        if self.import_index is None:
+            self.import_index = SirepoImportIndex()
+
+        archive_paths = [Path(archive_path) for archive_path in archive_paths]
+        # archive hash -> (archive path, archive bytes) for each distinct archive
+        distinct_archives = {}
+        archive_hashes = []
+        for archive_path in archive_paths:
+            archive_bytes = archive_path.read_bytes()
+            archive_hash = hashlib.sha256(archive_bytes).hexdigest()
+            archive_hashes.append(archive_hash)
+            distinct_archives.setdefault(archive_hash, (archive_path, archive_bytes))
+
+        server_simulation_folders = {
+            sim_details["simulationId"]: sim_details["folder"]
+            for sim_details in self._simulation_list_results(refresh=True)
+        }
+
+        def import_archive(archive_hash):
+            archive_path, archive_bytes = distinct_archives[archive_hash]
+            import_entry = self.import_index.get(
+                self._server_url, self.simulation_type, folder, archive_hash
+            )
+            if (
+                import_entry is not None
+                and server_simulation_folders.get(import_entry["simulationId"])
+                == folder
+            ):
+                log.debug(
+                    "'%s' is already imported as '%s'",
+                    archive_path,
+                    import_entry["simulationId"],
+                )
+                return import_entry["simulationId"], False
+
+            log.debug("importing '%s' into '%s'", archive_path, folder)
+            # bytes rather than a file so the request can be repeated after a login
+            response_import_file = self._post_to_sirepo(
+                f"{self._server_url}/import-file/{self.simulation_type}",
+                files={
+                    "file": (archive_path.name, archive_bytes),
+                    "folder": (None, folder),
+                },
+            )
+            response_import_file.raise_for_status()
+            imported_simulation = response_import_file.json()
+            if "error" in imported_simulation:
+                raise Exception(
+                    f"failed to import '{archive_path}': {imported_simulation['error']}"
+                )
+            simulation_id = imported_simulation["models"]["simulation"]["simulationId"]
+            self.import_index.put(
+                self._server_url,
+                self.simulation_type,
+                folder,
+                archive_hash,
+                {"simulationId": simulation_id, "archiveName": archive_path.name},
+            )
+            return simulation_id, True
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            import_results = dict(
+                zip(distinct_archives, executor.map(import_archive, distinct_archives))
+            )
+
+        imported_count = sum(imported for _, imported in import_results.values())
+        log.info(
+            "imported %d of %d archive(s) into '%s'",
+            imported_count,
+            len(archive_paths),
+            folder,
+        )
+        if imported_count > 0:
+            self._simulation_catalog_is_stale = True
+
+        return [import_results[archive_hash][0] for archive_hash in archive_hashes]
 
     def run_simulation(self, simulation_id, simulation_data, simulation_report=None):
         """
@@ -154,50 +818,400 @@ class SirepoGuestSession(ContextDecorator):
         simulation_data_copy["simulationId"] = simulation_id
         if simulation_report:
             simulation_data_copy["report"] = simulation_report
-        run_simulation_response = self._session.post(
+        run_simulation_response = self._post_to_sirepo(
             f"{self._server_url}/run-simulation", json=simulation_data_copy
         )
-        log.debug(
-            "run-simulation response: state '%s', nextRequest: '%s', nextRequestSeconds '%s'",
-            run_simulation_response.json()["state"],
-            run_simulation_response.json()["nextRequest"],
-            run_simulation_response.json()["nextRequestSeconds"],
-        )
+        if log.isEnabledFor(logging.DEBUG):
+            run_status = run_simulation_response.json()
+            log.debug(
+                "run-simulation response: state '%s', nextRequest: '%s', nextRequestSeconds '%s'",
+                run_status["state"],
+                run_status.get("nextRequest"),
+                run_status.get("nextRequestSeconds"),
+            )
         return run_simulation_response
 
-    def wait_for_simulation(self, run_simulation_response, max_status_calls=100):
+    def wait_for_simulation(
+        self,
+        run_simulation_response,
+        max_status_calls=100,
+        timeout=None,
+        poll_schedule=None,
+    ):
         """
         Wait for a running simulation to complete and return the final run-status response.
+
+        The time between run-status calls is decided by a PollSchedule that learns how
+        long each report takes, rather than by the server's nextRequestSeconds.
+
+        Parameters
+        ----------
+        run_simulation_response: requests.Response
+          the response returned by `run_simulation`
+        max_status_calls: int, optional
+          return the latest run-status response after this many run-status calls
+          even if the simulation has not completed, None to wait without limit
+        timeout: float, optional
+          raise TimeoutError if the simulation has not completed after this many
+          seconds, the last run-status call is made at the timeout
+        poll_schedule: PollSchedule, optional
+          by default this session's `poll_schedule` is used
+        """
+        run_status_response, _ = self._wait_for_run_status(
+            run_simulation_response,
+            max_status_calls=max_status_calls,
+            timeout=timeout,
+            poll_schedule=poll_schedule,
+        )
+        return run_status_response
+
+    def _wait_for_run_status(
+        self,
+        run_simulation_response,
+        max_status_calls=None,
+        timeout=None,
+        poll_schedule=None,
+    ):
+        """Implement `wait_for_simulation` and also return the decoded run-status.
+
+        Each response body is parsed once, by `decode_run_status`.
+
+        Returns
+        -------
+        (run_status_response, run_status)
         """
         log = logging.getLogger(self.__class__.__name__)
 
-        simulation_id = run_simulation_response.json()["nextRequest"]["simulationId"]
+        if poll_schedule is None:
+            poll_schedule = self.poll_schedule
 
+        start_time = ttime.monotonic()
         run_status_response = run_simulation_response
-        run_status = run_status_response.json()
-        for status_call_i in range(max_status_calls):
+        run_status = decode_run_status(run_status_response.content)
+        next_request = run_status.get("nextRequest", {})
+        simulation_id = next_request.get("simulationId")
+        simulation_report = next_request.get("report")
+
+        status_call_count = 0
+        incomplete_seconds = 0.0
+        queue_wait_timer = QueueWaitTimer()
+        while True:
+            elapsed_seconds = ttime.monotonic() - start_time
             run_state = run_status["state"]
+            queue_wait_timer.observe(run_state, elapsed_seconds)
             if run_state == "completed":
                 log.info("simulation '%s' completed", simulation_id)
+                poll_schedule.record_completion(
+                    report=simulation_report,
+                    incomplete_seconds=incomplete_seconds,
+                    completed_seconds=elapsed_seconds,
+                    status_call_count=status_call_count,
+                )
+                self._simulation_completed(
+                    report=simulation_report,
+                    queue_seconds=queue_wait_timer.queue_seconds,
+                    completed_seconds=elapsed_seconds,
+                    status_call_count=status_call_count,
+                )
                 break
             elif run_state == "error":
                 log.error("simulation failed with an error")
                 raise Exception()
+            elif (
+                run_state not in ("pending", "running")
+                or "nextRequest" not in run_status
+            ):
+                # eg "canceled", a simulation that can not be polled again
+                log.error("simulation finished in state '%s'", run_state)
+                raise Exception(
+                    f"simulation '{simulation_id}' finished in state '{run_state}'"
+                )
+            elif max_status_calls is not None and status_call_count >= max_status_calls:
+                log.warning(
+                    "simulation '%s' has not completed after %d run-status calls",
+                    simulation_id,
+                    status_call_count,
+                )
+                return run_status_response, run_status
             else:
-                log.debug("making run-status call %d", status_call_i)
-                next_request_seconds = run_status["nextRequestSeconds"]
+                incomplete_seconds = elapsed_seconds
+                if timeout is not None and elapsed_seconds >= timeout:
+                    raise TimeoutError(
+                        f"simulation '{simulation_id}' has not completed after {timeout}s"
+                    )
+                next_request_seconds = poll_schedule.next_delay(
+                    simulation_report, elapsed_seconds
+                )
+                if timeout is not None:
+                    # the last run-status call is made at the timeout
+                    next_request_seconds = min(
+                        next_request_seconds, timeout - elapsed_seconds
+                    )
                 log.debug("sleeping for '%s' second(s)", next_request_seconds)
                 ttime.sleep(next_request_seconds)
-                run_status_response = self._session.post(
+                log.debug("making run-status call %d", status_call_count)
+                run_status_response = self._post_to_sirepo(
                     f"{self._server_url}/run-status", json=run_status["nextRequest"]
                 )
-                run_status = run_status_response.json()
-                log.debug("run_status.json: %s", run_status)
+                status_call_count += 1
+                run_status = decode_run_status(run_status_response.content)
+                log.debug("run_status state: '%s'", run_status["state"])
 
         # the simulation completed successfully
         log.debug(
-            "after successful completion run_status_response: %s\n  json:\n %s",
+            "after successful completion run_status_response: %s",
             run_status_response,
-            run_status_response.json(),
         )
-        return run_status_response
+        return run_status_response, run_status
+
+    def simulation_result(
+        self,
+        simulation_id,
+        simulation_data,
+        simulation_report=None,
+        timeout=DEFAULT_SIMULATION_RESULT_TIMEOUT,
+    ):
+        """
+        Run a simulation, wait for it to complete, and return the result.
+
+        If this session has a result cache and an identical simulation has already
+        been computed the stored result is returned without running the simulation.
+
+        Parameters
+        ----------
+        simulation_id: str
+          the simulation to run
+        simulation_data: dict
+          the simulation data to run
+        simulation_report: str, optional
+          the report to run, by default simulation_data["report"]
+        timeout: float or None
+          raise TimeoutError if the simulation has not completed after this many
+          seconds, the last run-status call is made at the timeout; None waits
+          without limit, which for a job stuck in "pending" is forever
+
+        Returns
+        -------
+        SirepoRunResult with "z_matrix" and "points", if present, as NumPy arrays
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        if simulation_report is None:
+            simulation_report = simulation_data.get("report")
+
+        if self.result_cache is not None:
+            result = self.result_cache.get(
+                self.simulation_type, simulation_data, simulation_report
+            )
+            if result is not None:
+                log.debug("using stored result for '%s'", simulation_report)
+                return SirepoRunResult(result)
+
+        _, run_status = self._wait_for_run_status(
+            self.run_simulation(
+                simulation_id=simulation_id,
+                simulation_data=simulation_data,
+                simulation_report=simulation_report,
+            ),
+            timeout=timeout,
+        )
+        if self.result_cache is not None:
+            self.result_cache.put(
+                self.simulation_type, simulation_data, simulation_report, run_status
+            )
+
+        return SirepoRunResult(run_status)
+
+    def run_sweep(
+        self,
+        simulation_id,
+        base_data=None,
+        parameter_updates=(),
+        simulation_report=None,
+        max_workers=4,
+        h5_path=None,
+        timeout=None,
+    ):
+        """
+        Run a simulation once for each set of parameter updates and collect the results.
+
+        For example:
+
+            sweep_result = sirepo_session.run_sweep(
+                simulation_id,
+                parameter_updates=[
+                    {"Aperture": {"horizontalSize": h, "verticalSize": v}}
+                    for h in np.linspace(0.01, 1, 10)
+                    for v in np.linspace(0.01, 1, 10)
+                ],
+                simulation_report="watchpointReport6",
+                max_workers=8,
+            )
+            sweep_result.intensities.shape  # (100, height, width)
+
+        Sirepo runs one job at a time per simulation and report, so each of up to
+        `max_workers` concurrent points runs on its own copy of the simulation. The
+        copies are deleted when the sweep finishes. Points already in this session's
+        result cache are not run.
+
+        Parameters
+        ----------
+        simulation_id: str
+          the simulation to sweep
+        base_data: dict, optional
+          simulation data the updates are applied to, by default `simulation_data(simulation_id)`
+        parameter_updates: iterable of dict
+          beamline element title -> parameter name -> value for each point,
+          see `deep_beamline_simulation.beamline.BeamlineIndex.apply_parameter_updates`
+        simulation_report: str, optional
+          the report to run, by default base_data["report"]
+        max_workers: int
+          the number of simulations running at the same time
+        h5_path: str or Path, optional
+          write the results to an HDF5 file with datasets "params", "paramVals" and
+          "beamIntensities" rather than keeping them in memory
+        timeout: float, optional
+          raise TimeoutError if the sweep has not finished after this many seconds
+
+        Returns
+        -------
+        SirepoSweepResult with results in the order of parameter_updates
+
+        Raises
+        ------
+        Exception if a point finishes in any state but "completed", eg "error" or "canceled"
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        if base_data is None:
+            base_data = self.simulation_data(simulation_id)
+        if simulation_report is None:
+            simulation_report = base_data.get("report")
+        parameter_updates = list(parameter_updates)
+        sweep_parameter_names = (
+            parameter_names(parameter_updates[0]) if parameter_updates else []
+        )
+        sweep_result = SirepoSweepResult(
+            parameter_updates=parameter_updates,
+            parameter_names=sweep_parameter_names,
+            h5_path=h5_path,
+        )
+
+        start_time = ttime.monotonic()
+        # each point copies only the elements it updates
+        beamline_index = BeamlineIndex(base_data)
+        pending_points = iter(enumerate(parameter_updates))
+        # point index -> (point simulation data, run-simulation time)
+        running_points = {}
+        worker_simulation_ids = []
+        free_worker_simulation_ids = []
+        poller = RunStatusPoller(self)
+
+        def submit_points():
+            while (
+                free_worker_simulation_ids or len(worker_simulation_ids) < max_workers
+            ):
+                try:
+                    point_i, point_updates = next(pending_points)
+                except StopIteration:
+                    return
+                point_data = beamline_index.apply_parameter_updates(point_updates)
+
+                if self.result_cache is not None:
+                    stored_run_status = self.result_cache.get(
+                        self.simulation_type, point_data, simulation_report
+                    )
+                    if stored_run_status is not None:
+                        sweep_result.from_result_cache[point_i] = True
+                        store_result(point_i, SirepoRunResult(stored_run_status))
+                        continue
+
+                if free_worker_simulation_ids:
+                    worker_simulation_id = free_worker_simulation_ids.pop()
+                else:
+                    worker_simulation_id = self.copy_simulation(
+                        simulation_id,
+                        name=f"{base_data['models']['simulation']['name']} sweep "
+                        f"{len(worker_simulation_ids)}",
+                    )["models"]["simulation"]["simulationId"]
+                    worker_simulation_ids.append(worker_simulation_id)
+                    log.debug("created sweep worker '%s'", worker_simulation_id)
+
+                # the simulation model may be shared with base_data
+                point_data["models"]["simulation"] = dict(
+                    point_data["models"]["simulation"],
+                    simulationId=worker_simulation_id,
+                )
+                running_points[point_i] = (point_data, ttime.monotonic())
+                poller.add(
+                    self.run_simulation(
+                        simulation_id=worker_simulation_id,
+                        simulation_data=point_data,
+                        simulation_report=simulation_report,
+                    ),
+                    key=(point_i, worker_simulation_id),
+                )
+
+        def store_result(point_i, result):
+            if result.intensity is not None:
+                intensity_stack.put(point_i, result.intensity)
+            sweep_result.metadata[point_i] = result.metadata
+
+        with _IntensityStack(
+            point_count=len(parameter_updates),
+            parameter_names=sweep_parameter_names,
+            parameter_values=sweep_result.parameter_values,
+            h5_path=h5_path,
+        ) as intensity_stack:
+            try:
+                submit_points()
+                for (point_i, worker_simulation_id), result in poller.completed_results(
+                    timeout=timeout
+                ):
+                    # "error", "canceled" or any other state is a failed point,
+                    #   which must not reach the results or the result cache
+                    if result.state != "completed":
+                        log.error(
+                            "sweep point %d finished in state '%s'",
+                            point_i,
+                            result.state,
+                        )
+                        raise Exception(
+                            f"sweep point {point_i} finished in state '{result.state}': "
+                            f"{result.run_status.get('error')}"
+                        )
+                    point_data, run_start_time = running_points.pop(point_i)
+                    sweep_result.run_seconds[point_i] = (
+                        ttime.monotonic() - run_start_time
+                    )
+                    store_result(point_i, result)
+                    if self.result_cache is not None:
+                        self.result_cache.put(
+                            self.simulation_type,
+                            point_data,
+                            simulation_report,
+                            result.run_status,
+                        )
+                    free_worker_simulation_ids.append(worker_simulation_id)
+                    submit_points()
+            finally:
+                for worker_simulation_id in worker_simulation_ids:
+                    try:
+                        self.delete_simulation(worker_simulation_id)
+                    except requests.RequestException:
+                        log.warning(
+                            "failed to delete sweep worker '%s'", worker_simulation_id
+                        )
+
+            if h5_path is None:
+                sweep_result.intensities = intensity_stack.intensities
+
+        elapsed_seconds = ttime.monotonic() - start_time
+        log.info(
+            "swept %d points in %.3fs (%.2f points/s), %d stored results",
+            len(parameter_updates),
+            elapsed_seconds,
+            len(parameter_updates) / elapsed_seconds if elapsed_seconds > 0 else 0.0,
+            sweep_result.from_result_cache.sum(),
+        )
+        return sweep_result
@@ -0,0 +1,350 @@
+import asyncio
+import logging
+import time
+
+from urllib.parse import urlparse
+
+import aiohttp
+
+from . import _build_simulation_table
+from .polling import PollSchedule
+
+
+class AsyncSirepoGuestSession:
+    def __init__(
+        self,
+        sirepo_server_url,
+        simulation_type,
+        max_concurrent_simulations=16,
+        max_connections=None,
+        poll_schedule=None,
+    ):
+        """
+        An asyncio counterpart to SirepoGuestSession.
+
+        The methods have the same names as the SirepoGuestSession methods but are
+        coroutines and return the parsed JSON of each response rather than
+        the response itself, since an aiohttp response can not be read after
+        its connection has been released.
+
+        Parameters
+        ----------
+        sirepo_server_url: str
+          URI specifying host and port, eg. "http://localhost:8000"
+        simulation_type: str
+          "srw" or "shadow"
+        max_concurrent_simulations: int
+          the maximum number of simulations `run_simulation_and_wait` will keep
+          in flight at the same time, additional calls wait their turn
+        max_connections: int, optional
+          size of the HTTP connection pool, by default one connection per
+          in-flight simulation plus one for everything else
+        poll_schedule: PollSchedule, optional
+          decides the time between run-status calls, by default a new PollSchedule
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        parsed_url = urlparse(sirepo_server_url)
+        self._server_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
+        log.debug("self._server_uri: '%s'", self._server_url)
+        self.simulation_type = simulation_type.lower()
+
+        self.max_concurrent_simulations = max_concurrent_simulations
+        if max_connections is None:
+            max_connections = max_concurrent_simulations + 1
+        self.max_connections = max_connections
+
+        if poll_schedule is None:
+            poll_schedule = PollSchedule()
+        self.poll_schedule = poll_schedule
+
+        self._session = None
+        self._simulation_semaphore = None
+        self._response_auth_guest_login = None
+        # simulation id -> ids of copies of the simulation not running a simulation
+        self._free_worker_simulation_ids = {}
+        # ids of every copy made by run_simulation_and_wait, deleted by logout
+        self._worker_simulation_ids = []
+
+    async def login(self):
+        """Take the necessary steps to log in to sirepo as a guest.
+
+        Client code should prefer the asynchronous context manager protocol to calling this method directly,
+        for example:
+
+            async with AsyncSirepoGuestSession(
+                sirepo_server_url="http://localhost", simulation_type="srw"
+            ) as sirepo_session:
+                ...
+
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        # the default cookie jar ignores cookies from servers addressed by IP,
+        #   such as "http://10.10.10.10:8000", but sirepo depends on its cookie
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_connections),
+            cookie_jar=aiohttp.CookieJar(unsafe=True),
+        )
+        # the semaphore must be created while the event loop is running
+        self._simulation_semaphore = asyncio.Semaphore(self.max_concurrent_simulations)
+
+        try:
+            # get cookies by calling simulation-list
+            response_simulation_list = await self._post_to_sirepo(
+                f"{self._server_url}/simulation-list",
+                json={"simulationType": self.simulation_type},
+            )
+            log.debug("response_simulation_list: %s", response_simulation_list)
+
+            log.debug("logging in as guest to '%s'", self._server_url)
+            # store the response for troubleshooting and automatic tests
+            self._response_auth_guest_login = await self._post_to_sirepo(
+                f"{self._server_url}/auth-guest-login/{self.simulation_type}"
+            )
+        except BaseException:
+            # __aexit__ is not called when __aenter__ fails so close the session here
+            await self._session.close()
+            raise
+        log.debug("response_auth_guest_login: '%s'", self._response_auth_guest_login)
+
+    async def logout(self):
+        """Delete the simulation copies made by `run_simulation_and_wait` and close the HTTP session.
+
+        This is the counterpart to `login`. Client code should prefer the context manager protocol.
+
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        try:
+            for worker_simulation_id in self._worker_simulation_ids:
+                try:
+                    await self.delete_simulation(worker_simulation_id)
+                except aiohttp.ClientError:
+                    log.warning(
+                        "failed to delete simulation copy '%s'", worker_simulation_id
+                    )
+        finally:
+            self._worker_simulation_ids = []
+            self._free_worker_simulation_ids = {}
+            await self._session.close()
+
+    async def __aenter__(self):
+        await self.login()
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.logout()
+        return False
+
+    async def _post_to_sirepo(self, sirepo_request_url, **kwargs):
+        log = logging.getLogger(self.__class__.__name__)
+
+        log.debug("url: '%s', kwargs: '%s'", sirepo_request_url, dict(kwargs))
+        async with self._session.post(sirepo_request_url, **kwargs) as sirepo_response:
+            log.debug("response: '%s'", sirepo_response.status)
+            sirepo_response.raise_for_status()
+            # sirepo does not always set the content type to application/json
+            return await sirepo_response.json(content_type=None)
+
+    async def simulation_list(self):
+        """Return results from Sirepo's `simulation-list` endpoint.
+
+        See SirepoGuestSession.simulation_list for the structure of the returned dictionary.
+        """
+        sim_list_results = await self._post_to_sirepo(
+            f"{self._server_url}/simulation-list",
+            json={"simulationType": self.simulation_type},
+        )
+
+        return _build_simulation_table(sim_list_results)
+
+    async def simulation_data(self, simulation_id):
+        """
+        Request simulation data for the specified simulation id.
+        """
+        async with self._session.get(
+            f"{self._server_url}/simulation/{self.simulation_type}/{simulation_id}/0"
+        ) as response_simulation_data:
+            response_simulation_data.raise_for_status()
+            return await response_simulation_data.json(content_type=None)
+
+    async def copy_simulation(self, simulation_id, name, folder):
+        """
+        Copy a simulation on the server and return the simulation data of the copy.
+        """
+        return await self._post_to_sirepo(
+            f"{self._server_url}/copy-simulation",
+            json={
+                "simulationId": simulation_id,
+                "simulationType": self.simulation_type,
+                "name": name,
+                "folder": folder,
+            },
+        )
+
+    async def delete_simulation(self, simulation_id):
+        """
+        Delete a simulation on the server.
+        """
+        await self._post_to_sirepo(
+            f"{self._server_url}/delete-simulation",
+            json={
+                "simulationId": simulation_id,
+                "simulationType": self.simulation_type,
+            },
+        )
+
+    async def run_simulation(
+        self, simulation_id, simulation_data, simulation_report=None
+    ):
+        """
+        Start a simulation but do not wait for it to complete.
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        simulation_data_copy = simulation_data.copy()
+        simulation_data_copy["simulationId"] = simulation_id
+        if simulation_report:
+            simulation_data_copy["report"] = simulation_report
+        run_simulation_response = await self._post_to_sirepo(
+            f"{self._server_url}/run-simulation", json=simulation_data_copy
+        )
+        log.debug(
+            "run-simulation response: state '%s', nextRequest: '%s', nextRequestSeconds '%s'",
+            run_simulation_response["state"],
+            run_simulation_response.get("nextRequest"),
+            run_simulation_response.get("nextRequestSeconds"),
+        )
+        return run_simulation_response
+
+    async def wait_for_simulation(
+        self,
+        run_simulation_response,
+        max_status_calls=100,
+        timeout=None,
+        poll_schedule=None,
+    ):
+        """
+        Wait for a running simulation to complete and return the final run-status response.
+
+        Unlike SirepoGuestSession.wait_for_simulation this does not block the thread
+        between run-status calls so many simulations can be waited on concurrently.
+        The parameters have the same meaning as for SirepoGuestSession.wait_for_simulation.
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        if poll_schedule is None:
+            poll_schedule = self.poll_schedule
+
+        start_time = time.monotonic()
+        run_status = run_simulation_response
+        next_request = run_status.get("nextRequest", {})
+        simulation_id = next_request.get("simulationId")
+        simulation_report = next_request.get("report")
+
+        status_call_count = 0
+        incomplete_seconds = 0.0
+        while True:
+            elapsed_seconds = time.monotonic() - start_time
+            run_state = run_status["state"]
+            if run_state == "completed":
+                log.info("simulation '%s' completed", simulation_id)
+                poll_schedule.record_completion(
+                    report=simulation_report,
+                    incomplete_seconds=incomplete_seconds,
+                    completed_seconds=elapsed_seconds,
+                    status_call_count=status_call_count,
+                )
+                return run_status
+            elif run_state == "error":
+                log.error("simulation failed with an error")
+                raise Exception(run_status.get("error"))
+            elif max_status_calls is not None and status_call_count >= max_status_calls:
+                log.warning(
+                    "simulation '%s' has not completed after %d run-status calls",
+                    simulation_id,
+                    status_call_count,
+                )
+                return run_status
+            else:
+                incomplete_seconds = elapsed_seconds
+                if timeout is not None and elapsed_seconds >= timeout:
+                    raise TimeoutError(
+                        f"simulation '{simulation_id}' has not completed after {timeout}s"
+                    )
+                next_request_seconds = poll_schedule.next_delay(
+                    simulation_report, elapsed_seconds
+                )
+                if timeout is not None:
+                    # the last run-status call is made at the timeout
+                    next_request_seconds = min(
+                        next_request_seconds, timeout - elapsed_seconds
+                    )
+                log.debug("sleeping for '%s' second(s)", next_request_seconds)
+                await asyncio.sleep(next_request_seconds)
+                log.debug("making run-status call %d", status_call_count)
+                run_status = await self._post_to_sirepo(
+                    f"{self._server_url}/run-status", json=run_status["nextRequest"]
+                )
+                status_call_count += 1
+
+    async def run_simulation_and_wait(
+        self, simulation_id, simulation_data, simulation_report=None
+    ):
+        """
+        Run a simulation on a copy of the simulation and wait for it to complete.
+
+        Sirepo runs one job at a time per simulation and report, and a new
+        run-simulation replaces the running job, so each call runs on a copy of
+        the simulation that no other call is using. At most `max_concurrent_simulations`
+        calls are in flight at once and copies are reused, so there are at most
+        that many copies of each simulation; they are deleted by `logout`.
+        A parameter sweep can simply gather one call per point:
+
+            results = await asyncio.gather(
+                *[
+                    sirepo_session.run_simulation_and_wait(simulation_id, point_data, "intensityReport")
+                    for point_data in sweep_data
+                ]
+            )
+
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        async with self._simulation_semaphore:
+            free_worker_simulation_ids = self._free_worker_simulation_ids.setdefault(
+                simulation_id, []
+            )
+            if free_worker_simulation_ids:
+                worker_simulation_id = free_worker_simulation_ids.pop()
+            else:
+                simulation = simulation_data["models"]["simulation"]
+                worker_simulation_id = (
+                    await self.copy_simulation(
+                        simulation_id,
+                        name=f"{simulation['name']} async {len(self._worker_simulation_ids)}",
+                        folder=simulation["folder"],
+                    )
+                )["models"]["simulation"]["simulationId"]
+                self._worker_simulation_ids.append(worker_simulation_id)
+                log.debug("created simulation copy '%s'", worker_simulation_id)
+
+            # the caller's simulation data is not modified
+            worker_simulation_data = dict(
+                simulation_data, models=dict(simulation_data["models"])
+            )
+            worker_simulation_data["models"]["simulation"] = dict(
+                simulation_data["models"]["simulation"],
+                simulationId=worker_simulation_id,
+            )
+            run_simulation_response = await self.run_simulation(
+                simulation_id=worker_simulation_id,
+                simulation_data=worker_simulation_data,
+                simulation_report=simulation_report,
+            )
+            run_status = await self.wait_for_simulation(run_simulation_response)
+            # a copy that may still be running its simulation is not reused
+            if run_status["state"] == "completed":
+                free_worker_simulation_ids.append(worker_simulation_id)
+            return run_status
@@ -0,0 +1,235 @@
+import logging
+
+import numpy as np
+
+
+class BeamlineIndex:
+    def __init__(self, simulation_data):
+        """
+        Indexes of the models.beamline elements of Sirepo simulation data by title, id and type.
+
+        The index is built once for a simulation and shared by every point of a
+        sweep. The simulation data is a template and is never modified: the
+        payloads returned by `apply_parameter_updates` and `apply_parameter_rows`
+        share every element and model that is not patched with the template and
+        copy only the patched ones. For example:
+
+            beamline_index = BeamlineIndex(simulation_data)
+            aperture = beamline_index.by_title("Aperture")
+            for point_data in beamline_index.apply_parameter_rows(
+                ["Aperture_horizontalSize", "Aperture_verticalSize"],
+                [[0.1, 0.1], [0.1, 0.2], [0.2, 0.1]],
+            ):
+                sirepo_session.run_simulation(simulation_id, point_data)
+
+        Parameters
+        ----------
+        simulation_data: dict
+          simulation data as returned by SirepoGuestSession.simulation_data
+        """
+        self.simulation_data = simulation_data
+
+        beamline_elements = simulation_data["models"]["beamline"]
+        # title -> index in models.beamline
+        self._indices_by_title = {}
+        # id -> index in models.beamline
+        self._indices_by_id = {}
+        # type -> list of indices in models.beamline
+        self._indices_by_type = {}
+        for beamline_i, beamline_element in enumerate(beamline_elements):
+            # the first element with a title is found, as with SirepoBluesky.find_element
+            self._indices_by_title.setdefault(beamline_element["title"], beamline_i)
+            if "id" in beamline_element:
+                self._indices_by_id[beamline_element["id"]] = beamline_i
+            self._indices_by_type.setdefault(beamline_element["type"], []).append(
+                beamline_i
+            )
+
+        # built when needed
+        self._components = None
+
+    def __len__(self):
+        return len(self.simulation_data["models"]["beamline"])
+
+    def __contains__(self, title):
+        return title in self._indices_by_title
+
+    def titles(self):
+        """Return the element titles in beam order."""
+        return list(self._indices_by_title)
+
+    def index(self, title):
+        """Return the position in models.beamline of the element with a title or raise KeyError."""
+        try:
+            return self._indices_by_title[title]
+        except KeyError:
+            raise KeyError(
+                f"no beamline element titled '{title}' in {self.titles()}"
+            ) from None
+
+    def by_title(self, title):
+        """Return the element with a title or raise KeyError."""
+        return self.simulation_data["models"]["beamline"][self.index(title)]
+
+    def by_id(self, element_id):
+        """Return the element with an id or raise KeyError."""
+        return self.simulation_data["models"]["beamline"][
+            self._indices_by_id[element_id]
+        ]
+
+    def by_type(self, element_type):
+        """Return the elements of a type, such as "aperture" or "watch", in beam order."""
+        beamline_elements = self.simulation_data["models"]["beamline"]
+        return [
+            beamline_elements[beamline_i]
+            for beamline_i in self._indices_by_type.get(element_type, ())
+        ]
+
+    def components(self):
+        """
+        Return title -> parameter name -> value for each element, without the title.
+
+        The dictionary is kept and must not be modified.
+        """
+        if self._components is None:
+            self._components = {
+                beamline_element["title"]: {
+                    parameter_name: parameter_value
+                    for parameter_name, parameter_value in beamline_element.items()
+                    if parameter_name != "title"
+                }
+                for beamline_element in self.simulation_data["models"]["beamline"]
+            }
+        return self._components
+
+    def _patch_target(self, title):
+        """Return ("beamline", index) for an element title or ("models", name) for a model name."""
+        if title in self._indices_by_title:
+            return "beamline", self._indices_by_title[title]
+        elif title in self.simulation_data["models"]:
+            return "models", title
+        else:
+            # raise KeyError with the list of titles
+            self.index(title)
+
+    def _patched_copy(self, patches):
+        """Return a copy of the template with the patches applied.
+
+        Parameters
+        ----------
+        patches: iterable of ((target kind, target key), parameter name -> value)
+        """
+        models = self.simulation_data["models"]
+        patched_models = dict(models)
+        patched_beamline = None
+        for (target_kind, target_key), target_updates in patches:
+            if target_kind == "beamline":
+                if patched_beamline is None:
+                    patched_beamline = list(models["beamline"])
+                    patched_models["beamline"] = patched_beamline
+                patched_element = dict(models["beamline"][target_key])
+                patched_element.update(target_updates)
+                patched_beamline[target_key] = patched_element
+            else:
+                patched_model = dict(models[target_key])
+                patched_model.update(target_updates)
+                patched_models[target_key] = patched_model
+
+        patched_simulation_data = dict(self.simulation_data)
+        patched_simulation_data["models"] = patched_models
+        return patched_simulation_data
+
+    def apply_parameter_updates(self, parameter_updates):
+        """
+        Return a copy of the simulation data with the parameter updates applied.
+
+        Only the updated elements and models are copied, the rest are shared with
+        the template and must not be modified.
+
+        Parameters
+        ----------
+        parameter_updates: dict
+          beamline element title -> parameter name -> new value, for example
+            {"Aperture": {"horizontalSize": 0.1, "verticalSize": 0.2}}
+          a title that is not a beamline element may name a model, for example
+            {"simulation": {"photonEnergy": 8000}}
+        """
+        return self._patched_copy(
+            (self._patch_target(title), element_updates)
+            for title, element_updates in parameter_updates.items()
+        )
+
+    def parameter_columns(self, parameter_names):
+        """
+        Group parameter names by the element or model they patch.
+
+        Parameters
+        ----------
+        parameter_names: list of str
+          "<title>_<parameter name>" as in the "params" dataset of results.h5,
+          for example "Aperture_horizontalSize"
+
+        Returns
+        -------
+        list of (patch target, [(parameter name, column index), ...])
+        """
+        columns_by_target = {}
+        for column_i, full_parameter_name in enumerate(parameter_names):
+            # Sirepo parameter names are camelCase so the title is everything
+            #   before the last underscore
+            title, _, parameter_name = full_parameter_name.rpartition("_")
+            if not title:
+                raise ValueError(
+                    f"parameter name '{full_parameter_name}' is not '<title>_<parameter name>'"
+                )
+            columns_by_target.setdefault(self._patch_target(title), []).append(
+                (parameter_name, column_i)
+            )
+        return list(columns_by_target.items())
+
+    def apply_parameter_rows(self, parameter_names, parameter_rows):
+        """
+        Generate one copy of the simulation data for each row of parameter values.
+
+        The parameter names are resolved to elements once and each row only copies
+        the patched elements, so a sweep of many points does not copy or search
+        the full simulation data for each point.
+
+        Parameters
+        ----------
+        parameter_names: list of str
+          "<title>_<parameter name>" for each column, for example
+          ["Aperture_horizontalSize", "Aperture_verticalSize"]
+        parameter_rows: numpy.ndarray or list of lists
+          one row of parameter values for each point, the "paramVals" of results.h5
+
+        Yields
+        ------
+        simulation data for each row
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        parameter_columns = self.parameter_columns(parameter_names)
+        if isinstance(parameter_rows, np.ndarray):
+            if parameter_rows.ndim != 2 or parameter_rows.shape[1] != len(
+                parameter_names
+            ):
+                raise ValueError(
+                    f"parameter_rows has shape {parameter_rows.shape} but "
+                    f"{len(parameter_names)} parameter names were given"
+                )
+            # convert to Python numbers all at once, numpy scalars are not JSON serializable
+            parameter_rows = parameter_rows.tolist()
+        log.debug("patching %s", parameter_columns)
+
+        for parameter_row in parameter_rows:
+            yield self._patched_copy(
+                (
+                    patch_target,
+                    {
+                        parameter_name: parameter_row[column_i]
+                        for parameter_name, column_i in target_columns
+                    },
+                )
+                for patch_target, target_columns in parameter_columns
+            )
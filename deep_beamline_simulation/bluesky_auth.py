@@ -1,43 +1,73 @@
 import base64
 import hashlib
-import numconv
 import pprint
 import random
-import requests
+import string
 import time as ttime
 
-from pathlib import Path
-
-import deep_beamline_simulation
-
-# create session with requests
-session = requests.Session()
-
-# get cookies by viewing simulation-list
-response_sim_list = session.post(
-    "http://localhost:8000/simulation-list", json={"simulationType": "srw"}
-)
-# output of simulation list
-print(f"output from {response_sim_list.url}")
-pprint.pprint(dict(response_sim_list.headers))
-pprint.pprint(response_sim_list.json())
-input("press enter to continue")
-
-print("bluesky login")
-req = dict(simulationType="srw", simulationId="")
-r = random.SystemRandom()
-req["authNonce"] = (
-    str(int(ttime.time())) + "-" + "".join(r.choice(numconv.BASE62) for x in range(32))
-)
-h = hashlib.sha256()
-h.update(
-    ":".join(
-        [req["authNonce"], req["simulationType"], req["simulationId"], "bluesky"]
-    ).encode()
-)
-
-req["authHash"] = "v1:" + base64.urlsafe_b64encode(h.digest()).decode()
-
-# self.cookies = None
-# res = self._post_json('bluesky-auth', req)
-session.post("http://localhost:8000/bluesky-auth", data=req)
+import requests
+
+# the same characters as numconv.BASE62
+_BASE62 = string.digits + string.ascii_uppercase + string.ascii_lowercase
+
+# the default value of SIREPO_AUTH_BLUESKY_SECRET
+DEFAULT_BLUESKY_AUTH_SECRET = "bluesky"
+
+
+def new_auth_nonce():
+    """Return a nonce for the bluesky-auth endpoint, the server rejects old nonces."""
+    r = random.SystemRandom()
+    return str(int(ttime.time())) + "-" + "".join(r.choice(_BASE62) for x in range(32))
+
+
+def auth_hash(auth_nonce, simulation_type, simulation_id, secret):
+    """Return the authHash sirepo expects for a bluesky-auth request."""
+    h = hashlib.sha256()
+    h.update(":".join([auth_nonce, simulation_type, simulation_id, secret]).encode())
+    return "v1:" + base64.urlsafe_b64encode(h.digest()).decode()
+
+
+def bluesky_auth_request(
+    simulation_type, simulation_id, secret=DEFAULT_BLUESKY_AUTH_SECRET
+):
+    """
+    Return the JSON body of a bluesky-auth request.
+
+    Parameters
+    ----------
+    simulation_type: str
+      "srw" or "shadow"
+    simulation_id: str
+      a simulation on the server, the session is logged in as the owner of this simulation
+    secret: str
+      the server's SIREPO_AUTH_BLUESKY_SECRET
+    """
+    req = dict(simulationType=simulation_type, simulationId=simulation_id)
+    req["authNonce"] = new_auth_nonce()
+    req["authHash"] = auth_hash(
+        req["authNonce"], req["simulationType"], req["simulationId"], secret
+    )
+    return req
+
+
+def main():
+    # create session with requests
+    session = requests.Session()
+
+    # get cookies by viewing simulation-list
+    response_sim_list = session.post(
+        "http://localhost:8000/simulation-list", json={"simulationType": "srw"}
+    )
+    # output of simulation list
+    print(f"output from {response_sim_list.url}")
+    pprint.pprint(dict(response_sim_list.headers))
+    pprint.pprint(response_sim_list.json())
+    input("press enter to continue")
+
+    print("bluesky login")
+    req = bluesky_auth_request(simulation_type="srw", simulation_id="")
+    session.post("http://localhost:8000/bluesky-auth", data=req)
+
+
+if __name__ == "__main__":
+    main()
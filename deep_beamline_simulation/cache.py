@@ -0,0 +1,488 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import time as ttime
+
+from pathlib import Path
+
+import appdirs
+import numpy as np
+
+from .results import RESULT_ARRAY_KEYS
+
+
+def default_cache_dir():
+    """Return the per-user cache directory for deep-beamline-simulation."""
+    return Path(appdirs.user_cache_dir("deep-beamline-simulation"))
+
+
+class DiskLRUStore:
+    def __init__(self, cache_dir, suffix, max_entries=None, max_bytes=None):
+        """
+        A directory of files evicted least-recently-used first.
+
+        Entries are written to a temporary file and renamed into place so readers never
+        see a partial entry, and the modification time of an entry is updated when it
+        is read so it can serve as the "last used" time. Several processes may share
+        one directory; an entry evicted by one process is simply a miss for the others.
+
+        The number and total size of the entries are tracked as entries are written,
+        and the directory is only scanned when a limit is exceeded. Eviction then goes
+        a tenth below the limits so the next scan is many writes away. Entries written
+        by other processes are counted at the next scan.
+
+        Parameters
+        ----------
+        cache_dir: str or Path
+          directory for the entries, created if necessary
+        suffix: str
+          file name suffix for the entries, eg ".json"
+        max_entries: int, optional
+          evict the least recently used entries beyond this count
+        max_bytes: int, optional
+          evict the least recently used entries until the total size is below this
+        """
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.suffix = suffix
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+        # estimates of the entries in the directory, None until it is scanned
+        self._entry_count = None
+        self._total_bytes = None
+        self._estimate_lock = threading.Lock()
+
+    @staticmethod
+    def hash_key(*key_parts):
+        """Return a hex digest identifying the given strings."""
+        h = hashlib.sha256()
+        for key_part in key_parts:
+            h.update(str(key_part).encode())
+            # separate the parts so ("ab", "c") and ("a", "bc") differ
+            h.update(b"\0")
+        return h.hexdigest()
+
+    def entry_path(self, key):
+        return self.cache_dir / f"{key}{self.suffix}"
+
+    def read_bytes(self, key):
+        """Return the contents of an entry or None if there is no such entry."""
+        entry_path = self.entry_path(key)
+        try:
+            entry_bytes = entry_path.read_bytes()
+            # mark the entry as recently used
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        return entry_bytes
+
+    def write_bytes(self, key, entry_bytes):
+        """Write an entry, replacing any existing entry with the same key."""
+        entry_path = self.entry_path(key)
+        replaced_size = self._entry_size(entry_path)
+        entry_fd, entry_tmp_path = tempfile.mkstemp(
+            dir=self.cache_dir, prefix=".tmp-", suffix=self.suffix
+        )
+        try:
+            with os.fdopen(entry_fd, "wb") as entry_file:
+                entry_file.write(entry_bytes)
+            os.replace(entry_tmp_path, entry_path)
+        except BaseException:
+            os.unlink(entry_tmp_path)
+            raise
+
+        if replaced_size is None:
+            self._update_estimates(1, len(entry_bytes))
+        else:
+            self._update_estimates(0, len(entry_bytes) - replaced_size)
+        if self._exceeds_limits():
+            self.evict()
+
+    def delete(self, key):
+        entry_path = self.entry_path(key)
+        entry_size = self._entry_size(entry_path)
+        try:
+            entry_path.unlink()
+        except FileNotFoundError:
+            return
+        if entry_size is not None:
+            self._update_estimates(-1, -entry_size)
+
+    @staticmethod
+    def _entry_size(entry_path):
+        try:
+            return entry_path.stat().st_size
+        except FileNotFoundError:
+            return None
+
+    def _update_estimates(self, entry_count_change, total_bytes_change):
+        with self._estimate_lock:
+            if self._entry_count is not None:
+                self._entry_count += entry_count_change
+                self._total_bytes += total_bytes_change
+
+    def _exceeds_limits(self):
+        """Return True if the estimates exceed a limit or the directory has not been scanned."""
+        if self.max_entries is None and self.max_bytes is None:
+            return False
+        with self._estimate_lock:
+            if self._entry_count is None:
+                return True
+            return (
+                self.max_entries is not None and self._entry_count > self.max_entries
+            ) or (self.max_bytes is not None and self._total_bytes > self.max_bytes)
+
+    def evict(self):
+        """Delete least recently used entries until the size limits are satisfied.
+
+        Entries beyond the limits are deleted, and then more until a tenth of
+        each limit is free.
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        if self.max_entries is None and self.max_bytes is None:
+            return
+
+        entries = []
+        for entry_path in self.cache_dir.glob(f"*{self.suffix}"):
+            if entry_path.name.startswith(".tmp-"):
+                continue
+            try:
+                entry_stat = entry_path.stat()
+            except FileNotFoundError:
+                # another process evicted this entry
+                continue
+            entries.append((entry_stat.st_mtime, entry_stat.st_size, entry_path))
+
+        # most recently used first
+        entries.sort(reverse=True)
+        max_entries = self.max_entries
+        max_bytes = self.max_bytes
+        # once a limit is exceeded go a tenth below the limits, so the directory is
+        #   not scanned again on every write while the cache is full
+        if (max_entries is not None and len(entries) > max_entries) or (
+            max_bytes is not None
+            and sum(entry_size for _, entry_size, _ in entries) > max_bytes
+        ):
+            if max_entries is not None:
+                max_entries -= max_entries // 10
+            if max_bytes is not None:
+                max_bytes -= max_bytes // 10
+
+        entry_count = 0
+        total_bytes = 0
+        kept_entry_count = 0
+        kept_total_bytes = 0
+        for _, entry_size, entry_path in entries:
+            entry_count += 1
+            total_bytes += entry_size
+            if (max_entries is not None and entry_count > max_entries) or (
+                max_bytes is not None and total_bytes > max_bytes
+            ):
+                log.debug("evicting '%s'", entry_path)
+                try:
+                    entry_path.unlink()
+                except FileNotFoundError:
+                    pass
+            else:
+                kept_entry_count = entry_count
+                kept_total_bytes = total_bytes
+
+        with self._estimate_lock:
+            self._entry_count = kept_entry_count
+            self._total_bytes = kept_total_bytes
+
+    def clear(self):
+        for entry_path in self.cache_dir.glob(f"*{self.suffix}"):
+            try:
+                entry_path.unlink()
+            except FileNotFoundError:
+                pass
+        with self._estimate_lock:
+            self._entry_count = 0
+            self._total_bytes = 0
+
+
+class SirepoResponseCache(DiskLRUStore):
+    def __init__(self, cache_dir=None, ttl_seconds=24 * 60 * 60, max_entries=256):
+        """
+        Store `simulation-list` and `simulation` responses on disk.
+
+        Each Sirepo user has its own simulations and simulation ids, so entries are
+        keyed by server and user as well as endpoint and simulation id, and one user's
+        simulation list is never returned to another.
+
+        The cache only helps sessions in the "bluesky" login mode, or "guest"
+        sessions logging in with the cookies of an earlier session. A session in the
+        default "guest" login mode is a new guest user with a new uid on every login,
+        so a later run finds nothing stored for it unless the cookies of the earlier
+        session are passed to `SirepoGuestSession.login`. Sessions in the "bluesky"
+        login mode log in as the owner of their simulation and share responses across
+        runs. For example:
+
+            response_cache = SirepoResponseCache(ttl_seconds=60 * 60)
+            with SirepoGuestSession(
+                sirepo_server_url="http://localhost:8000",
+                simulation_type="srw",
+                response_cache=response_cache,
+                login_mode="bluesky",
+                bluesky_simulation_id="...",
+            ) as sirepo_session:
+                ...
+
+        A stored `simulation` response is not trusted on its own: the session only
+        uses it while its simulationSerial matches the serial in a simulation list
+        received from the server, so an edited simulation is fetched again. The login
+        handshake of a guest with still valid cookies receives the simulation list,
+        so a warm start makes no `simulation-list` or `simulation` round trips.
+
+        Parameters
+        ----------
+        cache_dir: str or Path, optional
+          by default a "responses" directory in the per-user cache directory
+        ttl_seconds: float
+          entries older than this are ignored and replaced
+        max_entries: int
+          the number of responses to keep
+        """
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / "responses"
+        super().__init__(cache_dir=cache_dir, suffix=".json", max_entries=max_entries)
+        self.ttl_seconds = ttl_seconds
+
+    def get(self, server_url, user, simulation_type, endpoint, simulation_id=""):
+        """Return a stored response JSON or None if it is missing or expired.
+
+        Parameters
+        ----------
+        server_url: str
+          eg. "http://localhost:8000"
+        user: str
+          identifies the logged-in Sirepo user, eg. its uid
+        simulation_type: str
+          "srw" or "shadow"
+        endpoint: str
+          "simulation-list" or "simulation"
+        simulation_id: str
+          the simulation id of a "simulation" response
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        key = self.hash_key(server_url, user, simulation_type, endpoint, simulation_id)
+        entry_bytes = self.read_bytes(key)
+        if entry_bytes is None:
+            log.debug("cache miss for %s '%s'", endpoint, simulation_id)
+            return None
+
+        try:
+            entry = json.loads(entry_bytes)
+        except ValueError:
+            log.warning("ignoring unreadable cache entry '%s'", self.entry_path(key))
+            return None
+        if ttime.time() - entry["created"] > self.ttl_seconds:
+            log.debug("expired cache entry for %s '%s'", endpoint, simulation_id)
+            return None
+
+        log.debug("cache hit for %s '%s'", endpoint, simulation_id)
+        return entry["response"]
+
+    def put(
+        self,
+        server_url,
+        user,
+        simulation_type,
+        endpoint,
+        response_json,
+        simulation_id="",
+    ):
+        """Store a response JSON, the other parameters are as for `get`."""
+        key = self.hash_key(server_url, user, simulation_type, endpoint, simulation_id)
+        self.write_bytes(
+            key,
+            json.dumps({"created": ttime.time(), "response": response_json}).encode(),
+        )
+
+    def invalidate(self, server_url, user, simulation_type, endpoint, simulation_id=""):
+        """Remove a stored response so the next request goes to the server."""
+        self.delete(
+            self.hash_key(server_url, user, simulation_type, endpoint, simulation_id)
+        )
+
+
+class SirepoImportIndex(DiskLRUStore):
+    def __init__(self, cache_dir=None, max_entries=4096):
+        """
+        Remember which simulation each imported archive became.
+
+        Entries are keyed by server, simulation type, folder and the SHA-256 of the
+        archive, so importing an identical archive again can be skipped. An entry is
+        only a hint: the caller must check the simulation still exists on the server.
+
+        Parameters
+        ----------
+        cache_dir: str or Path, optional
+          by default an "imports" directory in the per-user cache directory
+        max_entries: int
+          the number of imports to remember
+        """
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / "imports"
+        super().__init__(cache_dir=cache_dir, suffix=".json", max_entries=max_entries)
+
+    def get(self, server_url, simulation_type, folder, archive_hash):
+        """Return the stored entry, a dictionary with "simulationId", or None."""
+        log = logging.getLogger(self.__class__.__name__)
+
+        key = self.hash_key(server_url, simulation_type, folder, archive_hash)
+        entry_bytes = self.read_bytes(key)
+        if entry_bytes is None:
+            return None
+        try:
+            return json.loads(entry_bytes)
+        except ValueError:
+            log.warning("ignoring unreadable import entry '%s'", self.entry_path(key))
+            return None
+
+    def put(self, server_url, simulation_type, folder, archive_hash, entry):
+        key = self.hash_key(server_url, simulation_type, folder, archive_hash)
+        self.write_bytes(key, json.dumps(entry).encode())
+
+
+# these change whenever a simulation is saved or copied but do not change its results
+_VOLATILE_SIMULATION_KEYS = (
+    "lastModified",
+    "outOfSessionSimulationId",
+    "simulationId",
+    "simulationSerial",
+)
+_VOLATILE_REQUEST_KEYS = (
+    "computeJobHash",
+    "computeJobSerial",
+    "report",
+    "simulationId",
+)
+
+
+def canonical_simulation_json(simulation_data, simulation_report):
+    """Return a JSON string that is the same for simulations that must give the same result.
+
+    Keys are sorted and fields that identify a particular copy of a simulation,
+    such as its id and modification time, are removed.
+    """
+    simulation_data = {
+        key: value
+        for key, value in simulation_data.items()
+        if key not in _VOLATILE_REQUEST_KEYS
+    }
+    if "simulation" in simulation_data.get("models", {}):
+        simulation_data["models"] = dict(simulation_data["models"])
+        simulation_data["models"]["simulation"] = {
+            key: value
+            for key, value in simulation_data["models"]["simulation"].items()
+            if key not in _VOLATILE_SIMULATION_KEYS
+        }
+    return json.dumps(
+        {"report": simulation_report, "data": simulation_data},
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+
+
+class SirepoResultCache(DiskLRUStore):
+    def __init__(self, cache_dir=None, max_bytes=10 * 1024**3):
+        """
+        Store completed simulation results on disk addressed by their inputs.
+
+        A result is stored under a hash of the canonical simulation data and report name
+        (see `canonical_simulation_json`) so an identical parameter point computed
+        by any session or process is found regardless of the simulation id it ran under.
+        Numeric data ("z_matrix", "points") is stored as NumPy arrays in a .npz file
+        along with the rest of the run-status response. A "z_matrix" or "points"
+        that is not a numeric array, such as a ragged list or a list with None,
+        is stored with the rest of the response and returned as it was given.
+
+        Parameters
+        ----------
+        cache_dir: str or Path, optional
+          by default a "results" directory in the per-user cache directory
+        max_bytes: int
+          the least recently used results are evicted to keep the cache below this size
+        """
+        if cache_dir is None:
+            cache_dir = default_cache_dir() / "results"
+        super().__init__(cache_dir=cache_dir, suffix=".npz", max_bytes=max_bytes)
+
+    def result_key(self, simulation_type, simulation_data, simulation_report):
+        return self.hash_key(
+            simulation_type,
+            canonical_simulation_json(simulation_data, simulation_report),
+        )
+
+    def get(self, simulation_type, simulation_data, simulation_report):
+        """Return a stored result or None.
+
+        The result is the completed run-status response with "z_matrix" and
+        "points", if present, as NumPy arrays.
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        key = self.result_key(simulation_type, simulation_data, simulation_report)
+        entry_bytes = self.read_bytes(key)
+        if entry_bytes is None:
+            log.debug("result cache miss for '%s'", simulation_report)
+            return None
+
+        try:
+            with np.load(io.BytesIO(entry_bytes), allow_pickle=False) as entry:
+                result = json.loads(str(entry["metadata"]))
+                for array_key in RESULT_ARRAY_KEYS:
+                    if array_key in entry:
+                        result[array_key] = entry[array_key]
+        except (ValueError, OSError, KeyError):
+            log.warning("ignoring unreadable result '%s'", self.entry_path(key))
+            return None
+
+        log.debug("result cache hit for '%s'", simulation_report)
+        return result
+
+    def put(self, simulation_type, simulation_data, simulation_report, result):
+        """Store a decoded run-status response, such as `SirepoRunResult.run_status`."""
+        metadata = {
+            key: value for key, value in result.items() if key not in RESULT_ARRAY_KEYS
+        }
+        arrays = {}
+        for array_key in RESULT_ARRAY_KEYS:
+            if array_key not in result:
+                continue
+            array = _numeric_array(result[array_key])
+            if array is None:
+                # a ragged or None-valued field would need pickling, keep it as JSON
+                value = result[array_key]
+                metadata[array_key] = (
+                    value.tolist() if isinstance(value, np.ndarray) else value
+                )
+            else:
+                arrays[array_key] = array
+        entry_buffer = io.BytesIO()
+        np.savez(entry_buffer, metadata=np.array(json.dumps(metadata)), **arrays)
+        self.write_bytes(
+            self.result_key(simulation_type, simulation_data, simulation_report),
+            entry_buffer.getvalue(),
+        )
+
+
+def _numeric_array(value):
+    """Return value as a numeric NumPy array or None if it is not one."""
+    try:
+        array = np.asarray(value)
+    except ValueError:
+        # a ragged list
+        return None
+    if array.dtype.kind not in "biufc":
+        return None
+    return array
@@ -0,0 +1,253 @@
+import bisect
+import fnmatch
+import logging
+
+# characters with a special meaning in glob patterns
+_GLOB_CHARACTERS = "*?["
+
+
+class SimulationCatalog:
+    def __init__(self, sim_list_results=()):
+        """
+        Indexes of Sirepo `simulation-list` results by simulation id, name and folder.
+
+        For example:
+
+            simulation_catalog = sirepo_session.simulation_catalog()
+            simulation_id = simulation_catalog.simulation_id("NSLS-II SRX beamline")
+            for sim_details in simulation_catalog.search("NSLS-II*beamline"):
+                ...
+
+        The catalog is built once and `update` only re-indexes simulations that were
+        added, removed, or changed, as indicated by their simulationSerial.
+
+        Parameters
+        ----------
+        sim_list_results: list of dict
+          the JSON of a `simulation-list` response
+        """
+        # simulation id -> simulation-list entry
+        self._by_id = {}
+        # simulation id -> simulationSerial
+        self._serials = {}
+        # name -> list of simulation ids
+        self._ids_by_name = {}
+        # folder -> {name -> simulation id}
+        self._ids_by_folder = {}
+        # built when needed and discarded when the catalog changes
+        self._sorted_names = None
+        self._folder_table = None
+
+        self.update(sim_list_results)
+
+    def update(self, sim_list_results):
+        """
+        Bring the catalog up to date with new `simulation-list` results.
+
+        Returns
+        -------
+        (added count, changed count, removed count)
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        added_count = 0
+        changed_count = 0
+        listed_ids = set()
+        for sim_details in sim_list_results:
+            simulation_id = sim_details["simulationId"]
+            listed_ids.add(simulation_id)
+            simulation_serial = _simulation_serial(sim_details)
+            if simulation_id not in self._by_id:
+                added_count += 1
+            elif (
+                simulation_serial is not None
+                and simulation_serial == self._serials[simulation_id]
+                and sim_details["name"] == self._by_id[simulation_id]["name"]
+                and sim_details["folder"] == self._by_id[simulation_id]["folder"]
+            ):
+                continue
+            else:
+                changed_count += 1
+                self._remove(simulation_id)
+            self._add(sim_details)
+
+        removed_ids = self._by_id.keys() - listed_ids
+        for simulation_id in removed_ids:
+            self._remove(simulation_id)
+
+        if added_count or changed_count or removed_ids:
+            self._sorted_names = None
+            self._folder_table = None
+        log.debug(
+            "%d added, %d changed, %d removed simulation(s)",
+            added_count,
+            changed_count,
+            len(removed_ids),
+        )
+        return added_count, changed_count, len(removed_ids)
+
+    def _add(self, sim_details):
+        simulation_id = sim_details["simulationId"]
+        self._by_id[simulation_id] = sim_details
+        self._serials[simulation_id] = _simulation_serial(sim_details)
+        self._ids_by_name.setdefault(sim_details["name"], []).append(simulation_id)
+        self._ids_by_folder.setdefault(sim_details["folder"], {})[
+            sim_details["name"]
+        ] = simulation_id
+
+    def _remove(self, simulation_id):
+        sim_details = self._by_id.pop(simulation_id)
+        del self._serials[simulation_id]
+
+        name_ids = self._ids_by_name[sim_details["name"]]
+        name_ids.remove(simulation_id)
+        if not name_ids:
+            del self._ids_by_name[sim_details["name"]]
+
+        folder_ids = self._ids_by_folder[sim_details["folder"]]
+        if folder_ids.get(sim_details["name"]) == simulation_id:
+            # another simulation in the folder may have the same name,
+            #   as in simulation_list the one added last takes the entry
+            sibling_ids = [
+                sibling_id
+                for sibling_id in name_ids
+                if self._by_id[sibling_id]["folder"] == sim_details["folder"]
+            ]
+            if sibling_ids:
+                folder_ids[sim_details["name"]] = sibling_ids[-1]
+            else:
+                del folder_ids[sim_details["name"]]
+        if not folder_ids:
+            del self._ids_by_folder[sim_details["folder"]]
+
+    def __len__(self):
+        return len(self._by_id)
+
+    def __contains__(self, simulation_id):
+        return simulation_id in self._by_id
+
+    def __iter__(self):
+        """Iterate over the `simulation-list` entries."""
+        return iter(self._by_id.values())
+
+    def by_id(self, simulation_id):
+        """Return the `simulation-list` entry for a simulation id or raise KeyError."""
+        return self._by_id[simulation_id]
+
+    def by_name(self, name):
+        """Return the `simulation-list` entries with the given name, in any folder."""
+        return [
+            self._by_id[simulation_id]
+            for simulation_id in self._ids_by_name.get(name, ())
+        ]
+
+    def in_folder(self, folder, recursive=False):
+        """Return the `simulation-list` entries in a folder, and in subfolders if recursive."""
+        folder = "/" + folder.strip("/")
+        if recursive:
+            folders = [
+                catalog_folder
+                for catalog_folder in self._ids_by_folder
+                if catalog_folder == folder
+                or catalog_folder.startswith(folder.rstrip("/") + "/")
+            ]
+        else:
+            folders = [folder] if folder in self._ids_by_folder else []
+        return [
+            self._by_id[simulation_id]
+            for catalog_folder in folders
+            for simulation_id in self._ids_by_folder[catalog_folder].values()
+        ]
+
+    def simulation_id(self, name, folder=None):
+        """
+        Return the id of the simulation with the given name.
+
+        Parameters
+        ----------
+        name: str
+          the simulation name
+        folder: str, optional
+          the simulation folder, required if the name is used in more than one folder
+
+        Raises
+        ------
+        KeyError if there is no such simulation
+        ValueError if folder is not specified and more than one simulation has the name
+        """
+        if folder is not None:
+            return self._ids_by_folder["/" + folder.strip("/")][name]
+
+        simulation_ids = self._ids_by_name[name]
+        if len(simulation_ids) > 1:
+            folders = sorted(
+                self._by_id[simulation_id]["folder"] for simulation_id in simulation_ids
+            )
+            raise ValueError(f"simulation name '{name}' is used in folders {folders}")
+        return simulation_ids[0]
+
+    def search(self, pattern):
+        """
+        Return the `simulation-list` entries whose name matches a glob pattern.
+
+        A pattern containing "/" is matched against "<folder>/<name>" instead, for
+        example "/Light Source Facilities/NSLS-II/*". A pattern such as "NSLS-II*"
+        with a single trailing "*" is a prefix search and does not scan every name.
+        """
+        if "/" in pattern:
+            return [
+                sim_details
+                for sim_details in self._by_id.values()
+                if fnmatch.fnmatchcase(
+                    f"{sim_details['folder'].rstrip('/')}/{sim_details['name']}",
+                    pattern,
+                )
+            ]
+
+        prefix = pattern[:-1]
+        if pattern.endswith("*") and not any(
+            glob_character in prefix for glob_character in _GLOB_CHARACTERS
+        ):
+            sorted_names = self._sorted_name_list()
+            name_i = bisect.bisect_left(sorted_names, prefix)
+            matching_names = []
+            while name_i < len(sorted_names) and sorted_names[name_i].startswith(
+                prefix
+            ):
+                matching_names.append(sorted_names[name_i])
+                name_i += 1
+        else:
+            matching_names = [
+                name
+                for name in self._sorted_name_list()
+                if fnmatch.fnmatchcase(name, pattern)
+            ]
+
+        return [
+            sim_details
+            for matching_name in matching_names
+            for sim_details in self.by_name(matching_name)
+        ]
+
+    def _sorted_name_list(self):
+        if self._sorted_names is None:
+            self._sorted_names = sorted(self._ids_by_name)
+        return self._sorted_names
+
+    def folder_table(self):
+        """
+        Return the folder -> name -> simulation id dictionary returned by
+        SirepoGuestSession.simulation_list.
+
+        The dictionary is kept until the catalog changes and must not be modified.
+        """
+        if self._folder_table is None:
+            self._folder_table = {
+                folder: dict(self._ids_by_folder[folder])
+                for folder in sorted(self._ids_by_folder)
+            }
+        return self._folder_table
+
+
+def _simulation_serial(sim_details):
+    return sim_details.get("simulation", {}).get("simulationSerial")
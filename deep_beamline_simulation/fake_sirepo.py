@@ -0,0 +1,682 @@
+import collections
+import copy
+import email.parser
+import email.policy
+import io
+import json
+import logging
+import random
+import string
+import threading
+import time as ttime
+import zipfile
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+
+from .bluesky_auth import DEFAULT_BLUESKY_AUTH_SECRET, auth_hash
+
+_SRX_SIMULATION_DATA_PATH = (
+    Path(__file__).parent / "test_data" / "sirepo-simulation-data-srx.json"
+)
+
+_SIMULATION_ID_CHARACTERS = string.ascii_letters + string.digits
+
+
+def _aperture_simulation_data(simulation_id, name, folder):
+    """Return a small simulation with an aperture and a watchpoint."""
+    return {
+        "models": {
+            "beamline": [
+                {
+                    "horizontalOffset": 0,
+                    "horizontalSize": 0.2,
+                    "id": 5,
+                    "position": 20,
+                    "shape": "r",
+                    "title": "Aperture",
+                    "type": "aperture",
+                    "verticalOffset": 0,
+                    "verticalSize": 1,
+                },
+                {"id": 6, "position": 25, "title": "Watchpoint", "type": "watch"},
+            ],
+            "simulation": {
+                "folder": folder,
+                "horizontalPointCount": 100,
+                "isExample": True,
+                "name": name,
+                "photonEnergy": 9000,
+                "simulationId": simulation_id,
+                "simulationSerial": 1,
+                "verticalPointCount": 100,
+            },
+        },
+        "simulationType": "srw",
+    }
+
+
+class FakeSirepoServer:
+    def __init__(
+        self,
+        run_seconds=0.5,
+        latency_seconds=0.0,
+        max_running_simulations=None,
+        next_request_seconds=1,
+        host="127.0.0.1",
+        port=0,
+    ):
+        """
+        An in-process stand-in for a Sirepo server.
+
+        The server implements the endpoints used by this package, `simulation-list`,
+        `auth-guest-login`, `bluesky-auth`, `simulation`, `copy-simulation`,
+        `delete-simulation`, `run-simulation`, `run-status`, `run-cancel` and
+        `import-file`, with
+        synthetic results, so clients can be tested and benchmarked without Docker
+        or a network:
+
+            with FakeSirepoServer(run_seconds=0.1) as fake_sirepo_server:
+                with SirepoGuestSession(
+                    sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+                ) as sirepo_session:
+                    ...
+
+        As with Sirepo, each guest user gets copies of the example simulations with
+        new random ids and can only see and run its own simulations, so a simulation
+        id from one session is "not found" in a session of another user.
+
+        As with Sirepo, a user has one job for each simulation and report, so
+        a run-simulation for a simulation and report that already has a running
+        job cancels that job and its run-status state becomes "canceled".
+
+        Simulations are not computed. A "watchpointReport<id>" result is a Gaussian
+        intensity image whose width scales with the sizes of the apertures before
+        the watchpoint and any other report result is a list of "points".
+
+        Parameters
+        ----------
+        run_seconds: float or callable
+          how long a simulation takes, or a function of (simulation_data, report) returning
+          how long a simulation takes
+        latency_seconds: float
+          added to the response time of every request
+        max_running_simulations: int, optional
+          simulations beyond this number wait in the "pending" state for a free slot,
+          by default there is no limit
+        next_request_seconds: float
+          the nextRequestSeconds suggested by run-simulation and run-status responses
+        host: str
+          the interface to listen on
+        port: int
+          the port to listen on, by default any free port
+        """
+        self.run_seconds = run_seconds
+        self.latency_seconds = latency_seconds
+        self.max_running_simulations = max_running_simulations
+        self.next_request_seconds = next_request_seconds
+
+        self.request_counts = collections.Counter()
+        self.connection_count = 0
+
+        self._lock = threading.Lock()
+        # simulations copied for each new user
+        self._example_simulations = []
+        # uid -> simulation id -> simulation data
+        self._user_simulations = {}
+        # simulation id -> uid of the owner, simulation ids are unique across users
+        self._simulation_owners = {}
+        # cookie -> uid, or None before the first login
+        self._cookies = {}
+        # cookies of logged-in users
+        self._logged_in_cookies = set()
+        # compute job hash -> _FakeSimulationJob
+        self._jobs = {}
+        # (uid, simulation id, report) -> compute job hash of the latest job
+        self._job_hashes = {}
+        # the time at which each simulation slot becomes free
+        self._free_slot_times = []
+
+        self.add_simulation(
+            _aperture_simulation_data(
+                self.new_simulation_id(),
+                name="Diffraction by an Aperture",
+                folder="/Wavefront Propagation",
+            )
+        )
+        self.add_simulation(
+            _aperture_simulation_data(
+                self.new_simulation_id(),
+                name="NSLS-II TES beamline",
+                folder="/Light Source Facilities/NSLS-II/NSLS-II TES beamline",
+            )
+        )
+        if _SRX_SIMULATION_DATA_PATH.exists():
+            self.add_simulation(json.loads(_SRX_SIMULATION_DATA_PATH.read_text()))
+
+        self._http_server = ThreadingHTTPServer((host, port), _FakeSirepoRequestHandler)
+        self._http_server.daemon_threads = True
+        self._http_server.fake_sirepo_server = self
+        self._http_server_thread = None
+
+    @property
+    def url(self):
+        host, port = self._http_server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._http_server_thread = threading.Thread(
+            target=self._http_server.serve_forever, daemon=True
+        )
+        self._http_server_thread.start()
+        return self
+
+    def stop(self):
+        self._http_server.shutdown()
+        self._http_server.server_close()
+        self._http_server_thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+        return False
+
+    def new_simulation_id(self):
+        while True:
+            simulation_id = "".join(random.choices(_SIMULATION_ID_CHARACTERS, k=8))
+            if simulation_id not in self._simulation_owners:
+                return simulation_id
+
+    def new_user(self):
+        """Create a user with copies of the example simulations and return its uid."""
+        with self._lock:
+            uid = self.new_simulation_id()
+            while uid in self._user_simulations:
+                uid = self.new_simulation_id()
+            self._user_simulations[uid] = {}
+            example_simulations = list(self._example_simulations)
+        for example_simulation_data in example_simulations:
+            self._add_user_simulation(uid, example_simulation_data)
+        return uid
+
+    def add_simulation(self, simulation_data, uid=None):
+        """Add a simulation for a user, or an example simulation if uid is None.
+
+        Every user, including existing users, gets a copy of an example simulation
+        with a new id. A user's simulation is identified by
+        models.simulation.simulationId.
+        """
+        if uid is not None:
+            return self._add_user_simulation(uid, simulation_data)
+
+        with self._lock:
+            self._example_simulations.append(copy.deepcopy(simulation_data))
+            uids = list(self._user_simulations)
+        for existing_uid in uids:
+            self._add_user_simulation(existing_uid, simulation_data)
+        return simulation_data
+
+    def _add_user_simulation(self, uid, simulation_data):
+        """Add a copy of a simulation with a new id for a user."""
+        simulation_data = copy.deepcopy(simulation_data)
+        with self._lock:
+            simulation_data["models"]["simulation"][
+                "simulationId"
+            ] = self.new_simulation_id()
+            simulation_id = simulation_data["models"]["simulation"]["simulationId"]
+            self._user_simulations[uid][simulation_id] = simulation_data
+            self._simulation_owners[simulation_id] = uid
+        return simulation_data
+
+    def expire_logins(self):
+        """Log out every client, as happens when a Sirepo server is restarted.
+
+        A client logging in again with its cookie is the same user as before.
+        """
+        with self._lock:
+            self._logged_in_cookies.clear()
+
+    def simulation_owner(self, simulation_id):
+        """Return the uid of the user with a simulation id, or None."""
+        with self._lock:
+            return self._simulation_owners.get(simulation_id)
+
+    def simulation_list(self, uid):
+        with self._lock:
+            return [
+                {
+                    "simulationId": simulation_id,
+                    "name": simulation_data["models"]["simulation"]["name"],
+                    "folder": simulation_data["models"]["simulation"]["folder"],
+                    "isExample": simulation_data["models"]["simulation"].get(
+                        "isExample", False
+                    ),
+                    "simulation": simulation_data["models"]["simulation"],
+                }
+                for simulation_id, simulation_data in self._user_simulations[
+                    uid
+                ].items()
+            ]
+
+    def simulation_data(self, uid, simulation_id):
+        with self._lock:
+            return self._user_simulations[uid].get(simulation_id)
+
+    def copy_simulation(self, uid, simulation_id, name, folder):
+        simulation_data = self.simulation_data(uid, simulation_id)
+        if simulation_data is None:
+            return None
+        simulation_data = copy.deepcopy(simulation_data)
+        simulation_data["models"]["simulation"].update(
+            {"name": name, "folder": folder, "isExample": False}
+        )
+        return self._add_user_simulation(uid, simulation_data)
+
+    def delete_simulation(self, uid, simulation_id):
+        with self._lock:
+            if self._user_simulations[uid].pop(simulation_id, None) is not None:
+                del self._simulation_owners[simulation_id]
+
+    def run_simulation(self, uid, simulation_data):
+        if self.simulation_data(uid, simulation_data["simulationId"]) is None:
+            return {"state": "error", "error": "simulation not found"}
+
+        if callable(self.run_seconds):
+            run_seconds = self.run_seconds(simulation_data, simulation_data["report"])
+        else:
+            run_seconds = self.run_seconds
+
+        now = ttime.monotonic()
+        with self._lock:
+            # simulations start in order of submission as slots become free
+            if self.max_running_simulations is None:
+                start_time = now
+            elif len(self._free_slot_times) < self.max_running_simulations:
+                start_time = now
+                self._free_slot_times.append(start_time + run_seconds)
+            else:
+                slot_i = int(np.argmin(self._free_slot_times))
+                start_time = max(now, self._free_slot_times[slot_i])
+                self._free_slot_times[slot_i] = start_time + run_seconds
+
+            # sirepo keeps one job per simulation and report, a new run replaces it
+            job_key = (uid, simulation_data["simulationId"], simulation_data["report"])
+            replaced_job_hash = self._job_hashes.get(job_key)
+            if replaced_job_hash is not None:
+                self._jobs[replaced_job_hash].cancel(now)
+
+            compute_job_hash = f"{len(self._jobs)}-{self.new_simulation_id()}"
+            self._jobs[compute_job_hash] = _FakeSimulationJob(
+                simulation_data=simulation_data,
+                start_time=start_time,
+                end_time=start_time + run_seconds,
+            )
+            self._job_hashes[job_key] = compute_job_hash
+
+        return self.run_status(
+            {
+                "computeJobHash": compute_job_hash,
+                "report": simulation_data["report"],
+                "simulationId": simulation_data["simulationId"],
+                "simulationType": simulation_data.get("simulationType", "srw"),
+            }
+        )
+
+    def cancel_simulation(self, uid, simulation_id, report):
+        """Cancel the job of a simulation and report, as the run-cancel endpoint does.
+
+        Returns
+        -------
+        True if a job was running
+        """
+        now = ttime.monotonic()
+        with self._lock:
+            compute_job_hash = self._job_hashes.get((uid, simulation_id, report))
+            if compute_job_hash is None:
+                return False
+            return self._jobs[compute_job_hash].cancel(now)
+
+    def cancel_running_simulations(self):
+        """Cancel every job that has not completed and return the number of jobs canceled."""
+        now = ttime.monotonic()
+        with self._lock:
+            return sum(
+                simulation_job.cancel(now) for simulation_job in self._jobs.values()
+            )
+
+    def run_status(self, next_request):
+        with self._lock:
+            simulation_job = self._jobs.get(next_request.get("computeJobHash"))
+        if simulation_job is None:
+            return {"state": "error", "error": "unknown compute job"}
+
+        now = ttime.monotonic()
+        if simulation_job.canceled:
+            return {"state": "canceled"}
+        elif now < simulation_job.start_time:
+            state = "pending"
+        elif now < simulation_job.end_time:
+            state = "running"
+        else:
+            return simulation_job.result()
+
+        return {
+            "state": state,
+            "nextRequest": next_request,
+            "nextRequestSeconds": self.next_request_seconds,
+        }
+
+    def import_file(self, uid, file_name, file_bytes, folder):
+        if file_name.endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(file_bytes)) as simulation_zip:
+                # skip the resource forks macOS adds to zip files
+                (sirepo_data_member,) = [
+                    member_name
+                    for member_name in simulation_zip.namelist()
+                    if member_name.endswith("sirepo-data.json")
+                    and not member_name.startswith("__MACOSX")
+                ]
+                simulation_data = json.loads(simulation_zip.read(sirepo_data_member))
+        else:
+            simulation_data = json.loads(file_bytes)
+
+        simulation_data["models"]["simulation"]["folder"] = folder
+        simulation_data["models"]["simulation"]["isExample"] = False
+        return self._add_user_simulation(uid, simulation_data)
+
+
+class _FakeSimulationJob:
+    def __init__(self, simulation_data, start_time, end_time):
+        self.simulation_data = simulation_data
+        self.start_time = start_time
+        self.end_time = end_time
+        self.canceled = False
+
+    def cancel(self, now):
+        """Cancel the job unless it has completed, return True if it was canceled."""
+        if self.canceled or now >= self.end_time:
+            return False
+        self.canceled = True
+        return True
+
+    def result(self):
+        report = self.simulation_data["report"]
+        simulation = self.simulation_data["models"].get("simulation", {})
+        horizontal_point_count = int(simulation.get("horizontalPointCount", 100))
+        vertical_point_count = int(simulation.get("verticalPointCount", 100))
+
+        if not report.startswith("watchpointReport"):
+            x = np.linspace(-1.0, 1.0, horizontal_point_count)
+            return {
+                "state": "completed",
+                "title": report,
+                "x_label": "Horizontal Position [mm]",
+                "y_label": "Intensity",
+                "x_range": [-1.0, 1.0],
+                "points": np.exp(-(x**2)).tolist(),
+            }
+
+        # the beam is narrowed by each aperture before the watchpoint
+        watchpoint_id = int(report.replace("watchpointReport", "", 1))
+        horizontal_width = 1.0
+        vertical_width = 1.0
+        for beamline_element in self.simulation_data["models"].get("beamline", []):
+            if beamline_element["id"] == watchpoint_id:
+                break
+            if beamline_element["type"] == "aperture":
+                horizontal_width *= float(beamline_element["horizontalSize"])
+                vertical_width *= float(beamline_element["verticalSize"])
+
+        x = np.linspace(-1.0, 1.0, horizontal_point_count)
+        y = np.linspace(-1.0, 1.0, vertical_point_count)
+        z_matrix = 1e12 * np.exp(
+            -((x[np.newaxis, :] / horizontal_width) ** 2)
+            - (y[:, np.newaxis] / vertical_width) ** 2
+        )
+        return {
+            "state": "completed",
+            "title": report,
+            "x_label": "Horizontal Position [m]",
+            "y_label": "Vertical Position [m]",
+            "z_label": "Intensity [ph/s/.1%bw/mm^2]",
+            "x_range": [-1e-3, 1e-3, horizontal_point_count],
+            "y_range": [-1e-3, 1e-3, vertical_point_count],
+            "z_matrix": z_matrix.tolist(),
+            "summaryData": {
+                "fieldIntensityRange": [float(z_matrix.min()), float(z_matrix.max())]
+            },
+        }
+
+
+class _FakeSirepoRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # send headers and body together rather than waiting on delayed acknowledgements
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    cookie_name = "sirepo_dev"
+
+    @property
+    def fake_sirepo_server(self):
+        return self.server.fake_sirepo_server
+
+    def setup(self):
+        super().setup()
+        with self.fake_sirepo_server._lock:
+            self.fake_sirepo_server.connection_count += 1
+
+    def log_message(self, format, *args):
+        log = logging.getLogger("deep_beamline_simulation.fake_sirepo")
+        log.debug(format, *args)
+
+    def _cookie(self):
+        for cookie in self.headers.get_all("Cookie", []):
+            for cookie_part in cookie.split(";"):
+                name, _, value = cookie_part.strip().partition("=")
+                if name == self.cookie_name:
+                    return value
+        return None
+
+    def _logged_in_uid(self):
+        """Return the uid of the logged-in user of the request, or None."""
+        cookie = self._cookie()
+        with self.fake_sirepo_server._lock:
+            if cookie not in self.fake_sirepo_server._logged_in_cookies:
+                return None
+            return self.fake_sirepo_server._cookies[cookie]
+
+    def _log_in(self, uid=None):
+        """Log in the user of the request's cookie, or uid, and return the cookie.
+
+        A new cookie is made if the request has none and a new user if neither
+        the cookie nor uid identify one.
+        """
+        fake_sirepo_server = self.fake_sirepo_server
+        cookie = self._cookie() or fake_sirepo_server.new_simulation_id()
+        if uid is None:
+            uid = fake_sirepo_server._cookies.get(cookie)
+        if uid is None:
+            uid = fake_sirepo_server.new_user()
+        with fake_sirepo_server._lock:
+            fake_sirepo_server._cookies[cookie] = uid
+            fake_sirepo_server._logged_in_cookies.add(cookie)
+        return cookie, uid
+
+    def _send_json(self, response_json, status=200, cookie=None):
+        response_body = json.dumps(response_json).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(response_body)))
+        if cookie is not None:
+            self.send_header("Set-Cookie", f"{self.cookie_name}={cookie}; Path=/")
+        self.end_headers()
+        self.wfile.write(response_body)
+
+    def _send_login_required(self):
+        # this is how sirepo tells a client to log in again
+        self._send_json(
+            {
+                "state": "srException",
+                "srException": {"routeName": "login", "params": {}},
+            }
+        )
+
+    def _read_body(self):
+        return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+
+    def _endpoint(self):
+        return self.path.strip("/").split("/")
+
+    def do_GET(self):
+        ttime.sleep(self.fake_sirepo_server.latency_seconds)
+        endpoint = self._endpoint()
+        with self.fake_sirepo_server._lock:
+            self.fake_sirepo_server.request_counts[endpoint[0]] += 1
+
+        if endpoint[0] == "simulation" and len(endpoint) >= 3:
+            uid = self._logged_in_uid()
+            if uid is None:
+                self._send_login_required()
+                return
+            simulation_data = self.fake_sirepo_server.simulation_data(uid, endpoint[2])
+            if simulation_data is None:
+                self._send_json({"state": "error", "error": "not found"}, status=404)
+            else:
+                self._send_json(simulation_data)
+        else:
+            self._send_json({"state": "error", "error": "not found"}, status=404)
+
+    def do_POST(self):
+        ttime.sleep(self.fake_sirepo_server.latency_seconds)
+        endpoint = self._endpoint()
+        with self.fake_sirepo_server._lock:
+            self.fake_sirepo_server.request_counts[endpoint[0]] += 1
+        request_body = self._read_body()
+
+        if endpoint[0] == "auth-guest-login":
+            cookie, uid = self._log_in()
+            self._send_json(
+                {
+                    "authState": {
+                        "displayName": "Guest User",
+                        "isGuestUser": True,
+                        "isLoggedIn": True,
+                        "isLoginExpired": False,
+                        "method": "guest",
+                        "uid": uid,
+                    },
+                    "state": "ok",
+                },
+                cookie=cookie,
+            )
+            return
+        if endpoint[0] == "bluesky-auth":
+            auth_request = json.loads(request_body)
+            # bluesky-auth logs in as the owner of the simulation
+            uid = self.fake_sirepo_server.simulation_owner(auth_request["simulationId"])
+            nonce_time = int(auth_request["authNonce"].split("-")[0])
+            if (
+                uid is None
+                or abs(ttime.time() - nonce_time) > 10
+                or auth_request["authHash"]
+                != auth_hash(
+                    auth_request["authNonce"],
+                    auth_request["simulationType"],
+                    auth_request["simulationId"],
+                    DEFAULT_BLUESKY_AUTH_SECRET,
+                )
+            ):
+                self._send_json({"state": "error", "error": "forbidden"}, status=403)
+                return
+            cookie, uid = self._log_in(uid=uid)
+            self._send_json(
+                {
+                    "state": "ok",
+                    "data": self.fake_sirepo_server.simulation_data(
+                        uid, auth_request["simulationId"]
+                    ),
+                    "schema": {},
+                },
+                cookie=cookie,
+            )
+            return
+
+        uid = self._logged_in_uid()
+        if uid is None:
+            # the first request of a new client gets a cookie
+            cookie = self._cookie()
+            if cookie is None:
+                cookie = self.fake_sirepo_server.new_simulation_id()
+                with self.fake_sirepo_server._lock:
+                    self.fake_sirepo_server._cookies[cookie] = None
+                self._send_json(
+                    {
+                        "state": "srException",
+                        "srException": {"routeName": "login", "params": {}},
+                    },
+                    cookie=cookie,
+                )
+            else:
+                self._send_login_required()
+        elif endpoint[0] == "simulation-list":
+            self._send_json(self.fake_sirepo_server.simulation_list(uid))
+        elif endpoint[0] == "copy-simulation":
+            copy_request = json.loads(request_body)
+            simulation_data = self.fake_sirepo_server.copy_simulation(
+                uid=uid,
+                simulation_id=copy_request["simulationId"],
+                name=copy_request["name"],
+                folder=copy_request.get("folder", "/"),
+            )
+            if simulation_data is None:
+                self._send_json({"state": "error", "error": "not found"}, status=404)
+            else:
+                self._send_json(simulation_data)
+        elif endpoint[0] == "delete-simulation":
+            self.fake_sirepo_server.delete_simulation(
+                uid, json.loads(request_body)["simulationId"]
+            )
+            self._send_json({"state": "ok"})
+        elif endpoint[0] == "run-simulation":
+            self._send_json(
+                self.fake_sirepo_server.run_simulation(uid, json.loads(request_body))
+            )
+        elif endpoint[0] == "run-cancel":
+            cancel_request = json.loads(request_body)
+            self.fake_sirepo_server.cancel_simulation(
+                uid, cancel_request["simulationId"], cancel_request["report"]
+            )
+            self._send_json({"state": "canceled"})
+        elif endpoint[0] == "run-status":
+            self._send_json(
+                self.fake_sirepo_server.run_status(json.loads(request_body))
+            )
+        elif endpoint[0] == "import-file":
+            form_message = email.parser.BytesParser(
+                policy=email.policy.HTTP
+            ).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode()
+                + request_body
+            )
+            form_fields = {
+                form_part.get_param("name", header="content-disposition"): form_part
+                for form_part in form_message.iter_parts()
+            }
+            self._send_json(
+                self.fake_sirepo_server.import_file(
+                    uid=uid,
+                    file_name=form_fields["file"].get_filename(),
+                    file_bytes=form_fields["file"].get_payload(decode=True),
+                    folder=(
+                        form_fields["folder"].get_payload(decode=True).decode()
+                        if "folder" in form_fields
+                        else "/"
+                    ),
+                )
+            )
+        else:
+            self._send_json({"state": "error", "error": "not found"}, status=404)
@@ -0,0 +1,409 @@
+import bisect
+import json
+import logging
+import math
+import os
+import tempfile
+import threading
+import time as ttime
+
+from pathlib import Path
+
+# upper bounds in seconds, request latencies are usually below a second
+#   but simulations may wait in the server's queue for many minutes
+DEFAULT_BUCKET_BOUNDS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    300.0,
+    1800.0,
+)
+
+
+class SirepoRequestHook:
+    """
+    Base class for objects notified of SirepoGuestSession activity.
+
+    Pass instances to SirepoGuestSession(request_hooks=[...]) and override either method.
+    Hooks are called from whichever thread made the request, so implementations
+    must be thread-safe, and they should be quick since they are called synchronously.
+    """
+
+    def request_completed(
+        self,
+        endpoint,
+        elapsed_seconds,
+        request_bytes,
+        response_bytes,
+        status_code=None,
+        error=None,
+    ):
+        """
+        Called after every request to the Sirepo server.
+
+        Parameters
+        ----------
+        endpoint: str
+          the first part of the request path, for example "run-status"
+        elapsed_seconds: float
+          time from sending the request to receiving the whole response
+        request_bytes: int
+          size of the request body
+        response_bytes: int
+          size of the response body, 0 if there was no response
+        status_code: int, optional
+          the HTTP status code, None if there was no response
+        error: Exception, optional
+          the exception raised by the request, if any
+        """
+
+    def simulation_completed(
+        self, report, queue_seconds, run_seconds, status_call_count
+    ):
+        """
+        Called when a simulation started by the session reaches the "completed" state.
+
+        Parameters
+        ----------
+        report: str
+          the report that was run, for example "watchpointReport6"
+        queue_seconds: float
+          estimated time the simulation spent in the server's "pending" state
+        run_seconds: float
+          estimated time from leaving the "pending" state to completion
+        status_call_count: int
+          the number of run-status calls made for the simulation
+        """
+
+
+class LatencyHistogram:
+    def __init__(self, bucket_bounds=DEFAULT_BUCKET_BOUNDS):
+        """
+        A cumulative histogram of durations in the style of a Prometheus histogram.
+
+        Parameters
+        ----------
+        bucket_bounds: sequence of float
+          increasing upper bounds of the buckets in seconds, a final
+          bucket without an upper bound is always added
+        """
+        self.bucket_bounds = tuple(bucket_bounds)
+        self.bucket_counts = [0] * (len(self.bucket_bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, seconds):
+        self.bucket_counts[bisect.bisect_left(self.bucket_bounds, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative_counts(self):
+        """Return (upper bound, count of observations <= upper bound) for each bucket."""
+        cumulative_count = 0
+        cumulative_counts = []
+        for bucket_bound, bucket_count in zip(
+            self.bucket_bounds + (math.inf,), self.bucket_counts
+        ):
+            cumulative_count += bucket_count
+            cumulative_counts.append((bucket_bound, cumulative_count))
+        return cumulative_counts
+
+    def quantile(self, q):
+        """Return the upper bound of the bucket holding the q-quantile, or None if empty."""
+        if self.count == 0:
+            return None
+        for bucket_bound, cumulative_count in self.cumulative_counts():
+            if cumulative_count >= q * self.count:
+                return bucket_bound
+
+    def as_dict(self):
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "buckets": [
+                [None if math.isinf(bucket_bound) else bucket_bound, cumulative_count]
+                for bucket_bound, cumulative_count in self.cumulative_counts()
+            ],
+        }
+
+
+class _EndpointMetrics:
+    def __init__(self, bucket_bounds):
+        self.request_count = 0
+        self.error_count = 0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = LatencyHistogram(bucket_bounds)
+
+
+class _ReportMetrics:
+    def __init__(self, bucket_bounds):
+        self.status_call_count = 0
+        self.queue_seconds = LatencyHistogram(bucket_bounds)
+        self.run_seconds = LatencyHistogram(bucket_bounds)
+
+
+class RequestMetrics(SirepoRequestHook):
+    def __init__(self, bucket_bounds=DEFAULT_BUCKET_BOUNDS):
+        """
+        Collect request counts, latencies, bytes transferred and errors per endpoint
+        and queue and run times per report.
+
+        For example:
+
+            request_metrics = RequestMetrics()
+            with SirepoGuestSession(
+                sirepo_server_url="http://localhost:8000",
+                simulation_type="srw",
+                request_hooks=[request_metrics],
+            ) as sirepo_session:
+                sirepo_session.run_sweep(...)
+            request_metrics.write_json("sweep_metrics.json")
+            request_metrics.write_prometheus("/var/lib/node_exporter/sirepo.prom")
+
+        Parameters
+        ----------
+        bucket_bounds: sequence of float
+          upper bounds in seconds of the latency histogram buckets
+        """
+        self.bucket_bounds = tuple(bucket_bounds)
+        self.start_time = ttime.time()
+        self._lock = threading.Lock()
+        # endpoint -> _EndpointMetrics
+        self._endpoints = {}
+        # report -> _ReportMetrics
+        self._reports = {}
+
+    def request_completed(
+        self,
+        endpoint,
+        elapsed_seconds,
+        request_bytes,
+        response_bytes,
+        status_code=None,
+        error=None,
+    ):
+        with self._lock:
+            if endpoint not in self._endpoints:
+                self._endpoints[endpoint] = _EndpointMetrics(self.bucket_bounds)
+            endpoint_metrics = self._endpoints[endpoint]
+            endpoint_metrics.request_count += 1
+            if error is not None or status_code is None or status_code >= 400:
+                endpoint_metrics.error_count += 1
+            endpoint_metrics.request_bytes += request_bytes
+            endpoint_metrics.response_bytes += response_bytes
+            endpoint_metrics.latency.observe(elapsed_seconds)
+
+    def simulation_completed(
+        self, report, queue_seconds, run_seconds, status_call_count
+    ):
+        with self._lock:
+            if report not in self._reports:
+                self._reports[report] = _ReportMetrics(self.bucket_bounds)
+            report_metrics = self._reports[report]
+            report_metrics.status_call_count += status_call_count
+            report_metrics.queue_seconds.observe(queue_seconds)
+            report_metrics.run_seconds.observe(run_seconds)
+
+    def reset(self):
+        with self._lock:
+            self.start_time = ttime.time()
+            self._endpoints.clear()
+            self._reports.clear()
+
+    def snapshot(self):
+        """Return the collected metrics as a dictionary that can be written as JSON."""
+        with self._lock:
+            return {
+                "start_time": self.start_time,
+                "snapshot_time": ttime.time(),
+                "endpoints": {
+                    endpoint: {
+                        "requests": endpoint_metrics.request_count,
+                        "errors": endpoint_metrics.error_count,
+                        "request_bytes": endpoint_metrics.request_bytes,
+                        "response_bytes": endpoint_metrics.response_bytes,
+                        "latency_seconds": endpoint_metrics.latency.as_dict(),
+                    }
+                    for endpoint, endpoint_metrics in self._endpoints.items()
+                },
+                "reports": {
+                    str(report): {
+                        "simulations": report_metrics.run_seconds.count,
+                        "status_calls": report_metrics.status_call_count,
+                        "queue_seconds": report_metrics.queue_seconds.as_dict(),
+                        "run_seconds": report_metrics.run_seconds.as_dict(),
+                    }
+                    for report, report_metrics in self._reports.items()
+                },
+            }
+
+    def write_json(self, file_path):
+        """Write `snapshot()` to a JSON file."""
+        _write_text_atomically(file_path, json.dumps(self.snapshot(), indent=2))
+
+    def prometheus_text(self):
+        """Return the collected metrics in the Prometheus text exposition format."""
+        lines = []
+
+        def add_metric(name, metric_type, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {metric_type}")
+            for sample_suffix, labels, value in samples:
+                label_text = ",".join(
+                    f'{label_name}="{_escape_label_value(label_value)}"'
+                    for label_name, label_value in labels.items()
+                )
+                lines.append(f"{name}{sample_suffix}{{{label_text}}} {value}")
+
+        def histogram_samples(label_name, histograms):
+            samples = []
+            for label_value, histogram in histograms:
+                for bucket_bound, cumulative_count in histogram.cumulative_counts():
+                    samples.append(
+                        (
+                            "_bucket",
+                            {
+                                label_name: label_value,
+                                "le": (
+                                    "+Inf" if math.isinf(bucket_bound) else bucket_bound
+                                ),
+                            },
+                            cumulative_count,
+                        )
+                    )
+                samples.append(("_sum", {label_name: label_value}, histogram.sum))
+                samples.append(("_count", {label_name: label_value}, histogram.count))
+            return samples
+
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            reports = sorted(self._reports.items(), key=lambda item: str(item[0]))
+
+            add_metric(
+                "sirepo_requests_total",
+                "counter",
+                "Requests to the Sirepo server.",
+                [("", {"endpoint": e}, m.request_count) for e, m in endpoints],
+            )
+            add_metric(
+                "sirepo_request_errors_total",
+                "counter",
+                "Requests that failed or returned an HTTP error status.",
+                [("", {"endpoint": e}, m.error_count) for e, m in endpoints],
+            )
+            add_metric(
+                "sirepo_request_sent_bytes_total",
+                "counter",
+                "Request body bytes sent to the Sirepo server.",
+                [("", {"endpoint": e}, m.request_bytes) for e, m in endpoints],
+            )
+            add_metric(
+                "sirepo_response_received_bytes_total",
+                "counter",
+                "Response body bytes received from the Sirepo server.",
+                [("", {"endpoint": e}, m.response_bytes) for e, m in endpoints],
+            )
+            add_metric(
+                "sirepo_request_duration_seconds",
+                "histogram",
+                "Time from sending a request to receiving the whole response.",
+                histogram_samples("endpoint", [(e, m.latency) for e, m in endpoints]),
+            )
+            add_metric(
+                "sirepo_simulation_status_calls_total",
+                "counter",
+                "run-status calls made for completed simulations.",
+                [("", {"report": r}, m.status_call_count) for r, m in reports],
+            )
+            add_metric(
+                "sirepo_simulation_queue_seconds",
+                "histogram",
+                "Estimated time simulations waited in the server's pending state.",
+                histogram_samples("report", [(r, m.queue_seconds) for r, m in reports]),
+            )
+            add_metric(
+                "sirepo_simulation_run_seconds",
+                "histogram",
+                "Estimated time from leaving the pending state to completion.",
+                histogram_samples("report", [(r, m.run_seconds) for r, m in reports]),
+            )
+
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, file_path):
+        """Write `prometheus_text()` to a file, eg. for the node_exporter textfile collector."""
+        _write_text_atomically(file_path, self.prometheus_text())
+
+    def summary(self):
+        """Return a short human readable table of the endpoint metrics."""
+        snapshot = self.snapshot()
+        lines = [
+            f"{'endpoint':<20} {'requests':>9} {'errors':>7} {'total s':>9} "
+            f"{'mean ms':>9} {'MiB in':>9}"
+        ]
+        for endpoint, endpoint_metrics in sorted(snapshot["endpoints"].items()):
+            latency = endpoint_metrics["latency_seconds"]
+            lines.append(
+                f"{endpoint:<20} {endpoint_metrics['requests']:>9} "
+                f"{endpoint_metrics['errors']:>7} {latency['sum']:>9.3f} "
+                f"{1000 * latency['sum'] / max(latency['count'], 1):>9.2f} "
+                f"{endpoint_metrics['response_bytes'] / 2**20:>9.2f}"
+            )
+        return "\n".join(lines)
+
+
+class QueueWaitTimer:
+    """Estimate how long a simulation waited in the server's "pending" state.
+
+    The state is only seen at each run-status call, so the transition out of
+    "pending" is placed midway between the last "pending" and the first other state.
+    """
+
+    def __init__(self):
+        self._last_pending_seconds = None
+        self.queue_seconds = None
+
+    def observe(self, run_state, elapsed_seconds):
+        if self.queue_seconds is not None:
+            return
+        if run_state == "pending":
+            self._last_pending_seconds = elapsed_seconds
+        elif self._last_pending_seconds is None:
+            self.queue_seconds = 0.0
+        else:
+            self.queue_seconds = (self._last_pending_seconds + elapsed_seconds) / 2
+
+
+def _escape_label_value(label_value):
+    return (
+        str(label_value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    )
+
+
+def _write_text_atomically(file_path, text):
+    """Write a file so readers such as a metrics scraper never see a partial file."""
+    log = logging.getLogger("deep_beamline_simulation.instrumentation")
+
+    file_path = Path(file_path)
+    file_fd, tmp_path = tempfile.mkstemp(
+        dir=file_path.parent, prefix=".tmp-", suffix=file_path.suffix
+    )
+    try:
+        with os.fdopen(file_fd, "w") as tmp_file:
+            tmp_file.write(text)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    log.debug("wrote '%s'", file_path)
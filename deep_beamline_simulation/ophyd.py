@@ -1,10 +1,295 @@
+import functools
 import logging
 
 import inflection
 import ophyd
 
 
-def build_sirepo_simulation(sirepo_simulation_data):
+class SirepoOpticalElement(ophyd.Device):
+    """Base class of the generated optical element Devices.
+
+    Generated classes with the same Sirepo element type and parameter names share
+    one cached class of Signal components, and the parameter values of a particular
+    element are given by the `_sirepo_parameter_values` class attribute of a thin
+    subclass and put to the Signals when the Device is instantiated.
+
+    Parameters that are not tunable are read-only properties instead of Signals,
+    their values are kept in the `_sirepo_fixed_values` dictionary of the instance.
+    """
+
+    # Signal or property attribute name -> value
+    _sirepo_parameter_values = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._sirepo_fixed_values = {}
+        # Signal attribute name -> value last written to the simulation data
+        self._sirepo_synced_values = {}
+        _put_parameter_values(self, self._sirepo_parameter_values)
+
+    def changed_parameters(self):
+        """Return Sirepo parameter name -> value for each Signal changed since the
+        Device was built or last written to the simulation data."""
+        changed_parameters = {}
+        for parameter_attr_name, synced_value in self._sirepo_synced_values.items():
+            parameter_value = getattr(self, parameter_attr_name).get()
+            if parameter_value != synced_value:
+                changed_parameters[_sirepo_parameter_name(parameter_attr_name)] = (
+                    parameter_value
+                )
+        return changed_parameters
+
+    def write_beamline_element(self, beamline_element):
+        """Write the changed parameters into a models.beamline element, in place.
+
+        Parameters
+        ----------
+        beamline_element: dict
+          the element of models.beamline this Device was built from
+
+        Returns
+        -------
+        Sirepo parameter name -> value for each parameter that was written
+        """
+        changed_parameters = self.changed_parameters()
+        beamline_element.update(changed_parameters)
+        for parameter_name, parameter_value in changed_parameters.items():
+            self._sirepo_synced_values[_parameter_attr_name(parameter_name)] = (
+                parameter_value
+            )
+        return changed_parameters
+
+
+class SirepoSimulationDevice(ophyd.Device):
+    """Base class of the generated SirepoSimulation Devices.
+
+    Generated classes for beamlines with the same structure share one cached
+    class, and the parameter values are given by the `_sirepo_element_values`
+    class attribute of a thin subclass.
+    """
+
+    # optical element component name -> Signal or property attribute name -> value
+    _sirepo_element_values = {}
+    # optical element component name -> index in models.beamline
+    _sirepo_beamline_indices = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        for component_name, parameter_values in self._sirepo_element_values.items():
+            _put_parameter_values(getattr(self, component_name), parameter_values)
+
+    def changed_parameters(self):
+        """Return the Signals changed since the Device was built or last written to
+        the simulation data.
+
+        Returns
+        -------
+        optical element title -> Sirepo parameter name -> value, the form of the
+        parameter updates accepted by SirepoGuestSession.run_sweep
+        """
+        changed_parameters = {}
+        for component_name in self._sirepo_beamline_indices:
+            optical_element = getattr(self, component_name)
+            element_changes = optical_element.changed_parameters()
+            if element_changes:
+                changed_parameters[
+                    self._sirepo_element_values[component_name]["title"]
+                ] = element_changes
+        return changed_parameters
+
+    def write_simulation_data(self, sirepo_simulation_data):
+        """Write the changed Signal values into the models.beamline elements of
+        the simulation data, in place.
+
+        Only the changed parameters are written, so for a sweep the same simulation
+        data can be updated and submitted for each point without a copy. For example:
+
+            sirepo_simulation.s0.horizontalSize.put(0.1)
+            sirepo_simulation.write_simulation_data(srx_simulation_data)
+            sirepo_session.run_simulation(simulation_id, srx_simulation_data, "intensityReport")
+
+        Parameters
+        ----------
+        sirepo_simulation_data: dict
+          the simulation data this Device was built from
+
+        Returns
+        -------
+        optical element title -> Sirepo parameter name -> value for each parameter
+        that was written
+
+        Raises
+        ------
+        ValueError if the beamline of the simulation data does not match the Device
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        beamline_elements = sirepo_simulation_data["models"]["beamline"]
+        written_parameters = {}
+        for component_name, beamline_i in self._sirepo_beamline_indices.items():
+            optical_element = getattr(self, component_name)
+            title = self._sirepo_element_values[component_name]["title"]
+            if (
+                beamline_i >= len(beamline_elements)
+                or beamline_elements[beamline_i]["title"] != title
+            ):
+                raise ValueError(
+                    f"simulation data has no beamline element '{title}' at index {beamline_i}"
+                )
+            element_changes = optical_element.write_beamline_element(
+                beamline_elements[beamline_i]
+            )
+            if element_changes:
+                written_parameters[title] = element_changes
+
+        log.debug("wrote parameters %s", written_parameters)
+        return written_parameters
+
+
+def _put_parameter_values(optical_element, parameter_values):
+    for parameter_attr_name, parameter_value in parameter_values.items():
+        if parameter_attr_name in optical_element.component_names:
+            getattr(optical_element, parameter_attr_name).put(parameter_value)
+            optical_element._sirepo_synced_values[parameter_attr_name] = parameter_value
+        else:
+            optical_element._sirepo_fixed_values[parameter_attr_name] = parameter_value
+
+
+def _fixed_parameter_property(parameter_attr_name):
+    return property(
+        lambda optical_element: optical_element._sirepo_fixed_values[
+            parameter_attr_name
+        ],
+        doc=f"the read-only Sirepo parameter '{parameter_attr_name}'",
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _python_identifier(optical_element_name):
+    # need to handle problem names such as "DCM: C2"
+    #  the transformation underscore(parameterize) converts "DCM: C2" to "dcm__c2"
+    return inflection.underscore(inflection.parameterize(optical_element_name))
+
+
+def _parameter_attr_name(parameter_name):
+    # "position" is in ophyd.DEVICE_RESERVED_ATTRS
+    return "position_" if parameter_name == "position" else parameter_name
+
+
+def _sirepo_parameter_name(parameter_attr_name):
+    return "position" if parameter_attr_name == "position_" else parameter_attr_name
+
+
+def _parameter_values(sirepo_optical_element_data):
+    """Return Signal attribute name -> value for the parameters of an optical element."""
+    return {
+        _parameter_attr_name(beamline_element_attr_name): beamline_element_attr_value
+        for (
+            beamline_element_attr_name,
+            beamline_element_attr_value,
+        ) in sirepo_optical_element_data.items()
+    }
+
+
+def _signal_and_fixed_attr_names(parameter_values, tunable_parameters):
+    """Split Signal attribute names into (tunable names, fixed names).
+
+    All parameters are tunable if tunable_parameters is None.
+    """
+    if tunable_parameters is None:
+        return tuple(parameter_values), ()
+
+    tunable_attr_names = set(_parameter_values(dict.fromkeys(tunable_parameters)))
+    return (
+        tuple(
+            parameter_attr_name
+            for parameter_attr_name in parameter_values
+            if parameter_attr_name in tunable_attr_names
+        ),
+        tuple(
+            parameter_attr_name
+            for parameter_attr_name in parameter_values
+            if parameter_attr_name not in tunable_attr_names
+        ),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _optical_element_base_class(
+    beamline_element_type_name, parameter_attr_names, fixed_parameter_attr_names=()
+):
+    """Return the cached Device class with a Signal for each parameter name and a
+    read-only property for each fixed parameter name."""
+    log = logging.getLogger("deep_beamline_simulation.ophyd")
+
+    log.debug(
+        "create optical element class '%s' with parameters %s and fixed parameters %s",
+        beamline_element_type_name,
+        parameter_attr_names,
+        fixed_parameter_attr_names,
+    )
+    optical_element_class_attrs = {
+        parameter_attr_name: ophyd.Component(cls=ophyd.Signal, name=parameter_attr_name)
+        for parameter_attr_name in parameter_attr_names
+    }
+    optical_element_class_attrs.update(
+        {
+            parameter_attr_name: _fixed_parameter_property(parameter_attr_name)
+            for parameter_attr_name in fixed_parameter_attr_names
+        }
+    )
+    return type(
+        beamline_element_type_name,
+        (SirepoOpticalElement,),
+        optical_element_class_attrs,
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def _sirepo_simulation_base_class(beamline_structure):
+    """Return the cached SirepoSimulation class for a beamline structure.
+
+    Parameters
+    ----------
+    beamline_structure: tuple
+      (component name, element title, element type, parameter attribute names,
+      fixed parameter attribute names) for each optical element in beam order
+    """
+    log = logging.getLogger("deep_beamline_simulation.ophyd")
+
+    beamline_optical_element_components = {}
+    sirepo_beamline_indices = {}
+    for beamline_i, (
+        optical_element_python_identifier,
+        optical_element_name,
+        beamline_element_type_name,
+        parameter_attr_names,
+        fixed_parameter_attr_names,
+    ) in enumerate(beamline_structure):
+        optical_element_class = _optical_element_base_class(
+            beamline_element_type_name, parameter_attr_names, fixed_parameter_attr_names
+        )
+        log.debug(
+            "create ophyd.Component with cls='%s' name='%s'",
+            optical_element_class,
+            optical_element_name,
+        )
+        beamline_optical_element_components[optical_element_python_identifier] = (
+            ophyd.Component(cls=optical_element_class, name=optical_element_name)
+        )
+        sirepo_beamline_indices[optical_element_python_identifier] = beamline_i
+
+    return type(
+        "SirepoSimulation",
+        (SirepoSimulationDevice,),
+        dict(
+            beamline_optical_element_components,
+            _sirepo_beamline_indices=sirepo_beamline_indices,
+        ),
+    )
+
+
+def build_sirepo_simulation(sirepo_simulation_data, tunable_parameters=None):
     """Build a SirepoSimulation(ophyd.Device) class with one ophyd.Device for each Sirepo optical element.
 
     Parameters
@@ -57,47 +342,51 @@ def build_sirepo_simulation(sirepo_simulation_data):
           },
           ...
 
+    tunable_parameters: dict, optional
+      optical element title -> names of the parameters that become ophyd.Signals,
+      for example {"S0": ["horizontalSize", "verticalSize"]}, the other parameters
+      (ids, titles, file names, ...) become read-only attributes; by default
+      every parameter of every optical element is an ophyd.Signal
+
     Returns
     -------
 
     """
     log = logging.getLogger("deep_beamline_simulation.ophyd")
 
-    beamline_optical_element_components = {}
-
     # beamline_elements is a list in "beam order" of simulated optical elements
     beamline_elements = sirepo_simulation_data["models"]["beamline"]
-    for i, beamline_element in enumerate(beamline_elements):
-        # create an ophyd.Device class for each beamline element
-        #   there will be some redundancy because a beamline may have several optical
-        #   elements with the same "type", such as "aperture", and a separate class
-        #   will be dynamically created for each one
-        # the advantage is that the optical element parameters will be part of the class
-        #   which helps when composing optical element Devices (see example)
 
-        (
-            optical_element_name,
-            optical_element_class,
-        ) = build_sirepo_optical_element_class(
-            sirepo_optical_element_data=beamline_element
+    # the class is cached by the structure of the beamline, the element titles,
+    #   types and parameter names, so building a class for another parameter point
+    #   of the same beamline only creates a thin subclass holding the new values
+    beamline_structure = []
+    sirepo_element_values = {}
+    for beamline_element in beamline_elements:
+        optical_element_name = _optical_element_instance_name(beamline_element)
+        optical_element_python_identifier = _python_identifier(optical_element_name)
+        parameter_values = _parameter_values(beamline_element)
+        beamline_structure.append(
+            (
+                optical_element_python_identifier,
+                optical_element_name,
+                beamline_element["type"],
+            )
+            + _signal_and_fixed_attr_names(
+                parameter_values,
+                (
+                    None
+                    if tunable_parameters is None
+                    else tunable_parameters.get(beamline_element["title"], ())
+                ),
+            )
         )
-
-        log.debug(
-            "create ophyd.Component with cls='%s' name='%s'",
-            optical_element_class,
-            optical_element_name,
-        )
-        # need to handle problem names such as "DCM: C2"
-        #  the transformation underscore(parameterize) converts "DCM: C2" to "dcm__c2"
-        optical_element_python_identifier = inflection.underscore(
-            inflection.parameterize(optical_element_name)
-        )
-        beamline_optical_element_components[
-            optical_element_python_identifier
-        ] = ophyd.Component(cls=optical_element_class, name=optical_element_name)
+        sirepo_element_values[optical_element_python_identifier] = parameter_values
 
     sirepo_simulation_class = type(
-        "SirepoSimulation", (ophyd.Device,), beamline_optical_element_components
+        "SirepoSimulation",
+        (_sirepo_simulation_base_class(tuple(beamline_structure)),),
+        {"_sirepo_element_values": sirepo_element_values},
     )
 
     log.debug("sirepo simulation class: '%s'", sirepo_simulation_class)
@@ -106,58 +395,68 @@ def build_sirepo_simulation(sirepo_simulation_data):
     return sirepo_simulation_class
 
 
-def build_sirepo_optical_element_class(sirepo_optical_element_data):
+def build_sirepo_optical_element_class(
+    sirepo_optical_element_data, tunable_parameters=None
+):
+    """Build an ophyd.Device class for one Sirepo optical element.
+
+    Parameters
+    ----------
+    sirepo_optical_element_data: dict
+      one element of models.beamline
+    tunable_parameters: list of str, optional
+      names of the parameters that become ophyd.Signals, the other parameters
+      become read-only attributes; by default every parameter is an ophyd.Signal
+
+    Returns
+    -------
+    (optical element instance name, optical element class)
+    """
     log = logging.getLogger("deep_beamline_simulation.ophyd")
 
-    # build a dictionary of ophyd.Components creating Signals
-    parameter_components = dict()
     log.debug(f"beamline element_data '%s'", sirepo_optical_element_data)
-    for (
-        beamline_element_attr_name,
-        beamline_element_attr_value,
-    ) in sirepo_optical_element_data.items():
-        # for example, an aperture might have these parameters,
-        #   each of which will become a Component(cls=ophyd.Signal, ...)
-        # {
-        #     "horizontalOffset": 0,
-        #     "horizontalSize": 2,
-        #     "id": 2,
-        #     "position": 33.1798,     <---- must change "position" to something else because DEVICE_RESERVED_ATTRS
-        #     "shape": "r",
-        #     "title": "S0",
-        #     "type": "aperture",
-        #     "verticalOffset": 0,
-        #     "verticalSize": 1
-        # },
-        if beamline_element_attr_name == "position":
-            beamline_element_attr_name = "position_"
-
-        log.debug(
-            f"  '%s': '%s' (%s)",
-            beamline_element_attr_name,
-            beamline_element_attr_value,
-            type(beamline_element_attr_value),
-        )
-        parameter_components[beamline_element_attr_name] = ophyd.Component(
-            cls=ophyd.Signal,
-            name=beamline_element_attr_name,
-            value=beamline_element_attr_value,
-        )
+    # each parameter becomes a Component(cls=ophyd.Signal, ...), for example
+    #   an aperture might have these parameters
+    # {
+    #     "horizontalOffset": 0,
+    #     "horizontalSize": 2,
+    #     "id": 2,
+    #     "position": 33.1798,     <---- must change "position" to something else because DEVICE_RESERVED_ATTRS
+    #     "shape": "r",
+    #     "title": "S0",
+    #     "type": "aperture",
+    #     "verticalOffset": 0,
+    #     "verticalSize": 1
+    # },
+    parameter_values = _parameter_values(sirepo_optical_element_data)
 
     # beamline_element["type"] could be aperture, sphericalMirror, crystal, ellipsoidMirror, watch, ...
     beamline_element_type_name = sirepo_optical_element_data["type"]
-    # beamline_device_instance_name must be a valid python identifier, but the optical element's "title"
-    #   may contain spaces, so apply a transformation to make it a valid identifier
-    beamline_element_instance_name = sirepo_optical_element_data["title"].replace(
-        " ", "_"
+    # the Signal components are created once for each element type and set of parameters
+    #   and this subclass only holds the parameter values
+    beamline_optical_element_class = type(
+        beamline_element_type_name,
+        (
+            _optical_element_base_class(
+                beamline_element_type_name,
+                *_signal_and_fixed_attr_names(parameter_values, tunable_parameters),
+            ),
+        ),
+        {"_sirepo_parameter_values": parameter_values},
     )
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("optical element type: %s", dir(beamline_optical_element_class))
 
-    beamline_optical_element_class = type(
-        beamline_element_type_name, (ophyd.Device,), parameter_components
+    return (
+        _optical_element_instance_name(sirepo_optical_element_data),
+        beamline_optical_element_class,
     )
-    log.debug("optical element type: %s", dir(beamline_optical_element_class))
 
-    return beamline_element_instance_name, beamline_optical_element_class
+
+def _optical_element_instance_name(sirepo_optical_element_data):
+    # beamline_device_instance_name must be a valid python identifier, but the optical element's "title"
+    #   may contain spaces, so apply a transformation to make it a valid identifier
+    return sirepo_optical_element_data["title"].replace(" ", "_")
 
 
 # want to build classes like this:
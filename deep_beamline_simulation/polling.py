@@ -0,0 +1,413 @@
+import heapq
+import itertools
+import logging
+import threading
+import time as ttime
+
+from .instrumentation import QueueWaitTimer
+from .results import SirepoRunResult, decode_run_status
+
+
+class PollSchedule:
+    def __init__(
+        self,
+        min_interval=0.02,
+        max_interval=10.0,
+        backoff_factor=1.5,
+        lead_fraction=0.9,
+        smoothing=0.3,
+    ):
+        """
+        Decide how long to wait before the next run-status call.
+
+        Completion times are learned per report (eg "intensityReport", "watchpointReport6").
+        Before a report has been seen the delay grows geometrically from `min_interval`,
+        so a short report is noticed within a few tens of milliseconds and a long
+        propagation is polled only a logarithmic number of times. Once completion times
+        have been observed the schedule waits until `lead_fraction` of the expected
+        completion time and starts the geometric backoff from there.
+
+        Parameters
+        ----------
+        min_interval: float
+          shortest delay between run-status calls in seconds
+        max_interval: float
+          longest delay between run-status calls in seconds
+        backoff_factor: float
+          each delay is (backoff_factor - 1) times the time spent backing off so far,
+          so the delay grows by roughly this factor with each call
+        lead_fraction: float
+          fraction of the expected completion time to wait before polling
+        smoothing: float
+          weight given to the newest observation in the running completion time estimate
+        """
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.backoff_factor = backoff_factor
+        self.lead_fraction = lead_fraction
+        self.smoothing = smoothing
+
+        self._lock = threading.Lock()
+        # report -> estimated seconds to completion
+        self._expected_seconds = {}
+        # report -> {"jobs": ..., "status_calls": ..., "max_status_calls": ...}
+        self._status_call_counts = {}
+
+    def expected_seconds(self, report):
+        """Return the estimated completion time for a report or None if it has not been observed."""
+        with self._lock:
+            return self._expected_seconds.get(report)
+
+    def next_delay(self, report, elapsed_seconds):
+        """Return the number of seconds to wait before the next run-status call.
+
+        Parameters
+        ----------
+        report: str
+          the report being computed
+        elapsed_seconds: float
+          seconds since the simulation was started
+        """
+        expected_seconds = self.expected_seconds(report)
+        if expected_seconds is None:
+            backoff_start = 0.0
+        else:
+            backoff_start = self.lead_fraction * expected_seconds
+
+        if elapsed_seconds < backoff_start:
+            delay = backoff_start - elapsed_seconds
+        else:
+            delay = (elapsed_seconds - backoff_start) * (self.backoff_factor - 1)
+
+        return min(max(delay, self.min_interval), self.max_interval)
+
+    def record_completion(
+        self, report, incomplete_seconds, completed_seconds, status_call_count
+    ):
+        """Learn from a finished simulation.
+
+        Parameters
+        ----------
+        report: str
+          the report that was computed
+        incomplete_seconds: float
+          the latest elapsed time at which the simulation was known to be running
+        completed_seconds: float
+          the elapsed time at which the simulation was found to be complete
+        status_call_count: int
+          the number of run-status calls made for the simulation
+        """
+        with self._lock:
+            counts = self._status_call_counts.setdefault(
+                report, {"jobs": 0, "status_calls": 0, "max_status_calls": 0}
+            )
+            counts["jobs"] += 1
+            counts["status_calls"] += status_call_count
+            counts["max_status_calls"] = max(
+                counts["max_status_calls"], status_call_count
+            )
+
+            # a simulation that completed without any run-status calls
+            #   says nothing about how long the report takes
+            if status_call_count == 0:
+                return
+
+            observed_seconds = (incomplete_seconds + completed_seconds) / 2
+            if report in self._expected_seconds:
+                self._expected_seconds[report] = (
+                    self.smoothing * observed_seconds
+                    + (1 - self.smoothing) * self._expected_seconds[report]
+                )
+            else:
+                self._expected_seconds[report] = observed_seconds
+
+    def statistics(self):
+        """Return run-status call counts and completion time estimates per report.
+
+        For example:
+        {
+            'intensityReport': {
+                'jobs': 12,
+                'status_calls': 61,
+                'max_status_calls': 7,
+                'mean_status_calls': 5.083333333333333,
+                'expected_seconds': 1.93
+            },
+            ...
+        }
+        """
+        with self._lock:
+            statistics = {}
+            for report, counts in self._status_call_counts.items():
+                statistics[report] = dict(counts)
+                statistics[report]["mean_status_calls"] = (
+                    counts["status_calls"] / counts["jobs"]
+                )
+                statistics[report]["expected_seconds"] = self._expected_seconds.get(
+                    report
+                )
+            return statistics
+
+
+class RunStatusPoller:
+    def __init__(self, sirepo_session, poll_schedule=None):
+        """
+        Track many running simulations and poll `run-status` only for those that are due.
+
+        Sirepo runs one job at a time per simulation and report, so simulations
+        tracked at the same time must run on different copies of the simulation,
+        as `SirepoGuestSession.run_sweep` does. For example:
+
+            poller = RunStatusPoller(sirepo_session)
+            for point_i, point_data in enumerate(sweep_data):
+                point_simulation_id = sirepo_session.copy_simulation(
+                    simulation_id, name=f"sweep point {point_i}"
+                )["models"]["simulation"]["simulationId"]
+                poller.add(
+                    sirepo_session.run_simulation(
+                        point_simulation_id, point_data, "intensityReport"
+                    ),
+                    key=point_i,
+                )
+            for point_i, run_status_response in poller.completed():
+                ...
+
+        Parameters
+        ----------
+        sirepo_session: SirepoGuestSession
+          a logged-in session, the same session must have started the simulations
+        poll_schedule: PollSchedule, optional
+          by default the session's poll schedule is used
+        """
+        self.sirepo_session = sirepo_session
+        if poll_schedule is None:
+            poll_schedule = sirepo_session.poll_schedule
+        self.poll_schedule = poll_schedule
+
+        # heap of (due time, tie breaker, key)
+        self._due_heap = []
+        self._tie_breaker = itertools.count()
+        # key -> _PolledSimulation
+        self._running = {}
+        # finished simulations not yet yielded by completed()
+        self._finished = []
+
+        self.status_call_count = 0
+
+    def __len__(self):
+        """Return the number of simulations that have not finished."""
+        return len(self._running)
+
+    def add(self, run_simulation_response, key=None, callback=None):
+        """Start tracking a simulation started with `run_simulation`.
+
+        Parameters
+        ----------
+        run_simulation_response: requests.Response
+          the response returned by SirepoGuestSession.run_simulation
+        key: hashable, optional
+          identifies the simulation in the results, by default the
+          order in which simulations were added
+        callback: callable, optional
+          called with (key, run_status_response) when the simulation finishes
+
+        Returns
+        -------
+        the key identifying this simulation
+        """
+        tie_breaker = next(self._tie_breaker)
+        if key is None:
+            key = tie_breaker
+        if key in self._running:
+            raise ValueError(f"simulation key '{key}' is already being polled")
+
+        run_status = decode_run_status(run_simulation_response.content)
+        polled_simulation = _PolledSimulation(
+            report=run_status.get("nextRequest", {}).get("report"),
+            start_time=ttime.monotonic(),
+            callback=callback,
+        )
+        self._update(key, polled_simulation, run_simulation_response, run_status)
+        return key
+
+    def _update(self, key, polled_simulation, run_status_response, run_status):
+        log = logging.getLogger(self.__class__.__name__)
+
+        elapsed_seconds = ttime.monotonic() - polled_simulation.start_time
+        run_state = run_status["state"]
+        polled_simulation.queue_wait_timer.observe(run_state, elapsed_seconds)
+        next_request = run_status.get("nextRequest")
+        if run_state in ("pending", "running") and next_request is not None:
+            polled_simulation.next_request = next_request
+            polled_simulation.incomplete_seconds = elapsed_seconds
+            self._running[key] = polled_simulation
+            heapq.heappush(
+                self._due_heap,
+                (
+                    polled_simulation.start_time
+                    + elapsed_seconds
+                    + self.poll_schedule.next_delay(
+                        polled_simulation.report, elapsed_seconds
+                    ),
+                    next(self._tie_breaker),
+                    key,
+                ),
+            )
+        else:
+            # any other state, eg "canceled", or a reply without a nextRequest
+            #   can not be polled again so the simulation is finished
+            if run_state == "error":
+                log.error("simulation '%s' failed with an error", key)
+            elif run_state != "completed":
+                log.warning("simulation '%s' finished in state '%s'", key, run_state)
+            else:
+                log.info("simulation '%s' completed", key)
+                self.poll_schedule.record_completion(
+                    report=polled_simulation.report,
+                    incomplete_seconds=polled_simulation.incomplete_seconds,
+                    completed_seconds=elapsed_seconds,
+                    status_call_count=polled_simulation.status_call_count,
+                )
+                self.sirepo_session._simulation_completed(
+                    report=polled_simulation.report,
+                    queue_seconds=polled_simulation.queue_wait_timer.queue_seconds,
+                    completed_seconds=elapsed_seconds,
+                    status_call_count=polled_simulation.status_call_count,
+                )
+            self._running.pop(key, None)
+            self._finished.append((key, run_status_response, run_status))
+            if polled_simulation.callback is not None:
+                polled_simulation.callback(key, run_status_response)
+
+    def _poll_due(self, poll_all=False):
+        """Make a run-status call for every simulation that is due.
+
+        Parameters
+        ----------
+        poll_all: bool
+          make a run-status call for every running simulation whether it is due or not
+
+        Returns
+        -------
+        list of (key, run_status_response, run_status) for simulations that finished,
+        including simulations that finished before this call
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        now = ttime.monotonic()
+        due_entries = []
+        while self._due_heap and (poll_all or self._due_heap[0][0] <= now):
+            due_entries.append(heapq.heappop(self._due_heap))
+
+        polled_count = 0
+        try:
+            for _, _, key in due_entries:
+                polled_simulation = self._running[key]
+                log.debug("making run-status call for simulation '%s'", key)
+                run_status_response = self.sirepo_session._post_to_sirepo(
+                    f"{self.sirepo_session._server_url}/run-status",
+                    json=polled_simulation.next_request,
+                )
+                self.status_call_count += 1
+                polled_simulation.status_call_count += 1
+                self._update(
+                    key,
+                    polled_simulation,
+                    run_status_response,
+                    decode_run_status(run_status_response.content),
+                )
+                polled_count += 1
+        finally:
+            # if a run-status call raised, the simulations not yet polled
+            #   are polled at the next call
+            for due_entry in due_entries[polled_count:]:
+                heapq.heappush(self._due_heap, due_entry)
+
+        finished = self._finished
+        self._finished = []
+        return finished
+
+    def poll_once(self):
+        """Make a run-status call for every simulation that is due.
+
+        Returns
+        -------
+        list of (key, run_status_response) for simulations that finished,
+        including simulations that finished before this call
+        """
+        return [
+            (key, run_status_response)
+            for key, run_status_response, _ in self._poll_due()
+        ]
+
+    def completed(self, timeout=None):
+        """Yield (key, run_status_response) for each simulation as it finishes.
+
+        The state of a finished simulation is usually "completed" or "error" but can be
+        any state the server reports for a finished job, eg "canceled",
+        callers are responsible for checking which.
+
+        Parameters
+        ----------
+        timeout: float, optional
+          give up with TimeoutError if simulations are still running after this many seconds,
+          every running simulation is polled once more at the timeout
+        """
+        for key, run_status_response, _ in self._finished_simulations(timeout):
+            yield key, run_status_response
+
+    def completed_results(self, timeout=None):
+        """Yield (key, SirepoRunResult) for each simulation as it finishes.
+
+        The response body of each simulation is parsed only once and its numeric
+        arrays are decoded directly into NumPy arrays. As with `completed`
+        the state of a result is usually "completed" or "error".
+
+        Parameters
+        ----------
+        timeout: float, optional
+          give up with TimeoutError if simulations are still running after this many seconds,
+          every running simulation is polled once more at the timeout
+        """
+        for key, _, run_status in self._finished_simulations(timeout):
+            yield key, SirepoRunResult(run_status)
+
+    def _finished_simulations(self, timeout):
+        log = logging.getLogger(self.__class__.__name__)
+
+        if timeout is None:
+            deadline = None
+        else:
+            deadline = ttime.monotonic() + timeout
+
+        while self._running or self._finished:
+            yield from self._poll_due()
+            if self._due_heap:
+                next_due_time = self._due_heap[0][0]
+                at_deadline = deadline is not None and next_due_time >= deadline
+                if at_deadline:
+                    # the last run-status call is made at the deadline
+                    next_due_time = deadline
+                sleep_seconds = next_due_time - ttime.monotonic()
+                if sleep_seconds > 0:
+                    log.debug("sleeping for '%s' second(s)", sleep_seconds)
+                    ttime.sleep(sleep_seconds)
+                if at_deadline:
+                    yield from self._poll_due(poll_all=True)
+                    if self._running:
+                        raise TimeoutError(
+                            f"{len(self._running)} simulation(s) still running after {timeout}s"
+                        )
+
+
+class _PolledSimulation:
+    """Bookkeeping for one simulation tracked by RunStatusPoller."""
+
+    def __init__(self, report, start_time, callback):
+        self.report = report
+        self.start_time = start_time
+        self.callback = callback
+        self.next_request = None
+        self.incomplete_seconds = 0.0
+        self.status_call_count = 0
+        self.queue_wait_timer = QueueWaitTimer()
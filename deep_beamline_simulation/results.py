@@ -0,0 +1,219 @@
+import json
+import logging
+import re
+
+import numpy as np
+
+# run-status fields that hold (possibly very long) numeric data
+RESULT_ARRAY_KEYS = ("points", "z_matrix")
+
+_ARRAY_KEY_TOKENS = {
+    b'"' + array_key.encode() + b'"': array_key for array_key in RESULT_ARRAY_KEYS
+}
+# a JSON string or a bracket, the tokens that change or hide the nesting depth
+_STRUCTURE_TOKEN_PATTERN = re.compile(rb'"[^"\\]*(?:\\.[^"\\]*)*"|[\[\]{}]')
+_ARRAY_VALUE_START_PATTERN = re.compile(rb"\s*:\s*\[")
+_ARRAY_END_PATTERN = re.compile(rb"\]")
+_NESTED_ARRAY_END_PATTERN = re.compile(rb"\]\s*\]")
+_NESTED_ARRAY_START_PATTERN = re.compile(rb"\s*\[")
+_ROW_PATTERN = re.compile(rb"\[([^\[\]]*)\]")
+
+
+def _decode_numeric_array(body_bytes, array_start, array_end, is_nested):
+    """Decode a JSON array of numbers, or of arrays of numbers, into a NumPy array.
+
+    The array is body_bytes[array_start:array_end]. Rows are handed to np.loadtxt
+    one at a time so the array text is never copied as a whole.
+
+    Returns None if the array is not a (rectangular) numeric array.
+    """
+    try:
+        if is_nested:
+            row_count = body_bytes.count(b"[", array_start, array_end) - 1
+            array = np.loadtxt(
+                (
+                    row_match.group(1)
+                    for row_match in _ROW_PATTERN.finditer(
+                        body_bytes, array_start + 1, array_end - 1
+                    )
+                ),
+                delimiter=",",
+                dtype=np.float64,
+                ndmin=2,
+            )
+            # np.loadtxt skips empty rows
+            if array.shape[0] != row_count:
+                return None
+        else:
+            # without the brackets
+            numbers_start = array_start + 1
+            numbers_end = array_end - 1
+            numbers_bytes = body_bytes[numbers_start:numbers_end]
+            if not numbers_bytes.strip():
+                return np.zeros((0,))
+            array = np.loadtxt([numbers_bytes], delimiter=",", dtype=np.float64)
+    except ValueError:
+        return None
+    return array
+
+
+def decode_run_status(run_status_bytes):
+    """Parse a run-status response body with numeric arrays decoded straight into NumPy arrays.
+
+    The "points" and "z_matrix" arrays of a completed simulation can hold millions of
+    numbers. Rather than letting the json module build a Python float for each one the
+    arrays are found in the response body and parsed row by row by np.loadtxt, and only
+    the remaining small document is parsed by the json module. Arrays that can not be
+    decoded this way are left to the json module and converted afterwards.
+
+    Parameters
+    ----------
+    run_status_bytes: bytes
+      the body of a run-status (or run-simulation) response
+
+    Returns
+    -------
+    the run-status response as a dictionary with "points" and "z_matrix", if present,
+    as NumPy arrays
+    """
+    log = logging.getLogger("deep_beamline_simulation.results")
+
+    if isinstance(run_status_bytes, str):
+        run_status_bytes = run_status_bytes.encode()
+
+    decoded_arrays = {}
+    # (start, end) of each decoded array in run_status_bytes
+    decoded_spans = []
+    # only keys of the top-level object are decoded here, keys of nested objects
+    #   such as the "points" of each plot of a multi-plot report are left to the
+    #   json module, so the object depth is tracked outside of strings
+    depth = 0
+    scan_start = 0
+    while True:
+        token_match = _STRUCTURE_TOKEN_PATTERN.search(run_status_bytes, scan_start)
+        if token_match is None:
+            break
+        token = token_match.group()
+        scan_start = token_match.end()
+        if token in (b"{", b"["):
+            depth += 1
+            continue
+        elif token in (b"}", b"]"):
+            depth -= 1
+            continue
+        elif depth != 1 or token not in _ARRAY_KEY_TOKENS:
+            continue
+        array_key = _ARRAY_KEY_TOKENS[token]
+        array_value_start_match = _ARRAY_VALUE_START_PATTERN.match(
+            run_status_bytes, scan_start
+        )
+        if array_value_start_match is None or array_key in decoded_arrays:
+            continue
+        array_start = array_value_start_match.end() - 1
+
+        is_nested = (
+            _NESTED_ARRAY_START_PATTERN.match(run_status_bytes, array_start + 1)
+            is not None
+        )
+        if is_nested:
+            array_end_match = _NESTED_ARRAY_END_PATTERN.search(
+                run_status_bytes, array_start
+            )
+        else:
+            array_end_match = _ARRAY_END_PATTERN.search(run_status_bytes, array_start)
+        if array_end_match is None:
+            continue
+        array_end = array_end_match.end()
+
+        array = _decode_numeric_array(
+            run_status_bytes, array_start, array_end, is_nested
+        )
+        if array is None:
+            # the scan continues inside the array
+            log.debug("'%s' is not a numeric array, using the json module", array_key)
+            continue
+        decoded_arrays[array_key] = array
+        decoded_spans.append((array_start, array_end))
+        # the decoded array is not scanned
+        scan_start = array_end
+
+    # only the small remainder of the document is copied
+    remaining_bytes_parts = []
+    remainder_start = 0
+    for array_start, array_end in decoded_spans:
+        remaining_bytes_parts.append(run_status_bytes[remainder_start:array_start])
+        remaining_bytes_parts.append(b"null")
+        remainder_start = array_end
+    remaining_bytes_parts.append(run_status_bytes[remainder_start:])
+    remaining_bytes = b"".join(remaining_bytes_parts)
+
+    run_status = json.loads(remaining_bytes)
+    run_status.update(decoded_arrays)
+    for array_key in RESULT_ARRAY_KEYS:
+        if isinstance(run_status.get(array_key), list):
+            try:
+                # null becomes nan
+                run_status[array_key] = np.asarray(
+                    run_status[array_key], dtype=np.float64
+                )
+            except (TypeError, ValueError):
+                # a ragged or non-numeric array is left as a list
+                pass
+    return run_status
+
+
+class SirepoRunResult:
+    def __init__(self, run_status):
+        """
+        The result of a completed simulation.
+
+        Parameters
+        ----------
+        run_status: dict
+          a completed run-status response, for example from `decode_run_status`
+        """
+        self.run_status = run_status
+
+        self.state = run_status.get("state")
+        self.title = run_status.get("title")
+        self.x_label = run_status.get("x_label")
+        self.y_label = run_status.get("y_label")
+        self.z_label = run_status.get("z_label")
+        self.x_range = run_status.get("x_range")
+        self.y_range = run_status.get("y_range")
+        self.summary_data = run_status.get("summaryData", {})
+
+        self.points = run_status.get("points")
+        if self.points is not None:
+            self.points = np.asarray(self.points)
+        self.z_matrix = run_status.get("z_matrix")
+        if self.z_matrix is not None:
+            self.z_matrix = np.asarray(self.z_matrix)
+
+    @classmethod
+    def from_response(cls, run_status_response):
+        """Build a result from a run-status requests.Response."""
+        return cls(decode_run_status(run_status_response.content))
+
+    @property
+    def intensity(self):
+        """The intensity matrix of a 2D report or the points of a 1D report."""
+        if self.z_matrix is not None:
+            return self.z_matrix
+        return self.points
+
+    @property
+    def metadata(self):
+        """Everything in the run-status response except the numeric arrays."""
+        return {
+            key: value
+            for key, value in self.run_status.items()
+            if key not in RESULT_ARRAY_KEYS
+        }
+
+    def __repr__(self):
+        intensity = self.intensity
+        return (
+            f"{self.__class__.__name__}(state={self.state!r}, title={self.title!r}, "
+            f"shape={None if intensity is None else intensity.shape})"
+        )
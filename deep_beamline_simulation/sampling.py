@@ -0,0 +1,225 @@
+import itertools
+import logging
+
+import numpy as np
+
+
+class SamplingPlan:
+    def __init__(self, parameter_names, parameter_values):
+        """
+        Points in a space of beamline element parameters.
+
+        A plan is made with one of the constructors `grid`, `latin_hypercube`,
+        `sobol` or `random`, and is used for a Sirepo sweep or an rsopt SRW run:
+
+            sampling_plan = SamplingPlan.latin_hypercube(
+                {"Aperture": {"horizontalSize": (0.01, 1), "verticalSize": (0.01, 1)}},
+                point_count=100,
+                seed=1,
+            )
+            sweep_result = sirepo_session.run_sweep(
+                simulation_id, parameter_updates=sampling_plan.parameter_updates()
+            )
+            sampling_plan.write_rsopt_tasks("tasks.npy")
+
+        Latin hypercube and Sobol plans cover a space of many parameters with far
+        fewer points than a full grid.
+
+        Parameters
+        ----------
+        parameter_names: list of str
+          "<element title>_<parameter name>" for each parameter, the names of
+          the "params" dataset of results.h5, for example "Aperture_horizontalSize"
+        parameter_values: array-like
+          (point count, parameter count) array of parameter values
+        """
+        self.parameter_names = list(parameter_names)
+        self.parameter_values = np.asarray(parameter_values, dtype=np.float64).reshape(
+            -1, len(self.parameter_names)
+        )
+
+    def __len__(self):
+        return len(self.parameter_values)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(points={len(self)}, "
+            f"parameter_names={self.parameter_names!r})"
+        )
+
+    @classmethod
+    def grid(cls, parameter_grids):
+        """
+        Return a plan with every combination of the given parameter values.
+
+        The first parameter varies slowest.
+
+        Parameters
+        ----------
+        parameter_grids: dict
+          element title -> parameter name -> sequence of values, for example
+            {"Aperture": {"horizontalSize": np.linspace(0.01, 1, 5)}}
+        """
+        parameter_names, value_sequences = _flatten(parameter_grids)
+        return cls(
+            parameter_names,
+            np.array(list(itertools.product(*value_sequences)), dtype=np.float64),
+        )
+
+    @classmethod
+    def latin_hypercube(cls, parameter_ranges, point_count, seed=None):
+        """
+        Return a Latin hypercube plan, each parameter range is divided into
+        point_count intervals and each interval has exactly one point.
+
+        Parameters
+        ----------
+        parameter_ranges: dict
+          element title -> parameter name -> (low, high), for example
+            {"Aperture": {"horizontalSize": (0.01, 1), "verticalSize": (0.01, 1)}}
+        point_count: int
+          the number of points
+        seed: int, optional
+          seed of the random number generator
+        """
+        parameter_names, ranges = _flatten(parameter_ranges)
+        rng = np.random.default_rng(seed)
+        # one column of shuffled interval indices for each parameter
+        intervals = np.argsort(rng.random((point_count, len(ranges))), axis=0)
+        unit_points = (intervals + rng.random((point_count, len(ranges)))) / point_count
+        return cls(parameter_names, _scale(unit_points, ranges))
+
+    @classmethod
+    def sobol(cls, parameter_ranges, point_count, seed=None, scramble=True):
+        """
+        Return a plan of points from a Sobol sequence, which fills the parameter
+        space more evenly than random points. Requires scipy.
+
+        The sequence is most even when point_count is a power of 2.
+
+        Parameters
+        ----------
+        parameter_ranges: dict
+          element title -> parameter name -> (low, high)
+        point_count: int
+          the number of points
+        seed: int, optional
+          seed of the scrambling
+        scramble: bool
+          scramble the sequence, the first point of an unscrambled sequence is
+          the low corner of the parameter space
+        """
+        try:
+            from scipy.stats import qmc
+        except ImportError as import_error:
+            raise ImportError("Sobol sampling plans require scipy") from import_error
+
+        parameter_names, ranges = _flatten(parameter_ranges)
+        sobol_sampler = qmc.Sobol(d=len(ranges), scramble=scramble, seed=seed)
+        return cls(parameter_names, _scale(sobol_sampler.random(point_count), ranges))
+
+    @classmethod
+    def random(cls, parameter_ranges, point_count, seed=None):
+        """
+        Return a plan of uniformly distributed random points.
+
+        Parameters
+        ----------
+        parameter_ranges: dict
+          element title -> parameter name -> (low, high)
+        point_count: int
+          the number of points
+        seed: int, optional
+          seed of the random number generator
+        """
+        parameter_names, ranges = _flatten(parameter_ranges)
+        rng = np.random.default_rng(seed)
+        return cls(
+            parameter_names, _scale(rng.random((point_count, len(ranges))), ranges)
+        )
+
+    def parameter_updates(self):
+        """
+        Return the parameter updates of each point for SirepoGuestSession.run_sweep.
+
+        Returns
+        -------
+        list of element title -> parameter name -> value
+        """
+        # Sirepo parameter names are camelCase so the title is everything
+        #   before the last underscore
+        parameter_keys = [
+            parameter_name.rpartition("_")[::2]
+            for parameter_name in self.parameter_names
+        ]
+        all_parameter_updates = []
+        # tolist converts to Python floats, numpy scalars are not JSON serializable
+        for point_values in self.parameter_values.tolist():
+            point_updates = {}
+            for (title, parameter_name), parameter_value in zip(
+                parameter_keys, point_values
+            ):
+                point_updates.setdefault(title, {})[parameter_name] = parameter_value
+            all_parameter_updates.append(point_updates)
+        return all_parameter_updates
+
+    def write_rsopt_tasks(self, tasks_path, parameter_names=None):
+        """
+        Write the plan as an rsopt tasks file for the exported SRW runner.
+
+        The runner is started with `python <exported script> rsopt_run <tasks_path>`
+        and reads the points from the field 'x' of the saved structured array.
+
+        Parameters
+        ----------
+        tasks_path: str or Path
+          the .npy file to write
+        parameter_names: list of str, optional
+          the parameter order of the runner's `_rsopt_set_params`, by default
+          the order of this plan
+
+        Raises
+        ------
+        ValueError if the plan does not have the runner's parameters
+        """
+        log = logging.getLogger(self.__class__.__name__)
+
+        if parameter_names is None:
+            parameter_names = self.parameter_names
+        missing_parameter_names = set(parameter_names) - set(self.parameter_names)
+        if missing_parameter_names or len(parameter_names) != len(self.parameter_names):
+            raise ValueError(
+                f"the runner parameters {list(parameter_names)} do not match "
+                f"the plan parameters {self.parameter_names}"
+            )
+        column_order = [
+            self.parameter_names.index(parameter_name)
+            for parameter_name in parameter_names
+        ]
+
+        tasks = np.zeros(
+            (len(self),), dtype=[("x", np.float64, (len(parameter_names),))]
+        )
+        tasks["x"] = self.parameter_values[:, column_order]
+        # np.save would append ".npy" to a path without it
+        with open(tasks_path, "wb") as tasks_file:
+            np.save(tasks_file, tasks)
+        log.debug("wrote %d rsopt tasks to '%s'", len(tasks), tasks_path)
+
+
+def _flatten(nested_parameters):
+    """Return ("<title>_<parameter name>" list, value list) for a nested parameter dict."""
+    parameter_names = []
+    values = []
+    for title, element_parameters in nested_parameters.items():
+        for parameter_name, value in element_parameters.items():
+            parameter_names.append(f"{title}_{parameter_name}")
+            values.append(value)
+    return parameter_names, values
+
+
+def _scale(unit_points, ranges):
+    """Scale points in the unit hypercube to the parameter ranges."""
+    lows = np.array([low for low, high in ranges], dtype=np.float64)
+    highs = np.array([high for low, high in ranges], dtype=np.float64)
+    return lows + unit_points * (highs - lows)
@@ -0,0 +1,147 @@
+import logging
+import queue
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ContextDecorator, contextmanager
+
+from . import SirepoGuestSession
+
+
+class SirepoSessionPool(ContextDecorator):
+    def __init__(self, sirepo_server_url, simulation_type, size=4, **session_kwargs):
+        """
+        A fixed number of logged-in SirepoGuestSessions shared by worker threads.
+
+        The sessions log in as one Sirepo guest user, sharing the first session's
+        cookies, so a simulation id from any session can be used with all of them.
+        Each session has its own connections, and logs in again and repeats the
+        request by itself if its login expires or the server is restarted, so a
+        long sweep continues across server hiccups.
+
+        Sirepo runs one job at a time per simulation and report, so points that run
+        at the same time must run on different copies of the simulation. For example:
+
+            def run_point(sirepo_session, point_data):
+                point_simulation_id = sirepo_session.copy_simulation(
+                    simulation_id, name="sweep point"
+                )["models"]["simulation"]["simulationId"]
+                try:
+                    return sirepo_session.simulation_result(
+                        point_simulation_id, point_data, "intensityReport"
+                    )
+                finally:
+                    sirepo_session.delete_simulation(point_simulation_id)
+
+            with SirepoSessionPool(
+                sirepo_server_url="http://localhost:8000", simulation_type="srw", size=4
+            ) as session_pool:
+                with session_pool.session() as sirepo_session:
+                    simulation_id = sirepo_session.simulation_list()[
+                        "/Wavefront Propagation"
+                    ]["Diffraction by an Aperture"]
+                results = session_pool.map(run_point, sweep_data)
+
+        `SirepoGuestSession.run_sweep` does this with one copy per worker.
+
+        Parameters
+        ----------
+        sirepo_server_url: str
+          URI specifying host and port, eg. "http://localhost:8000"
+        simulation_type: str
+          "srw" or "shadow"
+        size: int
+          the number of sessions
+        session_kwargs:
+          passed to each SirepoGuestSession, for example `request_hooks`
+        """
+        self.sirepo_server_url = sirepo_server_url
+        self.simulation_type = simulation_type
+        self.size = size
+        self.session_kwargs = session_kwargs
+
+        self.sessions = []
+        self._idle_sessions = queue.Queue()
+
+    def login(self):
+        """Log in the first session, then the others concurrently as the same user."""
+        log = logging.getLogger(self.__class__.__name__)
+
+        self.sessions = [
+            SirepoGuestSession(
+                sirepo_server_url=self.sirepo_server_url,
+                simulation_type=self.simulation_type,
+                **self.session_kwargs,
+            )
+            for _ in range(self.size)
+        ]
+        self.sessions[0].login()
+        # each guest login without a cookie would be a new user with other simulation ids
+        user_cookies = list(self.sessions[0]._session.cookies)
+        with ThreadPoolExecutor(max_workers=self.size) as executor:
+            list(
+                executor.map(
+                    lambda sirepo_session: sirepo_session.login(cookies=user_cookies),
+                    self.sessions[1:],
+                )
+            )
+        for sirepo_session in self.sessions:
+            self._idle_sessions.put(sirepo_session)
+        log.debug("logged in %d sessions", self.size)
+
+    def logout(self):
+        for sirepo_session in self.sessions:
+            sirepo_session.logout()
+        self.sessions = []
+        self._idle_sessions = queue.Queue()
+
+    def __enter__(self):
+        self.login()
+        return self
+
+    def __exit__(self, *exc):
+        self.logout()
+        return False
+
+    @property
+    def relogin_count(self):
+        """The number of times sessions in this pool have logged in again."""
+        return sum(sirepo_session.relogin_count for sirepo_session in self.sessions)
+
+    @contextmanager
+    def session(self, timeout=None):
+        """Borrow a session, waiting for one to be returned if all are in use.
+
+        For example:
+
+            with session_pool.session() as sirepo_session:
+                simulation_data = sirepo_session.simulation_data(simulation_id)
+        """
+        sirepo_session = self._idle_sessions.get(timeout=timeout)
+        try:
+            yield sirepo_session
+        finally:
+            self._idle_sessions.put(sirepo_session)
+
+    def map(self, function, iterable, max_workers=None):
+        """Return [function(sirepo_session, item) for item in iterable], computed concurrently.
+
+        Each call borrows a session for its duration.
+
+        Parameters
+        ----------
+        function: callable
+          called with a session and one item
+        iterable: iterable
+          the items
+        max_workers: int, optional
+          the number of worker threads, by default the number of sessions
+        """
+        if max_workers is None:
+            max_workers = self.size
+
+        def call_with_session(item):
+            with self.session() as sirepo_session:
+                return function(sirepo_session, item)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return list(executor.map(call_with_session, iterable))
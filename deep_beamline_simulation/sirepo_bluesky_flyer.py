@@ -30,7 +30,27 @@ def bluesky_utils():
 
 
 # run flyer simulation
-def flyer(sim_id, aperture, lens, optic, watch_point):
+def flyer(sim_id, aperture, lens, optic, watch_point, sampling_plan=None):
+    # a SamplingPlan over any element parameters replaces the example points
+    if sampling_plan is not None:
+        params_to_change = sampling_plan.parameter_updates()
+    else:
+        params_to_change = _example_params_to_change(aperture, lens, optic)
+    # setup data collection location
+    root_dir = "/tmp/sirepo_flyer_data"
+    _ = make_dir_tree(datetime.datetime.now().year, base_path=root_dir)
+    sirepo_flyer = sf.SirepoFlyer(
+        sim_id=sim_id,
+        server_name="http://10.10.10.10:8000",
+        root_dir=root_dir,
+        params_to_change=params_to_change,
+        watch_name=watch_point,
+    )
+    return sirepo_flyer
+
+
+# five example points changing an aperture, a lens, and an optic together
+def _example_params_to_change(aperture, lens, optic):
     params_to_change = []
     for i in range(1, 6):
         aperture_name = aperture
@@ -46,17 +66,7 @@ def flyer(sim_id, aperture, lens, optic, watch_point):
                 optics_name: parameters_update3,
             }
         )
-    # setup data collection location
-    root_dir = "/tmp/sirepo_flyer_data"
-    _ = make_dir_tree(datetime.datetime.now().year, base_path=root_dir)
-    sirepo_flyer = sf.SirepoFlyer(
-        sim_id=sim_id,
-        server_name="http://10.10.10.10:8000",
-        root_dir=root_dir,
-        params_to_change=params_to_change,
-        watch_name=watch_point,
-    )
-    return sirepo_flyer
+    return params_to_change
 
 
 def main():
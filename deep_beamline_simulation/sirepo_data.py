@@ -3,92 +3,149 @@ import numpy as np
 import matplotlib.pyplot as plt
 from sirepo_bluesky.sirepo_bluesky import SirepoBluesky
 
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.beamline import BeamlineIndex
+from deep_beamline_simulation.catalog import SimulationCatalog
+from deep_beamline_simulation.sampling import SamplingPlan
+
 
 class sirepo_data:
     def __init__(self, simulation_id):
+        self.sirepo_server_url = "http://localhost:8000"
         # define sirepo bluesky object
-        self.sb = SirepoBluesky("http://localhost:8000")
+        self.sb = SirepoBluesky(self.sirepo_server_url)
         # define sim _id
         self.sim_id = simulation_id
         # authenticate and define simulation
         self.data, self.schema = self.sb.auth("srw", self.sim_id)
+        # index beamline elements by title, id and type once
+        self.beamline_index = BeamlineIndex(self.data)
+        # built by get_simids
+        self.catalog = None
 
     def get_simids(self):
+        # index all simulation information once
+        if self.catalog is None:
+            self.catalog = SimulationCatalog(self.sb.simulation_list())
         # stores all simulation id's and names
-        id_dict = {}
-        # get all simulation information
-        sim_dict = self.sb.simulation_list()
-        for d in sim_dict:
-            for key in d:
-                if key == "simulationId":
-                    id_dict[d["name"]] = d[key]
-        return id_dict
+        return {d["name"]: d["simulationId"] for d in self.catalog}
 
     def get_data(self):
         # returns data file
         return self.sb.get_datafile()
 
     def get_components(self):
-        # get beamline dictionary
-        beamline = self.data["models"]["beamline"]
-        # create dictonary for organized data
-        components = {}
-        # get the title of each
-        for d in beamline:
-            parameter_list = {}
-            for key in d:
-                if key == "title":
-                    components[d["title"]] = parameter_list
-                else:
-                    parameter_list[key] = d[key]
-        return components
+        # title -> parameters of each beamline element, built once
+        return self.beamline_index.components()
 
     # for specific beamline example
-    def generate_data(self):
-        # get beamline component, example: aperture
-        aperture = self.sb.find_element(
-            self.data["models"]["beamline"], "title", "Aperture"
-        )
+    def generate_data(
+        self,
+        horizontal_sizes=None,
+        vertical_sizes=None,
+        max_workers=4,
+        h5_path=None,
+        sampling_plan=None,
+    ):
+        """
+        Simulate the watchpoint intensity for a grid of aperture sizes, or for
+        the points of a sampling plan. Grid points are in the order of the
+        original loops, the vertical size varies slowest.
+
+        The points run concurrently on copies of the simulation and every
+        intensity matrix is kept with its aperture sizes.
+
+        Parameters
+        ----------
+        horizontal_sizes: sequence of float, optional
+          aperture horizontal sizes, by default np.linspace(0.01, 1, 2)
+        vertical_sizes: sequence of float, optional
+          aperture vertical sizes, by default np.linspace(0.01, 1, 2)
+        max_workers: int
+          the number of simulations running at the same time
+        h5_path: str or Path, optional
+          write the results to an HDF5 file in the layout of results.h5, with
+          datasets "params", "paramVals" and "beamIntensities"
+        sampling_plan: SamplingPlan, optional
+          the points to simulate, for example a Latin hypercube over several
+          elements, instead of the grid of aperture sizes
+
+        Returns
+        -------
+        SirepoSweepResult with one point for each point of the sampling plan
+
+        This used to return only the intensity matrix ("z_matrix") of the last
+        point; the intensity matrix of every point is now in the intensities of
+        the returned SirepoSweepResult, so the last point's matrix is
+        ``sweep_result.intensities[-1]``.
+        """
+        # pick watchpoint
+        watch = self.beamline_index.by_title("Watchpoint")
+        if sampling_plan is None:
+            if horizontal_sizes is None:
+                horizontal_sizes = np.linspace(0.01, 1, 2)
+            if vertical_sizes is None:
+                vertical_sizes = np.linspace(0.01, 1, 2)
+            # the vertical size varies slowest, as in the original nested loops
+            sampling_plan = SamplingPlan(
+                ["Aperture_horizontalSize", "Aperture_verticalSize"],
+                [
+                    (horizontal_size, vertical_size)
+                    for vertical_size in vertical_sizes
+                    for horizontal_size in horizontal_sizes
+                ],
+            )
         # time this process
-        t_start = time.time()
-        # determine vertical and horizontal size range
-        vertical = np.linspace(0.01, 1, 2)
-        horizontal = np.linspace(0.01, 1, 2)
-        # loop through each value
-        for v in vertical:
-            for h in horizontal:
-                # define sizes
-                aperture["horizontalSize"] = h
-                aperture["verticalSize"] = v
-                # pick watchpoint
-                watch = self.sb.find_element(
-                    self.data["models"]["beamline"], "title", "Watchpoint"
-                )
-                # define watchpoint report
-                self.data["report"] = "watchpointReport{}".format(watch["id"])
-                # run simulation
-                # data is parsed into cols of number of horizontal points
-                hor_ver_int = self.sb.run_simulation()
-                print(
-                    hor_ver_int["x_label"] + " has range " + str(hor_ver_int["x_range"])
-                )
-                print(
-                    hor_ver_int["y_label"] + " has range " + str(hor_ver_int["y_range"])
+        t_start = time.monotonic()
+        # log in as the owner of the simulation
+        with SirepoGuestSession(
+            sirepo_server_url=self.sirepo_server_url,
+            simulation_type="srw",
+            login_mode="bluesky",
+            bluesky_simulation_id=self.sim_id,
+        ) as sirepo_session:
+            sweep_result = sirepo_session.run_sweep(
+                self.sim_id,
+                base_data=self.data,
+                parameter_updates=sampling_plan.parameter_updates(),
+                simulation_report="watchpointReport{}".format(watch["id"]),
+                max_workers=max_workers,
+                h5_path=h5_path,
+            )
+        t_total = time.monotonic() - t_start
+
+        # display each point and the time taken to collect data
+        for point_values, run_seconds, metadata in zip(
+            sweep_result.parameter_values,
+            sweep_result.run_seconds,
+            sweep_result.metadata,
+        ):
+            print(
+                ", ".join(
+                    "{} {:.3f}".format(parameter_name, parameter_value)
+                    for parameter_name, parameter_value in zip(
+                        sweep_result.parameter_names, point_values
+                    )
                 )
-                print(
-                    hor_ver_int["z_label"] + " has range " + str(hor_ver_int["z_range"])
+                + ": {:.2f} s, ".format(run_seconds)
+                + "{} has range {}, {} has range {}".format(
+                    metadata.get("x_label"),
+                    metadata.get("x_range"),
+                    metadata.get("y_label"),
+                    metadata.get("y_range"),
                 )
-                # plot if needed
-                # plt.imshow(hor_ver_int["z_matrix"])
-                # plt.show()
-                # plt.pause(0.01)
-                # plt.close()
-        t_end = time.time()
-        # display time taken to collect data
-        print((t_start - t_end) / 60.0)
-        # possibly move to a file?
-        intensity_matrix = hor_ver_int["z_matrix"]
-        return intensity_matrix
+            )
+        point_count = len(sweep_result)
+        print(
+            "{} points in {:.2f} s, {:.2f} points/s with {} workers, {:.2f} s per point".format(
+                point_count,
+                t_total,
+                point_count / t_total if t_total > 0 else 0.0,
+                max_workers,
+                sweep_result.run_seconds.mean() if point_count else 0.0,
+            )
+        )
+        return sweep_result
 
 
 def main():
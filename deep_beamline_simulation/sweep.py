@@ -0,0 +1,135 @@
+import logging
+import numbers
+
+import h5py
+import numpy as np
+
+
+def parameter_names(parameter_updates):
+    """Return "<title>_<parameter name>" for each numeric parameter in parameter_updates.
+
+    The names follow the "params" dataset of the results.h5 files used for
+    machine learning, for example "Aperture_horizontalSize".
+    """
+    return [
+        f"{title}_{parameter_name}"
+        for title, element_updates in parameter_updates.items()
+        for parameter_name, parameter_value in element_updates.items()
+        if isinstance(parameter_value, numbers.Real)
+    ]
+
+
+def parameter_values(parameter_updates, names):
+    """Return the values of the named parameters as a float array, nan if a value is missing."""
+    values = {
+        f"{title}_{parameter_name}": parameter_value
+        for title, element_updates in parameter_updates.items()
+        for parameter_name, parameter_value in element_updates.items()
+    }
+    return np.array([values.get(name, np.nan) for name in names], dtype=np.float64)
+
+
+class SirepoSweepResult:
+    def __init__(
+        self, parameter_updates, parameter_names, intensities=None, h5_path=None
+    ):
+        """
+        The results of SirepoGuestSession.run_sweep in the order of the parameter updates.
+
+        Parameters
+        ----------
+        parameter_updates: list of dict
+          the parameter updates for each point
+        parameter_names: list of str
+          names of the numeric parameters, the columns of `parameter_values`
+        intensities: numpy.ndarray, optional
+          the intensity of each point stacked along the first axis, None if
+          the intensities were written to h5_path
+        h5_path: str or Path, optional
+          the HDF5 file the intensities were written to
+        """
+        self.parameter_updates = parameter_updates
+        self.parameter_names = parameter_names
+        self.parameter_values = (
+            np.stack(
+                [
+                    parameter_values(point_updates, parameter_names)
+                    for point_updates in parameter_updates
+                ]
+            )
+            if parameter_updates
+            else np.zeros((0, len(parameter_names)))
+        )
+        self.intensities = intensities
+        self.h5_path = h5_path
+
+        point_count = len(parameter_updates)
+        # seconds from run-simulation to the completed run-status response,
+        #   0 for stored results
+        self.run_seconds = np.zeros((point_count,))
+        self.from_result_cache = np.zeros((point_count,), dtype=bool)
+        # the run-status metadata (labels, ranges, summaryData) of each point
+        self.metadata = [None] * point_count
+
+    def __len__(self):
+        return len(self.parameter_updates)
+
+    def __repr__(self):
+        return (
+            f"{self.__class__.__name__}(points={len(self)}, "
+            f"parameter_names={self.parameter_names!r}, "
+            f"total_run_seconds={self.run_seconds.sum():.3f})"
+        )
+
+
+class _IntensityStack:
+    """Collect intensities of known count, in memory or in an HDF5 file.
+
+    The stack is allocated when the first intensity arrives and its shape is known.
+    """
+
+    def __init__(self, point_count, parameter_names, parameter_values, h5_path=None):
+        self.point_count = point_count
+        self.parameter_names = parameter_names
+        self.parameter_values = parameter_values
+        self.h5_path = h5_path
+
+        self.intensities = None
+        self._h5_file = None
+
+    def __enter__(self):
+        if self.h5_path is not None:
+            self._h5_file = h5py.File(self.h5_path, mode="w")
+            self._h5_file.create_dataset("params", data=self.parameter_names)
+            self._h5_file.create_dataset("paramVals", data=self.parameter_values)
+        return self
+
+    def __exit__(self, *exc):
+        if self._h5_file is not None:
+            self._h5_file.close()
+        return False
+
+    def put(self, point_i, intensity):
+        log = logging.getLogger(self.__class__.__name__)
+
+        intensity = np.asarray(intensity)
+        if self.intensities is None:
+            stack_shape = (self.point_count,) + intensity.shape
+            log.debug("allocating an intensity stack with shape %s", stack_shape)
+            if self._h5_file is None:
+                self.intensities = np.zeros(stack_shape, dtype=intensity.dtype)
+            else:
+                # one chunk per point so each point is written once
+                self.intensities = self._h5_file.create_dataset(
+                    "beamIntensities",
+                    shape=stack_shape,
+                    dtype=intensity.dtype,
+                    chunks=(1,) + intensity.shape if intensity.shape else None,
+                )
+        elif intensity.shape != self.intensities.shape[1:]:
+            raise ValueError(
+                f"point {point_i} has intensity shape {intensity.shape} but earlier points "
+                f"have shape {self.intensities.shape[1:]}"
+            )
+
+        self.intensities[point_i] = intensity
@@ -1,8 +1,13 @@
+import json
 import logging
 
+from pathlib import Path
+
 import pytest
 
+import deep_beamline_simulation
 from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.fake_sirepo import FakeSirepoServer
 
 
 # urllib3 generates a lot of DEBUG logging output when
@@ -28,3 +33,25 @@ def sirepo_guest_session(sirepo_server_url):
         )
 
     return sirepo_guest_session_
+
+
+@pytest.fixture
+def fake_sirepo_server():
+    """
+    A FakeSirepoServer for tests that do not need a real Sirepo server.
+    """
+    with FakeSirepoServer(run_seconds=0.1) as fake_sirepo_server_:
+        yield fake_sirepo_server_
+
+
+@pytest.fixture
+def srx_simulation_data():
+    """
+    The NSLS-II SRX beamline simulation data, a new copy for each test.
+    """
+    srx_json_path = (
+        Path(deep_beamline_simulation.__path__[0])
+        / "test_data"
+        / "sirepo-simulation-data-srx.json"
+    )
+    return json.loads(srx_json_path.read_text())
@@ -0,0 +1,47 @@
+import asyncio
+
+from deep_beamline_simulation.async_session import AsyncSirepoGuestSession
+
+
+def test_async_simulation_list(sirepo_server_url):
+    async def simulation_list():
+        async with AsyncSirepoGuestSession(
+            sirepo_server_url=sirepo_server_url, simulation_type="srw"
+        ) as sirepo_session:
+            return await sirepo_session.simulation_list()
+
+    simulation_table = asyncio.run(simulation_list())
+    assert "/Wavefront Propagation" in simulation_table
+    assert "Diffraction by an Aperture" in simulation_table["/Wavefront Propagation"]
+
+
+def test_async_run_simulations(sirepo_server_url):
+    async def run_simulations():
+        async with AsyncSirepoGuestSession(
+            sirepo_server_url=sirepo_server_url,
+            simulation_type="srw",
+            max_concurrent_simulations=2,
+        ) as sirepo_session:
+            simulation_table = await sirepo_session.simulation_list()
+            simulation_id = simulation_table["/Wavefront Propagation"][
+                "Diffraction by an Aperture"
+            ]
+            aperture_simulation_data = await sirepo_session.simulation_data(
+                simulation_id=simulation_id
+            )
+            return await asyncio.gather(
+                *[
+                    sirepo_session.run_simulation_and_wait(
+                        simulation_id=simulation_id,
+                        simulation_data=aperture_simulation_data,
+                        simulation_report=simulation_report,
+                    )
+                    for simulation_report in ("intensityReport", "watchpointReport6")
+                ]
+            )
+
+    run_status_list = asyncio.run(run_simulations())
+    assert [run_status["state"] for run_status in run_status_list] == [
+        "completed",
+        "completed",
+    ]
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from deep_beamline_simulation.beamline import BeamlineIndex
+
+
+def test_beamline_index_lookups(srx_simulation_data):
+    beamline_index = BeamlineIndex(srx_simulation_data)
+    beamline_elements = srx_simulation_data["models"]["beamline"]
+
+    assert len(beamline_index) == 12
+    assert beamline_index.by_title("DCM: C2") is beamline_elements[4]
+    assert beamline_index.by_id(12)["title"] == "AKB"
+    assert [
+        watch_element["title"] for watch_element in beamline_index.by_type("watch")
+    ] == ["At BPM1", "Before SSA", "At Sample"]
+    assert beamline_index.by_type("lens") == []
+    assert beamline_index.components()["S0"] == {
+        "horizontalOffset": 0,
+        "horizontalSize": 2,
+        "id": 2,
+        "position": 33.1798,
+        "shape": "r",
+        "type": "aperture",
+        "verticalOffset": 0,
+        "verticalSize": 1,
+    }
+    with pytest.raises(KeyError):
+        beamline_index.by_title("Lens")
+
+
+def test_apply_parameter_updates(srx_simulation_data):
+    beamline_index = BeamlineIndex(srx_simulation_data)
+    beamline_elements = srx_simulation_data["models"]["beamline"]
+
+    point_data = beamline_index.apply_parameter_updates(
+        {"SSA": {"horizontalSize": 0.5}, "simulation": {"photonEnergy": 9500}}
+    )
+    assert point_data["models"]["beamline"][7]["horizontalSize"] == 0.5
+    assert point_data["models"]["simulation"]["photonEnergy"] == 9500
+    # the template is not modified
+    assert beamline_elements[7]["horizontalSize"] != 0.5
+    assert srx_simulation_data["models"]["simulation"]["photonEnergy"] != 9500
+
+    with pytest.raises(KeyError):
+        beamline_index.apply_parameter_updates({"Lens": {"horizontalSize": 0.5}})
+
+
+def test_apply_parameter_rows(srx_simulation_data):
+    beamline_index = BeamlineIndex(srx_simulation_data)
+    beamline_elements = srx_simulation_data["models"]["beamline"]
+
+    parameter_rows = np.array([[0.1, 0.2, 9000.0], [0.3, 0.4, 10000.0]])
+    points_data = list(
+        beamline_index.apply_parameter_rows(
+            ["SSA_horizontalSize", "SSA_verticalSize", "simulation_photonEnergy"],
+            parameter_rows,
+        )
+    )
+
+    assert len(points_data) == 2
+    for point_data, parameter_row in zip(points_data, parameter_rows):
+        ssa_element = point_data["models"]["beamline"][7]
+        assert ssa_element["horizontalSize"] == parameter_row[0]
+        assert ssa_element["verticalSize"] == parameter_row[1]
+        # Python floats, not numpy scalars
+        assert type(ssa_element["horizontalSize"]) is float
+        assert point_data["models"]["simulation"]["photonEnergy"] == parameter_row[2]
+        # elements that are not updated are shared with the template
+        assert point_data["models"]["beamline"][0] is beamline_elements[0]
+        assert point_data["models"]["undulator"] is (
+            srx_simulation_data["models"]["undulator"]
+        )
+
+    # the template is not modified
+    assert beamline_elements[7]["horizontalSize"] != 0.1
+    assert srx_simulation_data["models"]["simulation"]["photonEnergy"] != 9000.0
+
+    with pytest.raises(KeyError):
+        list(beamline_index.apply_parameter_rows(["Lens_size"], [[1.0]]))
+    with pytest.raises(ValueError):
+        list(
+            beamline_index.apply_parameter_rows(
+                ["SSA_horizontalSize"], np.zeros((2, 2))
+            )
+        )
@@ -0,0 +1,357 @@
+import os
+
+import numpy as np
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.cache import (
+    DiskLRUStore,
+    SirepoResponseCache,
+    SirepoResultCache,
+)
+
+
+def test_response_cache(tmp_path):
+    response_cache = SirepoResponseCache(cache_dir=tmp_path, ttl_seconds=60)
+
+    assert (
+        response_cache.get(
+            "http://localhost:8000", "uid:1", "srw", "simulation", "ep6O223w"
+        )
+        is None
+    )
+    response_cache.put(
+        "http://localhost:8000",
+        "uid:1",
+        "srw",
+        "simulation",
+        {"models": {"beamline": []}},
+        "ep6O223w",
+    )
+    assert response_cache.get(
+        "http://localhost:8000", "uid:1", "srw", "simulation", "ep6O223w"
+    ) == {"models": {"beamline": []}}
+    # the key includes the server url, user, simulation type and simulation id
+    assert (
+        response_cache.get(
+            "http://localhost:8001", "uid:1", "srw", "simulation", "ep6O223w"
+        )
+        is None
+    )
+    assert (
+        response_cache.get(
+            "http://localhost:8000", "uid:2", "srw", "simulation", "ep6O223w"
+        )
+        is None
+    )
+    assert (
+        response_cache.get(
+            "http://localhost:8000", "uid:1", "shadow", "simulation", "ep6O223w"
+        )
+        is None
+    )
+    assert (
+        response_cache.get(
+            "http://localhost:8000", "uid:1", "srw", "simulation", "Ralizjbm"
+        )
+        is None
+    )
+
+    response_cache.invalidate(
+        "http://localhost:8000", "uid:1", "srw", "simulation", "ep6O223w"
+    )
+    assert (
+        response_cache.get(
+            "http://localhost:8000", "uid:1", "srw", "simulation", "ep6O223w"
+        )
+        is None
+    )
+
+
+def test_response_cache_guest_users(fake_sirepo_server, tmp_path):
+    response_cache = SirepoResponseCache(cache_dir=tmp_path)
+
+    def aperture_simulation_id(sirepo_session):
+        return sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+
+    # each guest login is a new user with its own simulation ids
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        response_cache=response_cache,
+    ) as first_session:
+        first_simulation_id = aperture_simulation_id(first_session)
+        first_session.simulation_data(first_simulation_id)
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        response_cache=response_cache,
+    ) as second_session:
+        # the first user's simulation list is not used
+        second_simulation_id = aperture_simulation_id(second_session)
+        assert second_simulation_id != first_simulation_id
+        second_simulation_data = second_session.simulation_data(second_simulation_id)
+        assert (
+            second_simulation_data["models"]["simulation"]["simulationId"]
+            == second_simulation_id
+        )
+        assert (
+            second_session.simulation_result(
+                second_simulation_id,
+                second_simulation_data,
+                "watchpointReport6",
+                timeout=10,
+            ).state
+            == "completed"
+        )
+
+
+def test_response_cache_guest_cookies(fake_sirepo_server, tmp_path):
+    response_cache = SirepoResponseCache(cache_dir=tmp_path)
+
+    first_session = SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        response_cache=response_cache,
+    )
+    first_session.login()
+    first_simulation_list = first_session.simulation_list()
+    cookies = list(first_session._session.cookies)
+
+    # logging in with the cookies of the first session is the same guest user
+    second_session = SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        response_cache=response_cache,
+    )
+    second_session.login(cookies=cookies)
+    assert second_session.user_id == first_session.user_id
+    simulation_list_count = fake_sirepo_server.request_counts["simulation-list"]
+    assert second_session.simulation_list() == first_simulation_list
+    assert fake_sirepo_server.request_counts["simulation-list"] == simulation_list_count
+
+    second_session.logout()
+    first_session.logout()
+
+
+def test_response_cache_simulation_serial(fake_sirepo_server, tmp_path):
+    response_cache = SirepoResponseCache(cache_dir=tmp_path)
+
+    first_session = SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        response_cache=response_cache,
+    )
+    first_session.login()
+    simulation_ids = [
+        simulation_id
+        for folder_simulations in first_session.simulation_list().values()
+        for simulation_id in folder_simulations.values()
+    ]
+    aperture_simulation_id = first_session.simulation_list()["/Wavefront Propagation"][
+        "Diffraction by an Aperture"
+    ]
+    other_simulation_id = next(
+        simulation_id
+        for simulation_id in simulation_ids
+        if simulation_id != aperture_simulation_id
+    )
+    first_session.simulation_data(aperture_simulation_id)
+    first_session.simulation_data(other_simulation_id)
+    cookies = list(first_session._session.cookies)
+
+    # the aperture simulation is edited on the server after it was cached
+    server_simulation_data = fake_sirepo_server.simulation_data(
+        first_session.user_id, aperture_simulation_id
+    )
+    server_simulation_data["models"]["simulation"]["simulationSerial"] += 1
+    server_simulation_data["models"]["simulation"]["notes"] = "edited"
+
+    # the login handshake receives the current simulation list, so there are no
+    #   simulation-list requests and only the edited simulation is requested
+    simulation_list_count = fake_sirepo_server.request_counts["simulation-list"]
+    second_session = SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        response_cache=response_cache,
+    )
+    second_session.login(cookies=cookies)
+    second_session.simulation_list()
+    assert (
+        fake_sirepo_server.request_counts["simulation-list"]
+        == simulation_list_count + 1
+    )
+    simulation_count = fake_sirepo_server.request_counts["simulation"]
+    second_session.simulation_data(other_simulation_id)
+    assert fake_sirepo_server.request_counts["simulation"] == simulation_count
+    aperture_simulation_data = second_session.simulation_data(aperture_simulation_id)
+    assert fake_sirepo_server.request_counts["simulation"] == simulation_count + 1
+    assert aperture_simulation_data["models"]["simulation"]["notes"] == "edited"
+    # the fresh response replaced the stale one in the cache
+    second_session.simulation_data(aperture_simulation_id)
+    assert fake_sirepo_server.request_counts["simulation"] == simulation_count + 1
+
+    second_session.logout()
+    first_session.logout()
+
+
+def test_response_cache_ttl(tmp_path):
+    response_cache = SirepoResponseCache(cache_dir=tmp_path, ttl_seconds=0)
+    response_cache.put("http://localhost:8000", "uid:1", "srw", "simulation-list", [])
+    assert (
+        response_cache.get("http://localhost:8000", "uid:1", "srw", "simulation-list")
+        is None
+    )
+
+
+def test_response_cache_lru_eviction(tmp_path):
+    response_cache = SirepoResponseCache(cache_dir=tmp_path, max_entries=2)
+
+    for simulation_id in ("a", "b"):
+        response_cache.put(
+            "http://localhost:8000", "uid:1", "srw", "simulation", {}, simulation_id
+        )
+    # make "a" the least recently used entry, then use it
+    os.utime(
+        response_cache.entry_path(
+            response_cache.hash_key(
+                "http://localhost:8000", "uid:1", "srw", "simulation", "a"
+            )
+        ),
+        (0, 0),
+    )
+    os.utime(
+        response_cache.entry_path(
+            response_cache.hash_key(
+                "http://localhost:8000", "uid:1", "srw", "simulation", "b"
+            )
+        ),
+        (1, 1),
+    )
+    assert (
+        response_cache.get("http://localhost:8000", "uid:1", "srw", "simulation", "a")
+        == {}
+    )
+
+    # now "b" is the least recently used entry
+    response_cache.put("http://localhost:8000", "uid:1", "srw", "simulation", {}, "c")
+    assert (
+        response_cache.get("http://localhost:8000", "uid:1", "srw", "simulation", "a")
+        == {}
+    )
+    assert (
+        response_cache.get("http://localhost:8000", "uid:1", "srw", "simulation", "b")
+        is None
+    )
+    assert (
+        response_cache.get("http://localhost:8000", "uid:1", "srw", "simulation", "c")
+        == {}
+    )
+
+
+def test_disk_lru_store_eviction_scans(tmp_path, monkeypatch):
+    disk_lru_store = DiskLRUStore(tmp_path, suffix=".bin", max_entries=20)
+    evict_calls = []
+    evict = disk_lru_store.evict
+
+    def counted_evict():
+        evict_calls.append(len(evict_calls))
+        evict()
+
+    monkeypatch.setattr(disk_lru_store, "evict", counted_evict)
+    for entry_i in range(100):
+        disk_lru_store.write_bytes(disk_lru_store.hash_key(entry_i), b"entry")
+        assert len(list(tmp_path.glob("*.bin"))) <= 20
+
+    # the first write scans the directory, then each scan evicts down to 18
+    #   entries so the next is 3 writes away
+    assert len(evict_calls) == 1 + (100 - 20 + 2) // 3
+    # rewriting an entry does not add to the count
+    for _ in range(5):
+        disk_lru_store.write_bytes(disk_lru_store.hash_key(99), b"entry")
+    assert len(evict_calls) == 1 + (100 - 20 + 2) // 3
+
+
+def test_result_cache(tmp_path):
+    result_cache = SirepoResultCache(cache_dir=tmp_path)
+
+    simulation_data = {
+        "models": {
+            "beamline": [{"id": 2, "title": "S0", "horizontalSize": 2}],
+            "simulation": {"simulationId": "ep6O223w", "lastModified": 1},
+        },
+        "simulationId": "ep6O223w",
+        "simulationType": "srw",
+    }
+    assert result_cache.get("srw", simulation_data, "watchpointReport6") is None
+
+    result_cache.put(
+        "srw",
+        simulation_data,
+        "watchpointReport6",
+        {"state": "completed", "x_range": [0, 1, 2], "z_matrix": [[1.0, 2.0]]},
+    )
+
+    # a copy of the simulation with a different id gives the same result
+    simulation_copy_data = {
+        "models": {
+            "beamline": [{"horizontalSize": 2, "id": 2, "title": "S0"}],
+            "simulation": {"simulationId": "Ralizjbm", "lastModified": 2},
+        },
+        "simulationId": "Ralizjbm",
+        "simulationType": "srw",
+    }
+    result = result_cache.get("srw", simulation_copy_data, "watchpointReport6")
+    assert result["state"] == "completed"
+    assert result["x_range"] == [0, 1, 2]
+    assert isinstance(result["z_matrix"], np.ndarray)
+    assert np.array_equal(result["z_matrix"], [[1.0, 2.0]])
+
+    # but a different report or different parameters do not
+    assert result_cache.get("srw", simulation_data, "watchpointReport7") is None
+    simulation_data["models"]["beamline"][0]["horizontalSize"] = 3
+    assert result_cache.get("srw", simulation_data, "watchpointReport6") is None
+
+
+def test_result_cache_non_numeric_fields(tmp_path):
+    result_cache = SirepoResultCache(cache_dir=tmp_path)
+    simulation_data = {"models": {"beamline": [{"horizontalSize": 2}]}}
+
+    # neither field is a numeric array so both are stored without pickling
+    result_cache.put(
+        "srw",
+        simulation_data,
+        "watchpointReport6",
+        {
+            "state": "completed",
+            "points": [1.0, None, 3.0],
+            "z_matrix": [[1.0, 2.0], [3.0]],
+        },
+    )
+    result = result_cache.get("srw", simulation_data, "watchpointReport6")
+    assert result["state"] == "completed"
+    assert result["points"] == [1.0, None, 3.0]
+    assert result["z_matrix"] == [[1.0, 2.0], [3.0]]
+
+
+def test_result_cache_max_bytes(tmp_path):
+    result_cache = SirepoResultCache(cache_dir=tmp_path, max_bytes=20000)
+    for horizontal_size in range(4):
+        result_cache.put(
+            "srw",
+            {"models": {"beamline": [{"horizontalSize": horizontal_size}]}},
+            "watchpointReport6",
+            {"state": "completed", "z_matrix": np.zeros((30, 30))},
+        )
+
+    stored_bytes = sum(p.stat().st_size for p in tmp_path.iterdir())
+    assert stored_bytes <= 20000
+    assert (
+        result_cache.get(
+            "srw",
+            {"models": {"beamline": [{"horizontalSize": 3}]}},
+            "watchpointReport6",
+        )
+        is not None
+    )
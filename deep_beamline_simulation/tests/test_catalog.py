@@ -0,0 +1,121 @@
+import pytest
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.catalog import SimulationCatalog
+
+
+def _sim_details(simulation_id, name, folder, simulation_serial=1):
+    return {
+        "simulationId": simulation_id,
+        "name": name,
+        "folder": folder,
+        "isExample": True,
+        "simulation": {"simulationSerial": simulation_serial},
+    }
+
+
+SIM_LIST_RESULTS = [
+    _sim_details("a", "NSLS-II CHX beamline", "/Light Source Facilities/NSLS-II"),
+    _sim_details("b", "NSLS-II SRX beamline", "/Light Source Facilities/NSLS-II"),
+    _sim_details("c", "Diffraction by an Aperture", "/Wavefront Propagation"),
+    _sim_details("d", "example", "/foo"),
+    _sim_details("e", "example", "/foo/bar"),
+]
+
+
+def test_simulation_catalog_lookups():
+    simulation_catalog = SimulationCatalog(SIM_LIST_RESULTS)
+
+    assert len(simulation_catalog) == 5
+    assert "c" in simulation_catalog
+    assert simulation_catalog.by_id("c")["name"] == "Diffraction by an Aperture"
+    assert simulation_catalog.simulation_id("NSLS-II SRX beamline") == "b"
+    assert simulation_catalog.simulation_id("example", folder="/foo/bar") == "e"
+    with pytest.raises(ValueError):
+        simulation_catalog.simulation_id("example")
+    with pytest.raises(KeyError):
+        simulation_catalog.simulation_id("NSLS-II TES beamline")
+
+    assert [d["simulationId"] for d in simulation_catalog.in_folder("/foo")] == ["d"]
+    assert sorted(
+        d["simulationId"] for d in simulation_catalog.in_folder("/foo", recursive=True)
+    ) == ["d", "e"]
+
+    assert [d["simulationId"] for d in simulation_catalog.search("NSLS-II*")] == [
+        "a",
+        "b",
+    ]
+    assert [d["simulationId"] for d in simulation_catalog.search("*SRX*")] == ["b"]
+    assert sorted(d["simulationId"] for d in simulation_catalog.search("/foo/*")) == [
+        "d",
+        "e",
+    ]
+
+
+def test_simulation_catalog_update():
+    simulation_catalog = SimulationCatalog(SIM_LIST_RESULTS)
+    folder_table = simulation_catalog.folder_table()
+    assert folder_table["/foo"] == {"example": "d"}
+
+    # nothing changed
+    assert simulation_catalog.update(SIM_LIST_RESULTS) == (0, 0, 0)
+    assert simulation_catalog.folder_table() is folder_table
+
+    updated_sim_list_results = SIM_LIST_RESULTS[1:] + [
+        _sim_details("f", "example", "/foo/baz")
+    ]
+    updated_sim_list_results[0] = _sim_details(
+        "b", "NSLS-II SRX beamline (renamed)", "/Light Source Facilities/NSLS-II", 2
+    )
+    assert simulation_catalog.update(updated_sim_list_results) == (1, 1, 1)
+    assert "a" not in simulation_catalog
+    assert simulation_catalog.simulation_id("NSLS-II SRX beamline (renamed)") == "b"
+    assert simulation_catalog.by_name("NSLS-II SRX beamline") == []
+    assert simulation_catalog.folder_table()["/foo/baz"] == {"example": "f"}
+
+
+def test_simulation_catalog_same_name_in_folder():
+    sim_list_results = [
+        _sim_details("d", "example", "/foo"),
+        _sim_details("g", "example", "/foo"),
+    ]
+    simulation_catalog = SimulationCatalog(sim_list_results)
+    assert simulation_catalog.folder_table()["/foo"] == {"example": "g"}
+
+    # removing the simulation in the folder table leaves its sibling there
+    assert simulation_catalog.update(sim_list_results[:1]) == (0, 0, 1)
+    assert simulation_catalog.folder_table()["/foo"] == {"example": "d"}
+    assert simulation_catalog.simulation_id("example", folder="/foo") == "d"
+
+    # and removing the other simulation does not remove it
+    simulation_catalog = SimulationCatalog(sim_list_results)
+    assert simulation_catalog.update(sim_list_results[1:]) == (0, 0, 1)
+    assert simulation_catalog.folder_table()["/foo"] == {"example": "g"}
+
+
+def test_session_simulation_catalog(fake_sirepo_server):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_catalog = sirepo_session.simulation_catalog()
+        simulation_id = simulation_catalog.simulation_id("Diffraction by an Aperture")
+        simulation_list_count = fake_sirepo_server.request_counts["simulation-list"]
+
+        # lookups do not request the simulation list again
+        assert sirepo_session.simulation_catalog() is simulation_catalog
+        assert (
+            fake_sirepo_server.request_counts["simulation-list"]
+            == simulation_list_count
+        )
+        assert (
+            sirepo_session.simulation_list()["/Wavefront Propagation"][
+                "Diffraction by an Aperture"
+            ]
+            == simulation_id
+        )
+
+        # a copy marks the catalog for refresh
+        copy_id = sirepo_session.copy_simulation(simulation_id, name="copy")["models"][
+            "simulation"
+        ]["simulationId"]
+        assert sirepo_session.simulation_catalog().simulation_id("copy") == copy_id
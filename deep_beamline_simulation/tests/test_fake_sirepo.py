@@ -0,0 +1,288 @@
+import asyncio
+import copy
+
+from pathlib import Path
+
+import aiohttp
+import numpy as np
+import pytest
+
+import deep_beamline_simulation
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.async_session import AsyncSirepoGuestSession
+from deep_beamline_simulation.cache import SirepoImportIndex
+from deep_beamline_simulation.fake_sirepo import FakeSirepoServer
+from deep_beamline_simulation.polling import RunStatusPoller
+
+
+def test_fake_simulation_list(fake_sirepo_server):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_table = sirepo_session.simulation_list()
+
+    assert "Diffraction by an Aperture" in simulation_table["/Wavefront Propagation"]
+    assert (
+        "NSLS-II SRX beamline"
+        in simulation_table["/Light Source Facilities/NSLS-II/NSLS-II SRX beamline"]
+    )
+
+
+def test_retry_methods(fake_sirepo_server):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        max_retries=3,
+    ) as sirepo_session:
+        retry = sirepo_session._session.get_adapter(fake_sirepo_server.url).max_retries
+
+    assert retry.is_retry("GET", 503)
+    # a POST such as run-simulation may have been processed, it is not repeated
+    assert not retry.is_retry("POST", 503)
+
+
+def test_fake_run_simulation(fake_sirepo_server):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_table = sirepo_session.simulation_list()
+        simulation_id = simulation_table["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        aperture_simulation_data = sirepo_session.simulation_data(
+            simulation_id=simulation_id
+        )
+
+        run_status = sirepo_session.wait_for_simulation(
+            sirepo_session.run_simulation(
+                simulation_id=simulation_id,
+                simulation_report="watchpointReport6",
+                simulation_data=aperture_simulation_data,
+            )
+        ).json()
+        assert run_status["state"] == "completed"
+        assert len(run_status["z_matrix"]) == 100
+        assert len(run_status["z_matrix"][0]) == 100
+
+        # sirepo runs one job per simulation and report, so each simulation
+        #   running at the same time is a copy
+        poller = RunStatusPoller(sirepo_session)
+        for point_i in range(10):
+            point_simulation_data = sirepo_session.copy_simulation(
+                simulation_id, name=f"point {point_i}"
+            )
+            poller.add(
+                sirepo_session.run_simulation(
+                    simulation_id=point_simulation_data["models"]["simulation"][
+                        "simulationId"
+                    ],
+                    simulation_report="intensityReport",
+                    simulation_data=point_simulation_data,
+                )
+            )
+        run_states = [
+            run_status_response.json()["state"]
+            for _, run_status_response in poller.completed(timeout=10)
+        ]
+        assert run_states == ["completed"] * 10
+
+    assert fake_sirepo_server.request_counts["run-simulation"] == 11
+
+
+def test_fake_run_simulation_replaces_job(fake_sirepo_server):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        aperture_simulation_data = sirepo_session.simulation_data(simulation_id)
+
+        def run_simulation(simulation_report):
+            return sirepo_session.run_simulation(
+                simulation_id=simulation_id,
+                simulation_report=simulation_report,
+                simulation_data=aperture_simulation_data,
+            )
+
+        # the second run of a simulation and report cancels the first,
+        #   a different report is a different job
+        poller = RunStatusPoller(sirepo_session)
+        poller.add(run_simulation("watchpointReport6"), key="first")
+        poller.add(run_simulation("watchpointReport6"), key="second")
+        poller.add(run_simulation("intensityReport"), key="other report")
+        run_states = {
+            key: run_status_response.json()["state"]
+            for key, run_status_response in poller.completed(timeout=10)
+        }
+        assert run_states == {
+            "first": "canceled",
+            "second": "completed",
+            "other report": "completed",
+        }
+
+        # as does the run-cancel endpoint
+        run_status = run_simulation("watchpointReport6").json()
+        sirepo_session._post_to_sirepo(
+            f"{fake_sirepo_server.url}/run-cancel", json=run_status["nextRequest"]
+        )
+        run_status_response = sirepo_session._post_to_sirepo(
+            f"{fake_sirepo_server.url}/run-status", json=run_status["nextRequest"]
+        )
+        assert run_status_response.json()["state"] == "canceled"
+
+
+def test_fake_async_run_simulation(fake_sirepo_server):
+    async def run_simulations():
+        async with AsyncSirepoGuestSession(
+            sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+        ) as sirepo_session:
+            simulation_table = await sirepo_session.simulation_list()
+            simulation_id = simulation_table["/Wavefront Propagation"][
+                "Diffraction by an Aperture"
+            ]
+            aperture_simulation_data = await sirepo_session.simulation_data(
+                simulation_id=simulation_id
+            )
+            return await asyncio.gather(
+                *[
+                    sirepo_session.run_simulation_and_wait(
+                        simulation_id=simulation_id,
+                        simulation_data=aperture_simulation_data,
+                        simulation_report="watchpointReport6",
+                    )
+                    for _ in range(10)
+                ]
+            )
+
+    run_status_list = asyncio.run(run_simulations())
+    assert [run_status["state"] for run_status in run_status_list] == ["completed"] * 10
+
+
+def test_fake_async_sweep_same_simulation(fake_sirepo_server):
+    # every point is the same simulation and report with a different aperture
+    horizontal_sizes = [0.1, 0.2, 0.4, 0.8, 1.0, 2.0]
+
+    async def run_simulations():
+        async with AsyncSirepoGuestSession(
+            sirepo_server_url=fake_sirepo_server.url,
+            simulation_type="srw",
+            max_concurrent_simulations=3,
+        ) as sirepo_session:
+            user_id = sirepo_session._response_auth_guest_login["authState"]["uid"]
+            simulation_count = len(fake_sirepo_server.simulation_list(user_id))
+            simulation_table = await sirepo_session.simulation_list()
+            simulation_id = simulation_table["/Wavefront Propagation"][
+                "Diffraction by an Aperture"
+            ]
+            aperture_simulation_data = await sirepo_session.simulation_data(
+                simulation_id=simulation_id
+            )
+            point_data_list = []
+            for horizontal_size in horizontal_sizes:
+                point_data = copy.deepcopy(aperture_simulation_data)
+                point_data["models"]["beamline"][0]["horizontalSize"] = horizontal_size
+                point_data_list.append(point_data)
+            run_status_list = await asyncio.gather(
+                *[
+                    sirepo_session.run_simulation_and_wait(
+                        simulation_id=simulation_id,
+                        simulation_data=point_data,
+                        simulation_report="watchpointReport6",
+                    )
+                    for point_data in point_data_list
+                ]
+            )
+        return user_id, simulation_count, run_status_list
+
+    user_id, simulation_count, run_status_list = asyncio.run(run_simulations())
+    assert [run_status["state"] for run_status in run_status_list] == ["completed"] * 6
+    # each point has its own result, a wider aperture gives a wider beam
+    beam_widths = [
+        np.count_nonzero(np.asarray(run_status["z_matrix"])[50] > 5e11)
+        for run_status in run_status_list
+    ]
+    assert beam_widths == sorted(beam_widths)
+    assert beam_widths[0] < beam_widths[-1]
+    # one copy of the simulation for each concurrent point, deleted at logout
+    assert fake_sirepo_server.request_counts["copy-simulation"] == 3
+    assert len(fake_sirepo_server.simulation_list(user_id)) == simulation_count
+
+
+def test_fake_async_failed_login():
+    with FakeSirepoServer() as fake_sirepo_server:
+        sirepo_server_url = fake_sirepo_server.url
+    # the server has stopped so the login fails
+
+    async def login():
+        sirepo_session = AsyncSirepoGuestSession(
+            sirepo_server_url=sirepo_server_url, simulation_type="srw"
+        )
+        with pytest.raises(aiohttp.ClientError):
+            async with sirepo_session:
+                pass
+        return sirepo_session
+
+    sirepo_session = asyncio.run(login())
+    assert sirepo_session._session.closed
+
+
+def test_fake_import_file(fake_sirepo_server):
+    sirepo_simulations_dir = (
+        Path(deep_beamline_simulation.__path__[0]).parent / "sirepo_simulations"
+    )
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+    ) as sirepo_session:
+        with open(sirepo_simulations_dir / "sim_example.zip", "rb") as simulation_zip:
+            response_import_file = sirepo_session._post_to_sirepo(
+                f"{fake_sirepo_server.url}/import-file/srw",
+                files={"file": simulation_zip, "folder": (None, "/foo")},
+            )
+        simulation_table = sirepo_session.simulation_list()
+
+    uploaded_simulation_id = response_import_file.json()["models"]["simulation"][
+        "simulationId"
+    ]
+    assert simulation_table["/foo"] == {"example": uploaded_simulation_id}
+
+
+def test_import_simulations(fake_sirepo_server, tmp_path):
+    sirepo_simulations_dir = (
+        Path(deep_beamline_simulation.__path__[0]).parent / "sirepo_simulations"
+    )
+    example_zip_path = sirepo_simulations_dir / "sim_example.zip"
+    srx_json_path = (
+        Path(deep_beamline_simulation.__path__[0])
+        / "test_data"
+        / "sirepo-simulation-data-srx.json"
+    )
+    # an identical archive with a different name
+    example_zip_copy_path = tmp_path / "sim_example_copy.zip"
+    example_zip_copy_path.write_bytes(example_zip_path.read_bytes())
+
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        import_index=SirepoImportIndex(cache_dir=tmp_path / "imports"),
+    ) as sirepo_session:
+        simulation_ids = sirepo_session.import_simulations(
+            [example_zip_path, srx_json_path, example_zip_copy_path], folder="/foo"
+        )
+        assert fake_sirepo_server.request_counts["import-file"] == 2
+        assert simulation_ids[0] == simulation_ids[2]
+        assert simulation_ids[0] != simulation_ids[1]
+
+        # a second import is skipped
+        assert sirepo_session.import_simulation(example_zip_path, folder="/foo") == (
+            simulation_ids[0]
+        )
+        assert fake_sirepo_server.request_counts["import-file"] == 2
+
+        # a different folder or a deleted simulation means a new import
+        sirepo_session.import_simulation(example_zip_path, folder="/bar")
+        sirepo_session.delete_simulation(simulation_ids[1])
+        assert sirepo_session.import_simulation(srx_json_path, folder="/foo") not in (
+            simulation_ids
+        )
+        assert fake_sirepo_server.request_counts["import-file"] == 4
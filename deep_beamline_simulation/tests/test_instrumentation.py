@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.fake_sirepo import FakeSirepoServer
+from deep_beamline_simulation.instrumentation import LatencyHistogram, RequestMetrics
+
+
+def test_latency_histogram():
+    latency_histogram = LatencyHistogram(bucket_bounds=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 2.0):
+        latency_histogram.observe(seconds)
+
+    assert latency_histogram.count == 4
+    assert latency_histogram.sum == 2.65
+    assert latency_histogram.cumulative_counts() == [(0.1, 2), (1.0, 3), (np.inf, 4)]
+    assert latency_histogram.quantile(0.5) == 0.1
+
+
+def test_request_metrics(tmp_path):
+    request_metrics = RequestMetrics()
+    # one simulation at a time so the others wait in the "pending" state
+    with FakeSirepoServer(
+        run_seconds=0.1, max_running_simulations=1
+    ) as fake_sirepo_server:
+        with SirepoGuestSession(
+            sirepo_server_url=fake_sirepo_server.url,
+            simulation_type="srw",
+            request_hooks=[request_metrics],
+        ) as sirepo_session:
+            simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+                "Diffraction by an Aperture"
+            ]
+            sirepo_session.run_sweep(
+                simulation_id,
+                parameter_updates=[
+                    {"Aperture": {"horizontalSize": h}} for h in (0.1, 0.2, 0.3, 0.4)
+                ],
+                simulation_report="watchpointReport6",
+                max_workers=4,
+            )
+
+    metrics_snapshot = request_metrics.snapshot()
+    endpoints = metrics_snapshot["endpoints"]
+    assert endpoints["simulation-list"]["requests"] == 2
+    assert endpoints["auth-guest-login"]["requests"] == 1
+    assert endpoints["run-simulation"]["requests"] == 4
+    assert (
+        endpoints["run-status"]["requests"]
+        == fake_sirepo_server.request_counts["run-status"]
+    )
+    assert endpoints["run-simulation"]["request_bytes"] > 0
+    assert endpoints["run-status"]["response_bytes"] > 4 * 100 * 100
+    assert all(endpoint["errors"] == 0 for endpoint in endpoints.values())
+
+    report_metrics = metrics_snapshot["reports"]["watchpointReport6"]
+    assert report_metrics["simulations"] == 4
+    assert report_metrics["status_calls"] == endpoints["run-status"]["requests"]
+    # the last simulation waited for the other three
+    assert report_metrics["queue_seconds"]["sum"] > 0.3
+
+    metrics_json_path = tmp_path / "metrics.json"
+    request_metrics.write_json(metrics_json_path)
+    assert json.loads(metrics_json_path.read_text())["endpoints"] == endpoints
+
+    prometheus_text = request_metrics.prometheus_text()
+    assert 'sirepo_requests_total{endpoint="run-simulation"} 4' in prometheus_text
+    assert (
+        'sirepo_simulation_queue_seconds_count{report="watchpointReport6"} 4'
+        in prometheus_text
+    )
+    assert (
+        'sirepo_request_duration_seconds_bucket{endpoint="run-simulation",le="+Inf"} 4'
+        in prometheus_text
+    )
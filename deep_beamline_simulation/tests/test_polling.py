@@ -0,0 +1,198 @@
+import json
+import time as ttime
+
+import pytest
+import requests
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.polling import PollSchedule, RunStatusPoller
+
+
+def test_poll_schedule_backoff():
+    poll_schedule = PollSchedule(
+        min_interval=0.02, max_interval=10.0, backoff_factor=1.5
+    )
+
+    # nothing is known about this report so polling starts quickly
+    assert poll_schedule.next_delay("intensityReport", elapsed_seconds=0.0) == 0.02
+    # and backs off geometrically
+    assert poll_schedule.next_delay("intensityReport", elapsed_seconds=1.0) == 0.5
+    assert poll_schedule.next_delay("intensityReport", elapsed_seconds=8.0) == 4.0
+    # up to the maximum interval
+    assert poll_schedule.next_delay("intensityReport", elapsed_seconds=100.0) == 10.0
+
+
+def test_poll_schedule_learns_completion_time():
+    poll_schedule = PollSchedule(min_interval=0.02, lead_fraction=0.9, smoothing=0.5)
+
+    poll_schedule.record_completion(
+        "watchpointReport6",
+        incomplete_seconds=9.0,
+        completed_seconds=11.0,
+        status_call_count=5,
+    )
+    assert poll_schedule.expected_seconds("watchpointReport6") == 10.0
+    # wait until just before the expected completion time
+    assert poll_schedule.next_delay(
+        "watchpointReport6", elapsed_seconds=0.0
+    ) == pytest.approx(9.0)
+    # then poll quickly
+    assert poll_schedule.next_delay("watchpointReport6", elapsed_seconds=9.0) == 0.02
+
+    poll_schedule.record_completion(
+        "watchpointReport6",
+        incomplete_seconds=19.0,
+        completed_seconds=21.0,
+        status_call_count=3,
+    )
+    assert poll_schedule.expected_seconds("watchpointReport6") == 15.0
+
+    # a simulation that completed immediately counts as a job but not as a completion time
+    poll_schedule.record_completion(
+        "watchpointReport6",
+        incomplete_seconds=0.0,
+        completed_seconds=0.0,
+        status_call_count=0,
+    )
+    assert poll_schedule.statistics() == {
+        "watchpointReport6": {
+            "jobs": 3,
+            "status_calls": 8,
+            "max_status_calls": 5,
+            "mean_status_calls": 8 / 3,
+            "expected_seconds": 15.0,
+        }
+    }
+
+
+def test_wait_for_simulation_timeout(fake_sirepo_server):
+    # the schedule expects the report to take far longer than the timeout
+    poll_schedule = PollSchedule(min_interval=5.0)
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        poll_schedule=poll_schedule,
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        simulation_data = sirepo_session.simulation_data(simulation_id)
+
+        def run_simulation():
+            return sirepo_session.run_simulation(
+                simulation_id, simulation_data, "watchpointReport6"
+            )
+
+        # the run-status call is made at the timeout rather than never
+        start_time = ttime.monotonic()
+        run_status_response = sirepo_session.wait_for_simulation(
+            run_simulation(), timeout=0.5
+        )
+        assert run_status_response.json()["state"] == "completed"
+        assert ttime.monotonic() - start_time < 2.0
+
+        # a simulation that has not completed at the timeout was polled once more
+        fake_sirepo_server.run_seconds = 10.0
+        run_status_count = fake_sirepo_server.request_counts["run-status"]
+        start_time = ttime.monotonic()
+        with pytest.raises(TimeoutError):
+            sirepo_session.wait_for_simulation(run_simulation(), timeout=0.5)
+        assert ttime.monotonic() - start_time >= 0.5
+        assert fake_sirepo_server.request_counts["run-status"] == run_status_count + 1
+
+
+def test_run_status_poller_timeout(fake_sirepo_server):
+    # the next run-status call is due long after the timeout
+    poll_schedule = PollSchedule(min_interval=5.0)
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        poll_schedule=poll_schedule,
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        simulation_data = sirepo_session.simulation_data(simulation_id)
+
+        def run_simulation():
+            return sirepo_session.run_simulation(
+                simulation_id, simulation_data, "watchpointReport6"
+            )
+
+        # a simulation that completes before the timeout is found by a run-status call at the timeout
+        poller = RunStatusPoller(sirepo_session)
+        poller.add(run_simulation(), key="a")
+        start_time = ttime.monotonic()
+        completed = list(poller.completed(timeout=0.5))
+        assert [key for key, _ in completed] == ["a"]
+        assert completed[0][1].json()["state"] == "completed"
+        assert ttime.monotonic() - start_time < 2.0
+
+        # a simulation that has not completed at the timeout was polled once more
+        fake_sirepo_server.run_seconds = 10.0
+        poller = RunStatusPoller(sirepo_session)
+        poller.add(run_simulation(), key="b")
+        run_status_count = fake_sirepo_server.request_counts["run-status"]
+        start_time = ttime.monotonic()
+        with pytest.raises(TimeoutError):
+            list(poller.completed(timeout=0.5))
+        assert ttime.monotonic() - start_time >= 0.5
+        assert fake_sirepo_server.request_counts["run-status"] == run_status_count + 1
+
+
+def test_run_status_poller_failed_request(fake_sirepo_server, monkeypatch):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        poller = RunStatusPoller(sirepo_session)
+        for point_i in range(3):
+            point_simulation_data = sirepo_session.copy_simulation(
+                simulation_id, name=f"point {point_i}"
+            )
+            poller.add(
+                sirepo_session.run_simulation(
+                    point_simulation_data["models"]["simulation"]["simulationId"],
+                    point_simulation_data,
+                    "watchpointReport6",
+                ),
+                key=point_i,
+            )
+
+        # the first run-status call fails
+        post_to_sirepo = sirepo_session._post_to_sirepo
+        failed_calls = []
+
+        def fail_once(*args, **kwargs):
+            if not failed_calls:
+                failed_calls.append(args)
+                raise requests.ConnectionError()
+            return post_to_sirepo(*args, **kwargs)
+
+        monkeypatch.setattr(sirepo_session, "_post_to_sirepo", fail_once)
+        ttime.sleep(0.2)
+        with pytest.raises(requests.ConnectionError):
+            poller.poll_once()
+
+        # the simulations that were not polled are polled again
+        assert sorted(key for key, _ in poller.completed(timeout=5)) == [0, 1, 2]
+
+
+class _RunStatusResponse:
+    def __init__(self, run_status):
+        self.content = json.dumps(run_status).encode()
+
+
+def test_run_status_poller_other_states():
+    poller = RunStatusPoller(sirepo_session=None, poll_schedule=PollSchedule())
+
+    # neither state can be polled again so both simulations are finished
+    poller.add(_RunStatusResponse({"state": "canceled"}), key="canceled")
+    poller.add(_RunStatusResponse({"state": "running"}), key="no nextRequest")
+    assert len(poller) == 0
+    assert sorted(key for key, _ in poller.poll_once()) == [
+        "canceled",
+        "no nextRequest",
+    ]
@@ -0,0 +1,143 @@
+import json
+import threading
+
+import numpy as np
+import pytest
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.cache import SirepoResultCache
+from deep_beamline_simulation.polling import RunStatusPoller
+from deep_beamline_simulation.results import SirepoRunResult, decode_run_status
+
+
+def test_decode_run_status():
+    z_matrix = np.arange(12, dtype=np.float64).reshape((3, 4)) * 1.5e-3
+    run_status_bytes = json.dumps(
+        {
+            "state": "completed",
+            "x_range": [-1.0, 1.0, 4],
+            "z_matrix": z_matrix.tolist(),
+            "points": [1, 2.5e3, -3],
+            "summaryData": {"fieldRange": [0, 1]},
+        },
+        indent=1,
+    ).encode()
+
+    run_status = decode_run_status(run_status_bytes)
+    assert run_status["state"] == "completed"
+    assert run_status["x_range"] == [-1.0, 1.0, 4]
+    assert run_status["summaryData"] == {"fieldRange": [0, 1]}
+    assert np.array_equal(run_status["z_matrix"], z_matrix)
+    assert np.array_equal(run_status["points"], [1.0, 2500.0, -3.0])
+
+
+def test_decode_run_status_fallback():
+    # null is not understood by np.loadtxt but becomes nan
+    run_status = decode_run_status(b'{"state": "completed", "points": [1, null, 3]}')
+    assert np.isnan(run_status["points"][1])
+
+    # a ragged array is left to the json module
+    run_status = decode_run_status(b'{"z_matrix": [[1, 2], [3]]}')
+    assert run_status["z_matrix"] == [[1, 2], [3]]
+
+    run_status = decode_run_status(b'{"state": "running", "nextRequestSeconds": 2}')
+    assert run_status == {"state": "running", "nextRequestSeconds": 2}
+
+
+def test_decode_run_status_nested_points():
+    # a multi-plot report has "points" in each plot, they are not top-level arrays
+    run_status_bytes = (
+        b'{"title": "\\"points\\": [0]", "plots": [{"label": "a", "points": [1, 2, 3]}, '
+        b'{"label": "b", "points": [4, 5, 6]}], "x_points": [0, 1, 2]}'
+    )
+    run_status = decode_run_status(run_status_bytes)
+    assert run_status == json.loads(run_status_bytes)
+    assert "points" not in run_status
+
+    # a top-level array after the plots is still decoded
+    run_status = decode_run_status(
+        b'{"plots": [{"points": [1, 2]}], "points": [7, 8], "z_matrix": [[1, 2]]}'
+    )
+    assert run_status["plots"] == [{"points": [1, 2]}]
+    assert np.array_equal(run_status["points"], [7.0, 8.0])
+    assert np.array_equal(run_status["z_matrix"], [[1.0, 2.0]])
+
+
+def test_simulation_result(fake_sirepo_server, tmp_path):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        result_cache=SirepoResultCache(cache_dir=tmp_path),
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        simulation_data = sirepo_session.simulation_data(simulation_id)
+
+        result = sirepo_session.simulation_result(
+            simulation_id, simulation_data, "watchpointReport6"
+        )
+        assert isinstance(result, SirepoRunResult)
+        assert result.state == "completed"
+        assert result.z_matrix.dtype == np.float64
+        assert result.intensity.shape == (100, 100)
+        assert "z_matrix" not in result.metadata
+
+        # the second result comes from the cache
+        cached_result = sirepo_session.simulation_result(
+            simulation_id, simulation_data, "watchpointReport6"
+        )
+        assert np.array_equal(cached_result.intensity, result.intensity)
+        assert cached_result.x_range == result.x_range
+        assert fake_sirepo_server.request_counts["run-simulation"] == 1
+
+        # one copy of the simulation for each simulation running at the same time
+        poller = RunStatusPoller(sirepo_session)
+        for point_i in range(3):
+            point_simulation_data = sirepo_session.copy_simulation(
+                simulation_id, name=f"point {point_i}"
+            )
+            poller.add(
+                sirepo_session.run_simulation(
+                    point_simulation_data["models"]["simulation"]["simulationId"],
+                    point_simulation_data,
+                    "watchpointReport6",
+                )
+            )
+        results = [result for _, result in poller.completed_results(timeout=10)]
+        assert [result.state for result in results] == ["completed"] * 3
+        assert all(result.intensity.shape == (100, 100) for result in results)
+
+
+def test_simulation_result_not_completed(fake_sirepo_server, tmp_path):
+    result_cache = SirepoResultCache(cache_dir=tmp_path)
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        result_cache=result_cache,
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        simulation_data = sirepo_session.simulation_data(simulation_id)
+
+        # a simulation that never completes is given up at the timeout
+        fake_sirepo_server.run_seconds = 30.0
+        with pytest.raises(TimeoutError):
+            sirepo_session.simulation_result(
+                simulation_id, simulation_data, "watchpointReport6", timeout=0.5
+            )
+
+        # and a canceled simulation is not a result
+        cancel_timer = threading.Timer(
+            0.5, fake_sirepo_server.cancel_running_simulations
+        )
+        cancel_timer.start()
+        try:
+            with pytest.raises(Exception, match="'canceled'"):
+                sirepo_session.simulation_result(
+                    simulation_id, simulation_data, "watchpointReport6"
+                )
+        finally:
+            cancel_timer.cancel()
+        assert result_cache.get("srw", simulation_data, "watchpointReport6") is None
@@ -0,0 +1,158 @@
+import importlib.util
+import sys
+import types
+
+from pathlib import Path
+
+import pytest
+
+RSOPT_EXPORT_PATH = (
+    Path(__file__).parents[2]
+    / "NSLS-II-CSX-1-beamline-rsOptExport"
+    / "rsopt-srw-20220127150906"
+    / "NSLS-II-CSX-1-beamline-rsOptExport.py"
+)
+
+
+class FakeWavefront:
+    def __init__(self):
+        # (optical element name, horizontal size) for each element propagated through
+        self.propagated = []
+
+
+class FakeOpticalElement:
+    def __init__(self, name):
+        self.name = name
+        self.Dx = 1.0
+        self.Dy = 1.0
+
+
+class FakeOpticsContainer:
+    def __init__(self, _arOpt=None, _arProp=None):
+        self.arOpt = list(_arOpt or [])
+        self.arProp = list(_arProp or [])
+
+
+def fake_propagate(wavefront, optics):
+    wavefront.propagated.extend((el.name, el.Dx) for el in optics.arOpt)
+
+
+class FakeBeamline:
+    """Stands in for srwl_bl.SRWLBeamline, recording each source calculation and
+    the wavefront each propagation starts from."""
+
+    def __init__(self, _name=None):
+        self.name = _name
+        self.optics = None
+        self.source_calculation_count = 0
+        self.propagation_inputs = []
+        self.propagated_wavefronts = []
+
+    def calc_sr_se(self, _v):
+        self.source_calculation_count += 1
+        return FakeWavefront()
+
+    def calc_wfr_prop(self, _wfr):
+        self.propagation_inputs.append(list(_wfr.propagated))
+        fake_propagate(_wfr, self.optics)
+        self.propagated_wavefronts.append(_wfr)
+
+    def calc_all(self, _v, _op):
+        self.optics = _op
+        self.calc_wfr_prop(self.calc_sr_se(_v))
+
+
+@pytest.fixture
+def rsopt_export(monkeypatch):
+    """Load the rsopt export script with fake srwpy and pykern modules."""
+    srwl_bl = types.ModuleType("srwpy.srwl_bl")
+    srwl_bl.SRWLBeamline = FakeBeamline
+    srwl_bl.srwl_uti_ext_options = lambda var_param: var_param
+    srwl_bl.srwl_uti_parse_options = lambda var_param, use_sys_argv: (
+        types.SimpleNamespace(name="fake")
+    )
+    srwlib = types.ModuleType("srwpy.srwlib")
+    srwlib.SRWLOptC = FakeOpticsContainer
+    srwlpy = types.ModuleType("srwpy.srwlpy")
+    srwlpy.PropagElecField = fake_propagate
+    srwpy = types.ModuleType("srwpy")
+    srwpy.srwl_bl = srwl_bl
+    srwpy.srwlib = srwlib
+    srwpy.srwlpy = srwlpy
+    srwpy.srwl_uti_smp = types.ModuleType("srwpy.srwl_uti_smp")
+    pkdebug = types.ModuleType("pykern.pkdebug")
+    pkdebug.pkdlog = lambda *args, **kwargs: None
+    pykern = types.ModuleType("pykern")
+    pykern.pkdebug = pkdebug
+    for module in (srwpy, srwl_bl, srwlib, srwlpy, srwpy.srwl_uti_smp, pykern, pkdebug):
+        monkeypatch.setitem(sys.modules, module.__name__, module)
+
+    spec = importlib.util.spec_from_file_location(
+        "rsopt_export", str(RSOPT_EXPORT_PATH)
+    )
+    rsopt_export = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(rsopt_export)
+    return rsopt_export
+
+
+def test_cached_source_wavefront(rsopt_export, monkeypatch):
+    optics_element_names = [
+        name
+        for name in rsopt_export._OPTICS_NAMES
+        if name not in rsopt_export._WATCH_NAMES
+    ]
+    op = FakeOpticsContainer(
+        [FakeOpticalElement(name) for name in optics_element_names],
+        [[] for _ in optics_element_names],
+    )
+    monkeypatch.setattr(rsopt_export, "set_optics", lambda v, names, final: op)
+    monkeypatch.setattr(rsopt_export, "_read_srw_file", lambda filename: filename)
+    monkeypatch.setattr(rsopt_export, "_CACHE_SOURCE_WAVEFRONT", True)
+
+    rsopt_export._init_worker()
+    assert rsopt_export._worker_setup_error is None
+    beamline = rsopt_export._worker_setup[3]
+    assert isinstance(beamline, rsopt_export._CachedSourceBeamline)
+
+    aperture_sizes = [(0.1, 0.2), (0.3, 0.4), (0.5, 0.6)]
+    for task_num, param_vals in enumerate(aperture_sizes):
+        rsopt_export._rsopt_run_persistent(param_vals, "worker", task_num)
+
+    # the source is calculated and propagated up to the Aperture once per worker
+    assert beamline.source_calculation_count == 1
+    first_varying = optics_element_names.index("Aperture")
+    upstream_propagated = [(name, 1.0) for name in optics_element_names[:first_varying]]
+    assert beamline._upstream_wfr.propagated == upstream_propagated
+    # each task propagates a copy of the upstream wavefront through the rest of
+    #   the optics, with its own aperture size
+    assert beamline.propagation_inputs == [upstream_propagated] * len(aperture_sizes)
+    assert len({id(wfr) for wfr in beamline.propagated_wavefronts}) == len(
+        aperture_sizes
+    )
+    for wfr, (horizontal_size, _) in zip(
+        beamline.propagated_wavefronts, aperture_sizes
+    ):
+        assert wfr is not beamline._upstream_wfr
+        assert wfr.propagated[: len(upstream_propagated)] == upstream_propagated
+        assert wfr.propagated[len(upstream_propagated)] == ("Aperture", horizontal_size)
+        assert len(wfr.propagated) == len(optics_element_names)
+
+
+def test_uncached_source_wavefront(rsopt_export, monkeypatch):
+    op = FakeOpticsContainer(
+        [
+            FakeOpticalElement(name)
+            for name in rsopt_export._OPTICS_NAMES
+            if name not in rsopt_export._WATCH_NAMES
+        ]
+    )
+    monkeypatch.setattr(rsopt_export, "set_optics", lambda v, names, final: op)
+    monkeypatch.setattr(rsopt_export, "_read_srw_file", lambda filename: filename)
+    monkeypatch.setattr(rsopt_export, "_CACHE_SOURCE_WAVEFRONT", False)
+
+    rsopt_export._init_worker()
+    beamline = rsopt_export._worker_setup[3]
+    assert not isinstance(beamline, rsopt_export._CachedSourceBeamline)
+    for task_num in range(2):
+        rsopt_export._rsopt_run_persistent((0.1, 0.2), "worker", task_num)
+    assert beamline.source_calculation_count == 2
@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from deep_beamline_simulation.sampling import SamplingPlan
+
+aperture_ranges = {
+    "Aperture": {"horizontalSize": (0.01, 1.0), "verticalSize": (0.1, 2.0)},
+    "Lens": {"horizontalFocalLength": (5.0, 10.0)},
+}
+
+
+def test_grid():
+    sampling_plan = SamplingPlan.grid(
+        {"Aperture": {"horizontalSize": [0.1, 0.2, 0.3], "verticalSize": [1.0, 2.0]}}
+    )
+    assert len(sampling_plan) == 6
+    assert sampling_plan.parameter_names == [
+        "Aperture_horizontalSize",
+        "Aperture_verticalSize",
+    ]
+    assert sampling_plan.parameter_updates()[:2] == [
+        {"Aperture": {"horizontalSize": 0.1, "verticalSize": 1.0}},
+        {"Aperture": {"horizontalSize": 0.1, "verticalSize": 2.0}},
+    ]
+
+
+@pytest.mark.parametrize("plan_constructor", ["latin_hypercube", "random", "sobol"])
+def test_sampled_plans(plan_constructor):
+    if plan_constructor == "sobol":
+        pytest.importorskip("scipy")
+    sampling_plan = getattr(SamplingPlan, plan_constructor)(
+        aperture_ranges, point_count=16, seed=1
+    )
+
+    assert sampling_plan.parameter_values.shape == (16, 3)
+    lows = np.array([0.01, 0.1, 5.0])
+    highs = np.array([1.0, 2.0, 10.0])
+    assert np.all(sampling_plan.parameter_values >= lows)
+    assert np.all(sampling_plan.parameter_values <= highs)
+
+    # the same seed gives the same plan
+    assert np.array_equal(
+        getattr(SamplingPlan, plan_constructor)(
+            aperture_ranges, point_count=16, seed=1
+        ).parameter_values,
+        sampling_plan.parameter_values,
+    )
+
+    point_updates = sampling_plan.parameter_updates()[0]
+    assert set(point_updates) == {"Aperture", "Lens"}
+    assert type(point_updates["Lens"]["horizontalFocalLength"]) is float
+
+
+def test_latin_hypercube_strata():
+    sampling_plan = SamplingPlan.latin_hypercube(aperture_ranges, point_count=10)
+    # each of the 10 intervals of each parameter range has one point
+    unit_points = (sampling_plan.parameter_values - [0.01, 0.1, 5.0]) / [
+        0.99,
+        1.9,
+        5.0,
+    ]
+    for column in unit_points.T:
+        assert sorted(np.floor(column * 10).astype(int)) == list(range(10))
+
+
+def test_write_rsopt_tasks(tmp_path):
+    sampling_plan = SamplingPlan.random(aperture_ranges, point_count=5, seed=2)
+    tasks_path = tmp_path / "tasks"
+    runner_parameter_names = [
+        "Lens_horizontalFocalLength",
+        "Aperture_horizontalSize",
+        "Aperture_verticalSize",
+    ]
+    sampling_plan.write_rsopt_tasks(tasks_path, parameter_names=runner_parameter_names)
+
+    # read the tasks the way the rsopt runner does
+    tasks = np.load(tasks_path)["x"]
+    assert tasks.shape == (5, 3)
+    assert np.array_equal(tasks[:, 0], sampling_plan.parameter_values[:, 2])
+    assert np.array_equal(tasks[:, 1:], sampling_plan.parameter_values[:, :2])
+
+    with pytest.raises(ValueError):
+        sampling_plan.write_rsopt_tasks(
+            tasks_path, parameter_names=["Aperture_horizontalSize"]
+        )
@@ -0,0 +1,129 @@
+import os
+import threading
+
+import pytest
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.session_pool import SirepoSessionPool
+
+
+def test_relogin(fake_sirepo_server):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_table = sirepo_session.simulation_list()
+        assert fake_sirepo_server.request_counts["auth-guest-login"] == 1
+
+        # as if the server was restarted
+        fake_sirepo_server.expire_logins()
+        assert sirepo_session.simulation_list() == simulation_table
+        assert sirepo_session.relogin_count == 1
+        assert fake_sirepo_server.request_counts["auth-guest-login"] == 2
+
+
+def test_session_pool(fake_sirepo_server):
+    with SirepoSessionPool(
+        sirepo_server_url=fake_sirepo_server.url, simulation_type="srw", size=3
+    ) as session_pool:
+        assert fake_sirepo_server.request_counts["auth-guest-login"] == 3
+        # the sessions are one guest user, a simulation id works with all of them
+        simulation_tables = [
+            sirepo_session.simulation_list() for sirepo_session in session_pool.sessions
+        ]
+        assert simulation_tables[1:] == simulation_tables[:1] * 2
+        with session_pool.session() as sirepo_session:
+            simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+                "Diffraction by an Aperture"
+            ]
+            # each session runs its points on its own copy of the simulation,
+            #   sirepo runs one job per simulation and report
+            point_simulation_data = {
+                id(pool_session): sirepo_session.copy_simulation(
+                    simulation_id, name=f"session {session_i}"
+                )
+                for session_i, pool_session in enumerate(session_pool.sessions)
+            }
+
+        logins_expired = threading.Event()
+
+        def run_point(sirepo_session, point_i):
+            # expire every login while the sweep is running
+            if point_i == 4 and not logins_expired.is_set():
+                logins_expired.set()
+                fake_sirepo_server.expire_logins()
+            simulation_data = point_simulation_data[id(sirepo_session)]
+            return sirepo_session.simulation_result(
+                simulation_data["models"]["simulation"]["simulationId"],
+                simulation_data,
+                "watchpointReport6",
+                timeout=10,
+            ).state
+
+        assert session_pool.map(run_point, range(12)) == ["completed"] * 12
+        for sirepo_session in session_pool.sessions:
+            sirepo_session.simulation_list()
+        # each session logged in again at most once, the sessions share a cookie
+        #   so one login again may serve the others
+        assert 1 <= session_pool.relogin_count <= 3
+        assert (
+            fake_sirepo_server.request_counts["auth-guest-login"]
+            == 3 + session_pool.relogin_count
+        )
+
+
+def _bluesky_session(fake_sirepo_server, simulation_id):
+    return SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        login_mode="bluesky",
+        bluesky_simulation_id=simulation_id,
+    )
+
+
+def test_bluesky_login(fake_sirepo_server):
+    # bluesky-auth logs in as the owner of a simulation
+    uid = fake_sirepo_server.new_user()
+    simulation_id = fake_sirepo_server.simulation_list(uid)[0]["simulationId"]
+
+    def bluesky_session():
+        return _bluesky_session(fake_sirepo_server, simulation_id)
+
+    with bluesky_session() as sirepo_session:
+        assert sirepo_session.simulation_data(simulation_id)
+    assert fake_sirepo_server.request_counts["bluesky-auth"] == 1
+    assert fake_sirepo_server.request_counts["auth-guest-login"] == 0
+
+    # a second session in this process reuses the login
+    with bluesky_session() as sirepo_session:
+        assert sirepo_session.simulation_data(simulation_id)
+        assert fake_sirepo_server.request_counts["bluesky-auth"] == 1
+
+        # a rejected login is replaced
+        fake_sirepo_server.expire_logins()
+        assert sirepo_session.simulation_data(simulation_id)
+        assert fake_sirepo_server.request_counts["bluesky-auth"] == 2
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires os.fork")
+def test_bluesky_login_fork(fake_sirepo_server):
+    # bluesky-auth logs in as the owner of a simulation
+    uid = fake_sirepo_server.new_user()
+    simulation_id = fake_sirepo_server.simulation_list(uid)[1]["simulationId"]
+    with _bluesky_session(fake_sirepo_server, simulation_id) as sirepo_session:
+        sirepo_session.simulation_data(simulation_id)
+    assert fake_sirepo_server.request_counts["bluesky-auth"] == 1
+
+    # a forked process inherits the login
+    process_pipe_read, process_pipe_write = os.pipe()
+    child_pid = os.fork()
+    if child_pid == 0:
+        child_ok = False
+        try:
+            with _bluesky_session(fake_sirepo_server, simulation_id) as sirepo_session:
+                child_ok = bool(sirepo_session.simulation_data(simulation_id))
+        finally:
+            os.write(process_pipe_write, b"1" if child_ok else b"0")
+            os._exit(0)
+    os.waitpid(child_pid, 0)
+    assert os.read(process_pipe_read, 1) == b"1"
+    assert fake_sirepo_server.request_counts["bluesky-auth"] == 1
@@ -1,4 +1,5 @@
 from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.polling import RunStatusPoller
 
 
 def test_connect(sirepo_server_url):
@@ -71,3 +72,36 @@ def test_run_simulation(sirepo_server_url):
             simulation_data=aperture_simulation_data,
         )
         sirepo_session.wait_for_simulation(run_simulation_response)
+
+
+def test_run_status_poller(sirepo_server_url):
+    with SirepoGuestSession(
+        sirepo_server_url=sirepo_server_url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_table = sirepo_session.simulation_list()
+        # pick a known simulation
+        simulation_id = simulation_table["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        aperture_simulation_data = sirepo_session.simulation_data(
+            simulation_id=simulation_id
+        )
+
+        poller = RunStatusPoller(sirepo_session)
+        for simulation_report in ("intensityReport", "watchpointReport6"):
+            poller.add(
+                sirepo_session.run_simulation(
+                    simulation_id=simulation_id,
+                    simulation_report=simulation_report,
+                    simulation_data=aperture_simulation_data,
+                ),
+                key=simulation_report,
+            )
+
+        completed_reports = set()
+        for simulation_report, run_status_response in poller.completed():
+            assert run_status_response.json()["state"] == "completed"
+            completed_reports.add(simulation_report)
+
+        assert completed_reports == {"intensityReport", "watchpointReport6"}
+        assert len(poller) == 0
@@ -85,6 +85,94 @@ def test_build_sirepo_simulation(sirepo_guest_session):
     sirepo_simulation_instance.read()
 
 
+def test_build_sirepo_simulation_reuses_classes(srx_simulation_data):
+    sirepo_simulation_class_1 = build_sirepo_simulation(
+        sirepo_simulation_data=srx_simulation_data
+    )
+
+    # the same beamline with a different aperture size
+    srx_simulation_data["models"]["beamline"][0]["horizontalSize"] = 99.0
+    sirepo_simulation_class_2 = build_sirepo_simulation(
+        sirepo_simulation_data=srx_simulation_data
+    )
+
+    # both classes are thin subclasses of one generated class
+    assert sirepo_simulation_class_1 is not sirepo_simulation_class_2
+    assert sirepo_simulation_class_1.__bases__ == sirepo_simulation_class_2.__bases__
+
+    element_title = srx_simulation_data["models"]["beamline"][0]["title"]
+    sirepo_simulation_1 = sirepo_simulation_class_1(name="srx_1")
+    sirepo_simulation_2 = sirepo_simulation_class_2(name="srx_2")
+    element_1 = next(
+        getattr(sirepo_simulation_1, component_name)
+        for component_name in sirepo_simulation_1.component_names
+        if getattr(sirepo_simulation_1, component_name).title.get() == element_title
+    )
+    element_2 = next(
+        getattr(sirepo_simulation_2, component_name)
+        for component_name in sirepo_simulation_2.component_names
+        if getattr(sirepo_simulation_2, component_name).title.get() == element_title
+    )
+    assert element_1.horizontalSize.get() != 99.0
+    assert element_2.horizontalSize.get() == 99.0
+
+
+def test_build_sirepo_simulation_tunable_parameters(srx_simulation_data):
+    sirepo_simulation_class = build_sirepo_simulation(
+        sirepo_simulation_data=srx_simulation_data,
+        tunable_parameters={"S0": ["horizontalSize", "verticalSize"]},
+    )
+    sirepo_simulation = sirepo_simulation_class(name="srx")
+
+    # only the tunable parameters are Signals
+    assert sirepo_simulation.s0.component_names == ("horizontalSize", "verticalSize")
+    assert sirepo_simulation.s0.horizontalSize.get() == 2
+    assert list(sirepo_simulation.read()) == [
+        "srx_s0_horizontalSize",
+        "srx_s0_verticalSize",
+    ]
+
+    # the other parameters are read-only attributes
+    assert sirepo_simulation.s0.title == "S0"
+    assert sirepo_simulation.s0.position_ == 33.1798
+    with pytest.raises(AttributeError):
+        sirepo_simulation.s0.title = "S1"
+    hfm = srx_simulation_data["models"]["beamline"][1]
+    hfm_device = getattr(sirepo_simulation, hfm["title"].lower())
+    assert hfm_device.component_names == ()
+    assert hfm_device.radius == hfm["radius"]
+
+
+def test_write_simulation_data(srx_simulation_data):
+    sirepo_simulation = build_sirepo_simulation(
+        sirepo_simulation_data=srx_simulation_data
+    )(name="srx")
+    assert sirepo_simulation.changed_parameters() == {}
+
+    sirepo_simulation.s0.horizontalSize.put(0.1)
+    sirepo_simulation.hfm.position_.put(34.0)
+    expected_changes = {"S0": {"horizontalSize": 0.1}, "HFM": {"position": 34.0}}
+    assert sirepo_simulation.changed_parameters() == expected_changes
+
+    beamline_elements = srx_simulation_data["models"]["beamline"]
+    s0_element = beamline_elements[0]
+    assert (
+        sirepo_simulation.write_simulation_data(srx_simulation_data) == expected_changes
+    )
+    # the simulation data is updated in place
+    assert srx_simulation_data["models"]["beamline"][0] is s0_element
+    assert s0_element["horizontalSize"] == 0.1
+    assert beamline_elements[1]["position"] == 34.0
+
+    # nothing has changed since the last write
+    assert sirepo_simulation.write_simulation_data(srx_simulation_data) == {}
+
+    # simulation data for another beamline is rejected
+    beamline_elements.pop(0)
+    with pytest.raises(ValueError):
+        sirepo_simulation.write_simulation_data(srx_simulation_data)
+
+
 @pytest.mark.skip
 def test_count_sirepo_simulation(sirepo_guest_session):
     with sirepo_guest_session(simulation_type="srw") as sirepo_session:
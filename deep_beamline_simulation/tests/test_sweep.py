@@ -0,0 +1,138 @@
+import copy
+import threading
+
+import h5py
+import numpy as np
+import pytest
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.beamline import BeamlineIndex
+from deep_beamline_simulation.cache import SirepoResultCache
+
+
+def test_run_sweep(fake_sirepo_server, tmp_path):
+    parameter_updates = [
+        {"Aperture": {"horizontalSize": h, "verticalSize": v}}
+        for h in np.linspace(0.1, 1, 3)
+        for v in np.linspace(0.1, 1, 3)
+    ]
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        result_cache=SirepoResultCache(cache_dir=tmp_path / "results"),
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        simulation_count = len(
+            fake_sirepo_server.simulation_list(sirepo_session.user_id)
+        )
+        base_data = sirepo_session.simulation_data(simulation_id)
+        base_data_copy = copy.deepcopy(base_data)
+
+        sweep_result = sirepo_session.run_sweep(
+            simulation_id,
+            base_data=base_data,
+            parameter_updates=parameter_updates,
+            simulation_report="watchpointReport6",
+            max_workers=4,
+            timeout=10,
+        )
+        assert sweep_result.parameter_names == [
+            "Aperture_horizontalSize",
+            "Aperture_verticalSize",
+        ]
+        assert sweep_result.parameter_values.shape == (9, 2)
+        assert sweep_result.intensities.shape == (9, 100, 100)
+        assert np.all(sweep_result.run_seconds > 0)
+        # results are in the order of the parameter updates, a wider aperture
+        #   gives a wider beam
+        assert np.count_nonzero(
+            sweep_result.intensities[8] > 0.5 * sweep_result.intensities[8].max()
+        ) > np.count_nonzero(
+            sweep_result.intensities[0] > 0.5 * sweep_result.intensities[0].max()
+        )
+        assert fake_sirepo_server.request_counts["copy-simulation"] == 4
+        # the base data is not modified
+        assert base_data == base_data_copy
+        # the worker simulations were deleted
+        assert (
+            len(fake_sirepo_server.simulation_list(sirepo_session.user_id))
+            == simulation_count
+        )
+
+        # the second sweep is read from the result cache and written to HDF5
+        h5_path = tmp_path / "results.h5"
+        cached_sweep_result = sirepo_session.run_sweep(
+            simulation_id,
+            parameter_updates=parameter_updates,
+            simulation_report="watchpointReport6",
+            h5_path=h5_path,
+        )
+        assert np.all(cached_sweep_result.from_result_cache)
+        assert fake_sirepo_server.request_counts["run-simulation"] == 9
+
+    with h5py.File(h5_path, mode="r") as results_h5:
+        assert list(results_h5["params"].asstr()) == sweep_result.parameter_names
+        assert np.array_equal(
+            results_h5["paramVals"][()], sweep_result.parameter_values
+        )
+        assert np.array_equal(
+            results_h5["beamIntensities"][()], sweep_result.intensities
+        )
+
+
+def test_run_sweep_canceled_point(fake_sirepo_server, tmp_path):
+    # the widest aperture takes far longer than the others and is canceled
+    fake_sirepo_server.run_seconds = lambda simulation_data, report: (
+        30.0
+        if simulation_data["models"]["beamline"][0]["horizontalSize"] == 1.0
+        else 0.1
+    )
+    parameter_updates = [
+        {"Aperture": {"horizontalSize": horizontal_size}}
+        for horizontal_size in (0.1, 0.5, 1.0)
+    ]
+    result_cache = SirepoResultCache(cache_dir=tmp_path / "results")
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        result_cache=result_cache,
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        base_data = sirepo_session.simulation_data(simulation_id)
+
+        cancel_timer = threading.Timer(
+            1.0, fake_sirepo_server.cancel_running_simulations
+        )
+        cancel_timer.start()
+        try:
+            with pytest.raises(Exception, match="sweep point 2 .* 'canceled'"):
+                sirepo_session.run_sweep(
+                    simulation_id,
+                    base_data=base_data,
+                    parameter_updates=parameter_updates,
+                    simulation_report="watchpointReport6",
+                    max_workers=3,
+                    timeout=10,
+                )
+        finally:
+            cancel_timer.cancel()
+
+    # the completed points were stored but not the canceled point
+    beamline_index = BeamlineIndex(base_data)
+    stored_results = [
+        result_cache.get(
+            "srw",
+            beamline_index.apply_parameter_updates(point_updates),
+            "watchpointReport6",
+        )
+        for point_updates in parameter_updates
+    ]
+    assert [stored_result is not None for stored_result in stored_results] == [
+        True,
+        True,
+        False,
+    ]
@@ -0,0 +1,69 @@
+"""
+Measure requests per second for one SirepoGuestSession shared by several threads.
+
+A FakeSirepoServer runs in this process so no Sirepo server is needed:
+
+    $ python scripts/benchmark_connection_pool.py --threads 16 --requests 4000
+
+For each pool size the fake server counts the TCP connections it accepted. With a
+pool smaller than the number of threads requests beyond the pool size open a new
+connection and discard it afterwards.
+"""
+
+import argparse
+import time as ttime
+
+from concurrent.futures import ThreadPoolExecutor
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.fake_sirepo import FakeSirepoServer
+
+
+def benchmark(fake_sirepo_server, pool_maxsize, thread_count, request_count):
+    with SirepoGuestSession(
+        sirepo_server_url=fake_sirepo_server.url,
+        simulation_type="srw",
+        pool_maxsize=pool_maxsize,
+    ) as sirepo_session:
+        simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+            "Diffraction by an Aperture"
+        ]
+        connection_count = fake_sirepo_server.connection_count
+        start_time = ttime.monotonic()
+        with ThreadPoolExecutor(max_workers=thread_count) as executor:
+            for _ in executor.map(
+                lambda _: sirepo_session.simulation_data(simulation_id),
+                range(request_count),
+            ):
+                pass
+        elapsed_seconds = ttime.monotonic() - start_time
+
+    return (
+        request_count / elapsed_seconds,
+        fake_sirepo_server.connection_count - connection_count,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=4000)
+    args = parser.parse_args()
+
+    print(f"{args.threads} threads, {args.requests} requests")
+    print(f"{'pool_maxsize':>12} {'requests/s':>12} {'connections':>12}")
+    with FakeSirepoServer() as fake_sirepo_server:
+        for pool_maxsize in sorted({1, 10, args.threads}):
+            requests_per_second, connection_count = benchmark(
+                fake_sirepo_server=fake_sirepo_server,
+                pool_maxsize=pool_maxsize,
+                thread_count=args.threads,
+                request_count=args.requests,
+            )
+            print(
+                f"{pool_maxsize:>12} {requests_per_second:>12.0f} {connection_count:>12}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Compare ways of running many simulations against a FakeSirepoServer.
+
+    $ python scripts/benchmark_sirepo_client.py --simulations 50 --run-seconds 0.5
+
+"sequential" runs one simulation at a time with run_simulation and
+wait_for_simulation, "poller" starts every simulation and waits on all of them
+with a RunStatusPoller, and "async" gathers run_simulation_and_wait coroutines
+on an AsyncSirepoGuestSession. Use --max-running-simulations to limit how
+many simulations the fake server computes at once.
+
+As with Sirepo, the fake server runs one job per simulation and report, so
+"poller" runs each simulation on its own copy of the simulation and "async"
+runs each of its concurrent simulations on a copy. Making the copies is part
+of the measured time.
+"""
+
+import argparse
+import asyncio
+import time as ttime
+
+from deep_beamline_simulation import SirepoGuestSession
+from deep_beamline_simulation.async_session import AsyncSirepoGuestSession
+from deep_beamline_simulation.fake_sirepo import FakeSirepoServer
+from deep_beamline_simulation.polling import RunStatusPoller
+
+
+def _aperture_simulation(sirepo_session):
+    simulation_id = sirepo_session.simulation_list()["/Wavefront Propagation"][
+        "Diffraction by an Aperture"
+    ]
+    return simulation_id, sirepo_session.simulation_data(simulation_id)
+
+
+def run_sequential(sirepo_server_url, simulation_count):
+    with SirepoGuestSession(
+        sirepo_server_url=sirepo_server_url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_id, simulation_data = _aperture_simulation(sirepo_session)
+        for _ in range(simulation_count):
+            sirepo_session.wait_for_simulation(
+                sirepo_session.run_simulation(
+                    simulation_id, simulation_data, "watchpointReport6"
+                )
+            )
+
+
+def run_poller(sirepo_server_url, simulation_count):
+    with SirepoGuestSession(
+        sirepo_server_url=sirepo_server_url, simulation_type="srw"
+    ) as sirepo_session:
+        simulation_id, _ = _aperture_simulation(sirepo_session)
+        poller = RunStatusPoller(sirepo_session)
+        for simulation_i in range(simulation_count):
+            copy_simulation_data = sirepo_session.copy_simulation(
+                simulation_id, name=f"benchmark {simulation_i}"
+            )
+            poller.add(
+                sirepo_session.run_simulation(
+                    copy_simulation_data["models"]["simulation"]["simulationId"],
+                    copy_simulation_data,
+                    "watchpointReport6",
+                )
+            )
+        for _, run_status_response in poller.completed():
+            assert run_status_response.json()["state"] == "completed"
+
+
+def run_async(sirepo_server_url, simulation_count):
+    async def run_simulations():
+        async with AsyncSirepoGuestSession(
+            sirepo_server_url=sirepo_server_url,
+            simulation_type="srw",
+            max_concurrent_simulations=simulation_count,
+        ) as sirepo_session:
+            simulation_table = await sirepo_session.simulation_list()
+            simulation_id = simulation_table["/Wavefront Propagation"][
+                "Diffraction by an Aperture"
+            ]
+            simulation_data = await sirepo_session.simulation_data(simulation_id)
+            run_status_list = await asyncio.gather(
+                *[
+                    sirepo_session.run_simulation_and_wait(
+                        simulation_id, simulation_data, "watchpointReport6"
+                    )
+                    for _ in range(simulation_count)
+                ]
+            )
+            for run_status in run_status_list:
+                assert run_status["state"] == "completed"
+
+    asyncio.run(run_simulations())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--simulations", type=int, default=50)
+    parser.add_argument("--run-seconds", type=float, default=0.5)
+    parser.add_argument("--latency-seconds", type=float, default=0.0)
+    parser.add_argument("--max-running-simulations", type=int, default=None)
+    args = parser.parse_args()
+
+    print(
+        f"{args.simulations} simulations of {args.run_seconds}s, "
+        f"{args.latency_seconds}s latency, "
+        f"at most {args.max_running_simulations} running"
+    )
+    print(f"{'client':>12} {'seconds':>10} {'simulations/s':>14} {'requests':>10}")
+    for client_name, run_simulations in (
+        ("sequential", run_sequential),
+        ("poller", run_poller),
+        ("async", run_async),
+    ):
+        with FakeSirepoServer(
+            run_seconds=args.run_seconds,
+            latency_seconds=args.latency_seconds,
+            max_running_simulations=args.max_running_simulations,
+        ) as fake_sirepo_server:
+            start_time = ttime.monotonic()
+            run_simulations(fake_sirepo_server.url, args.simulations)
+            elapsed_seconds = ttime.monotonic() - start_time
+            request_count = sum(fake_sirepo_server.request_counts.values())
+        print(
+            f"{client_name:>12} {elapsed_seconds:>10.2f} "
+            f"{args.simulations / elapsed_seconds:>14.1f} {request_count:>10}"
+        )
+
+
+if __name__ == "__main__":
+    main()